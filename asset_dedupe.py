@@ -0,0 +1,132 @@
+"""
+Content-addressed reuse of uploaded GAM creative assets.
+
+An AssetCreativeTemplateVariableValue used to carry the full image bytes
+every time, even when the same file had already been uploaded for another
+size, another line or another session. GAM returns an assetId for each
+uploaded asset and accepts that ID instead of the bytes, so the SHA-256 of
+every uploaded blob is remembered together with its assetId (per network,
+in cache/asset_id_cache.json). Later payloads reference the asset by ID.
+
+Files read through an AssetStore are hashed once per file. Memory-mapped assets stay
+memoryviews until materialize_assets copies them for the call that sends them.
+
+Usage:
+    python asset_dedupe.py status
+    python asset_dedupe.py clear
+"""
+
+import hashlib
+import os
+import sys
+
+from asset_store import asset_store
+from cache_utils import TTLDiskCache
+from config import CACHE_DIR
+
+ASSET_ID_CACHE_PATH = os.path.join(CACHE_DIR, "asset_id_cache.json")
+ASSET_ID_CACHE_TTL = 180 * 24 * 3600
+ASSET_ID_CACHE_MAX_ENTRIES = 20000
+
+asset_id_cache = TTLDiskCache(ASSET_ID_CACHE_PATH, ttl=ASSET_ID_CACHE_TTL, max_entries=ASSET_ID_CACHE_MAX_ENTRIES)
+
+
+def _field(obj, name):
+    """Attribute of a payload dict or of a SOAP response object."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def asset_digest(data, store=None):
+    """SHA-256 of an asset's bytes (bytes or memoryview), cached per file for contents of store (default: asset_store)."""
+    return (store or asset_store).digest(data) or hashlib.sha256(data).hexdigest()
+
+
+def _cache_key(network_code, digest):
+    return f"{network_code}:{digest}"
+
+
+def prepare_creative_assets(template_creative, network_code, store=None):
+    """
+    Request copy of a creative with already uploaded assets referenced by assetId.
+
+    Memory-mapped assets that still have to be uploaded are left as memoryviews;
+    pass the request through materialize_assets right before sending it. store is
+    the AssetStore the bytes were read from (default: asset_store).
+
+    Returns:
+        tuple: (request creative, digests uploaded as bytes, digests referenced by ID,
+                uniqueName -> digest of every asset variable)
+    """
+    variables = template_creative.get('creativeTemplateVariableValues', [])
+    uploads, referenced, digests = set(), set(), {}
+    request_variables = []
+    changed = False
+    for variable in variables:
+        asset = variable.get('asset')
+        data = asset.get('assetByteArray') if asset else None
+        if data is None:
+            request_variables.append(variable)
+            continue
+        digest = asset_digest(data, store)
+        digests[variable.get('uniqueName')] = digest
+        asset_id = asset_id_cache.get(_cache_key(network_code, digest)) if network_code else None
+        if asset_id is not None:
+            request_asset = {'assetId': asset_id, 'fileName': asset.get('fileName')}
+            referenced.add(digest)
+        else:
+            request_asset = asset
+            uploads.add(digest)
+        if request_asset is not asset:
+            variable = dict(variable, asset=request_asset)
+            changed = True
+        request_variables.append(variable)
+    request = dict(template_creative, creativeTemplateVariableValues=request_variables) if changed else template_creative
+    return request, uploads, referenced, digests
+
+
+def materialize_assets(request):
+    """Copy of a prepared request with memory-mapped asset bytes read into bytes, as the SOAP client needs."""
+    variables = request.get('creativeTemplateVariableValues', [])
+    if not any(isinstance((variable.get('asset') or {}).get('assetByteArray'), memoryview) for variable in variables):
+        return request
+    request_variables = []
+    for variable in variables:
+        asset = variable.get('asset')
+        data = asset.get('assetByteArray') if asset else None
+        if isinstance(data, memoryview):
+            variable = dict(variable, asset=dict(asset, assetByteArray=data.tobytes()))
+        request_variables.append(variable)
+    return dict(request, creativeTemplateVariableValues=request_variables)
+
+
+def remember_created_assets(created_creative, digests, network_code):
+    """Store the assetIds GAM returned for a creative's asset variables."""
+    if not network_code or not digests:
+        return 0
+    items = []
+    for variable in _field(created_creative, 'creativeTemplateVariableValues') or []:
+        digest = digests.get(_field(variable, 'uniqueName'))
+        asset = _field(variable, 'asset')
+        asset_id = _field(asset, 'assetId') if asset is not None else None
+        if digest and asset_id:
+            items.append((_cache_key(network_code, digest), asset_id))
+    if items:
+        asset_id_cache.set_many(items)
+    return len(items)
+
+
+def forget_assets(digests, network_code):
+    """Drop cached assetIds (e.g. after GAM rejected a request that referenced them)."""
+    for digest in digests:
+        asset_id_cache.delete(_cache_key(network_code, digest))
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "clear":
+        asset_id_cache.clear()
+        print(f"🗑️ Cleared asset ID cache {ASSET_ID_CACHE_PATH}")
+    else:
+        print(f"📋 Asset ID cache {ASSET_ID_CACHE_PATH}: {len(asset_id_cache)} uploaded asset(s)")
@@ -0,0 +1,160 @@
+"""
+Read-once store for creative asset bytes.
+
+Building the creatives of a line used to open the same files over and over:
+the 300x250/600x250 pair for every expandable banner, companion images for
+every creative and each HTML creative for every size. The
+store reads each file once and hands the same bytes object to every payload
+that references it.
+
+Files are kept in memory up to ASSET_MEMORY_LIMIT bytes in total. Files of
+ASSET_MMAP_THRESHOLD bytes or more (videos, large HTML) and anything beyond
+the limit are memory-mapped instead and shared as a read-only memoryview, so
+the OS pages them in only while a request is being serialized.
+
+Entries are keyed by path, size and modification time, so a replaced file is
+read again. The SHA-256 of a file's contents (see asset_dedupe) is computed
+once per entry. Each submission uses a store of its own and clears it when it
+is done, so concurrent submissions neither share the memory ceiling nor drop
+each other's entries; asset_store is the default for standalone calls.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+
+ASSET_MEMORY_LIMIT = int(os.environ.get("ASSET_MEMORY_LIMIT_MB", "256")) * 1024 * 1024
+ASSET_MMAP_THRESHOLD = int(os.environ.get("ASSET_MMAP_THRESHOLD_MB", "8")) * 1024 * 1024
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class AssetStore:
+    """
+    Thread-safe cache of file contents with a memory ceiling and mmap spill.
+
+    Args:
+        memory_limit: Bytes kept in memory before further files are memory-mapped
+        mmap_threshold: Files at least this large are always memory-mapped
+    """
+
+    def __init__(self, memory_limit=ASSET_MEMORY_LIMIT, mmap_threshold=ASSET_MMAP_THRESHOLD):
+        self.memory_limit = memory_limit
+        self.mmap_threshold = mmap_threshold
+        self.memory_used = 0
+        self._entries = {}   # file key -> bytes or memoryview
+        self._derived = {}   # (path, variant) -> (source file key, value)
+        self._digests = {}   # file key -> SHA-256 hex digest
+        self._keys = {}      # id of a returned bytes/memoryview -> file key
+        self._maps = []
+        self._lock = threading.RLock()
+        self.reads = 0
+        self.hits = 0
+
+    def read_bytes(self, path):
+        """
+        File contents, read from disk only the first time.
+
+        Returns:
+            bytes or memoryview: Shared, read-only contents
+        """
+        key = _file_key(path)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self.hits += 1
+                return data
+            size = key[1]
+            if size and (size >= self.mmap_threshold or self.memory_used + size > self.memory_limit):
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                data = memoryview(mapped)
+                print(f"🗺️ Memory-mapped asset {os.path.basename(path)} ({size / 1024 / 1024:.1f} MB)")
+            else:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                self.memory_used += len(data)
+            self._entries[key] = data
+            self._keys[id(data)] = key
+            self.reads += 1
+            return data
+
+    def digest(self, data):
+        """
+        SHA-256 hex digest of contents returned by read_bytes, hashed once per file.
+
+        Returns:
+            str: The digest, or None if data did not come from this store
+        """
+        with self._lock:
+            key = self._keys.get(id(data))
+            if key is None or self._entries.get(key) is not data:
+                return None
+            digest = self._digests.get(key)
+        if digest is None:
+            digest = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def read_text(self, path, encoding='utf-8'):
+        """File contents decoded like open(path, 'r'), newlines translated to '\\n'."""
+        text = bytes(self.read_bytes(path)).decode(encoding)
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def derived(self, path, variant, build):
+        """
+        Value computed from a file once per variant, e.g. an HTML creative with its trackers injected.
+
+        build must not modify the file; the value is rebuilt only when the source file changes.
+
+        Args:
+            path: Source file
+            variant: Hashable description of how the value was built
+            build: Callable returning the value
+        """
+        cache_key = (os.path.abspath(path), variant)
+        with self._lock:
+            cached = self._derived.get(cache_key)
+            file_key = _file_key(path)
+            if cached is not None and cached[0] == file_key:
+                self.hits += 1
+                return cached[1]
+            value = build()
+            self._derived[cache_key] = (file_key, value)
+            return value
+
+    def clear(self):
+        """Drop every entry and unmap spilled files."""
+        with self._lock:
+            self._entries.clear()
+            self._derived.clear()
+            self._digests.clear()
+            self._keys.clear()
+            for mapped in self._maps:
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # still referenced by a payload; released when that goes away
+            self._maps = []
+            self.memory_used = 0
+            self.reads = 0
+            self.hits = 0
+
+    def stats(self):
+        """Files read, reads saved, bytes held in memory and files mapped."""
+        with self._lock:
+            return {
+                'files_read': self.reads,
+                'reads_saved': self.hits,
+                'memory_bytes': self.memory_used,
+                'mapped_files': len(self._maps),
+            }
+
+
+asset_store = AssetStore()
@@ -0,0 +1,137 @@
+"""
+Benchmark for excel_reader on large synthetic tag and DSD workbooks.
+
+Builds a tag workbook (the 'Tags' sheet between two other sheets) and a DSD
+workbook (labels at the top, line details below) with the given number of
+rows, then times the former pandas reads against read_sheet with every
+installed engine and checks that the results are identical.
+
+Usage:
+    python bench_excel_reader.py [rows] [repeat]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from openpyxl import Workbook
+
+from dsd_read import DSD_LABELS
+from excel_reader import available_engines, read_sheet, stop_after_labels
+
+SIZES = ["300x250", "728x90", "320x50", "300x600", "970x250", "320x480"]
+
+
+def build_tag_workbook(path, rows):
+    """Write a tag workbook: Summary, Tags (rows tags) and Notes sheets."""
+    workbook = Workbook(write_only=True)
+    summary = workbook.create_sheet("Summary")
+    summary.append(["Campaign", "Advertiser", "Tags"])
+    summary.append(["Synthetic campaign", "Benchmark advertiser", rows])
+
+    tags = workbook.create_sheet("Tags")
+    tags.append(["Placement ID", "Dimensions", "JavaScript Tag", "Impression Tag", "Click Tag", "Updated"])
+    start = datetime(2025, 1, 1)
+    for i in range(rows):
+        size = SIZES[i % len(SIZES)]
+        if i % 3 == 0:
+            tags.append([100000 + i, f"{size} ROS", None,
+                         f'<IMG SRC="https://ad.example.com/imp/{i}?ord=[timestamp]" BORDER=0 WIDTH=1 HEIGHT=1>',
+                         f"https://ad.example.com/click/{i}?ord=[CACHEBUSTER]", start + timedelta(hours=i)])
+        else:
+            tags.append([100000 + i, size,
+                         f'<script src="https://ad.example.com/tag/{i}.js?click=[CLICK]"></script>'
+                         f'<noscript><a href="https://ad.example.com/click/{i}"><img src="https://ad.example.com/img/{i}"></a></noscript>',
+                         None, None, start + timedelta(hours=i)])
+
+    notes = workbook.create_sheet("Notes")
+    for i in range(rows // 10):
+        notes.append([f"Note {i}", i * 1.5])
+    workbook.save(path)
+
+
+def build_dsd_workbook(path, rows):
+    """Write a DSD workbook: label/value pairs at the top, rows of line details below."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("DSD")
+    sheet.append(["Deal Summary", None, None, None])
+    sheet.append(["Rate (CPM)", "Impressions", "Start Date", "End Date"])
+    sheet.append([125.5, 2500000, datetime(2025, 3, 1), datetime(2025, 3, 31)])
+    sheet.append(["Site", "Geo", "FCAP", None])
+    sheet.append(["TOI, ET", "Mumbai, Delhi", 3, None])
+    sheet.append([None, None, None, None])
+    start = datetime(2025, 3, 1)
+    for i in range(rows):
+        sheet.append([f"Line {i}", (i * 7919) % 100000, start + timedelta(days=i % 31), f"Section {i % 40}"])
+    workbook.save(path)
+
+
+def pandas_tag_read(path):
+    """The former read: list sheets with pd.ExcelFile, then read the tags sheet with pd.read_excel."""
+    sheet_names = pd.ExcelFile(path).sheet_names
+    target_sheet = next((name for name in sheet_names if name.lower() == 'tags'), sheet_names[0])
+    return pd.read_excel(path, sheet_name=target_sheet)
+
+
+def dsd_values(df):
+    """Value below the first cell containing each label (the load_dsd lookup)."""
+    values = {}
+    for label in DSD_LABELS:
+        values[label] = None
+        for index, row in df.iterrows():
+            col_index = next((i for i, value in enumerate(row) if isinstance(value, str) and label in value.lower()), None)
+            if col_index is not None:
+                values[label] = df.iloc[index + 1, col_index] if index + 1 < len(df) else None
+                break
+    return values
+
+
+def timed(func, repeat):
+    """Best wall time of repeat calls and the last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(rows=20000, repeat=3):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tag_path = os.path.join(tmp_dir, "tags.xlsx")
+        dsd_path = os.path.join(tmp_dir, "dsd.xlsx")
+        build_tag_workbook(tag_path, rows)
+        build_dsd_workbook(dsd_path, rows)
+        print(f"📁 Synthetic workbooks: tags {os.path.getsize(tag_path) / 1024:.0f} KB, "
+              f"DSD {os.path.getsize(dsd_path) / 1024:.0f} KB, {rows} rows each")
+
+        baseline, expected = timed(lambda: pandas_tag_read(tag_path), repeat)
+        print(f"\n🏷️ Tag workbook ({rows} rows)")
+        print(f"  pandas ExcelFile + read_excel: {baseline:.3f}s")
+        for engine in available_engines():
+            if engine == "xlrd":
+                continue  # .xls only
+            elapsed, df = timed(lambda: read_sheet(tag_path, prefer_sheet='tags', engine=engine), repeat)
+            pd.testing.assert_frame_equal(df, expected, check_dtype=engine == "openpyxl")
+            print(f"  read_sheet[{engine}]: {elapsed:.3f}s ({baseline / elapsed:.1f}x)")
+
+        baseline, expected_df = timed(lambda: pd.read_excel(dsd_path, engine="openpyxl"), repeat)
+        expected = dsd_values(expected_df)
+        print(f"\n📄 DSD workbook ({rows} rows)")
+        print(f"  pandas read_excel: {baseline:.3f}s")
+        for engine in available_engines():
+            if engine == "xlrd":
+                continue
+            elapsed, df = timed(lambda: read_sheet(dsd_path, engine=engine, stop=stop_after_labels(DSD_LABELS)), repeat)
+            assert dsd_values(df) == expected, f"{engine}: {dsd_values(df)} != {expected}"
+            print(f"  read_sheet[{engine}] until labels found: {elapsed:.3f}s ({baseline / elapsed:.1f}x, {len(df)} of {len(expected_df)} rows read)")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3)
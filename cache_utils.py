@@ -0,0 +1,196 @@
+"""
+Small TTL cache shared by the lookup helpers (geo IDs, order metadata, parsed files).
+
+Entries live in memory and, when a path is given, in a file under the cache
+folder so that every Dash worker and later sessions see the same answers.
+Each entry carries its own expiry, the oldest entries are evicted once
+max_entries is exceeded, and writes merge with whatever other processes have
+stored in the meantime.
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+try:
+    from filelock import FileLock
+except ImportError:
+    FileLock = None
+
+_MISSING = object()
+
+
+class TTLDiskCache:
+    """
+    Thread-safe TTL cache with LRU eviction and optional file persistence.
+
+    Args:
+        path: File to persist entries to, or None for a memory-only cache
+        ttl: Default time-to-live in seconds (None = never expires)
+        max_entries: Maximum number of entries kept before evicting the oldest
+        serializer: "json" (readable, JSON-safe values only) or "pickle"
+    """
+
+    def __init__(self, path=None, ttl=3600, max_entries=10000, serializer="json"):
+        if serializer not in ("json", "pickle"):
+            raise ValueError(f"Unsupported serializer: {serializer}")
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.serializer = serializer
+        self._entries = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.RLock()
+        self._file_mtime = None
+        self._file_lock = FileLock(f"{path}.lock") if (path and FileLock) else None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._reload_if_changed()
+
+    # ---- persistence -------------------------------------------------
+
+    def _read_file(self):
+        if self.serializer == "pickle":
+            with open(self.path, 'rb') as f:
+                return pickle.load(f)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_file(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if self.serializer == "pickle":
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _reload_if_changed(self):
+        """Merge entries written by other processes since the last read."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._file_mtime:
+                return
+            stored = self._read_file()
+            now = time.time()
+            for key, (expires_at, value) in stored.items():
+                if expires_at is not None and expires_at <= now:
+                    continue
+                current = self._entries.get(key)
+                # Keep whichever copy lives longer
+                if current is None or (current[0] is not None and (expires_at is None or expires_at > current[0])):
+                    self._entries[key] = (expires_at, value)
+            self._file_mtime = mtime
+            self._evict()
+        except Exception as e:
+            print(f"⚠️ Could not read cache file {self.path}: {e}")
+
+    def _flush_locked(self, mutate):
+        """
+        Merge the file, apply mutate to the entries and write them back.
+
+        The file lock is held across all three steps, so an entry another
+        process writes in between is neither lost nor brought back after a delete.
+
+        Args:
+            mutate: Callable changing self._entries; returns False if nothing changed
+        """
+        if not self.path:
+            mutate()
+            self._evict()
+            return
+        applied = False
+        try:
+            with self._file_lock if self._file_lock is not None else nullcontext():
+                self._reload_if_changed()
+                applied = True
+                if mutate() is False:
+                    return
+                self._evict()
+                self._write_file({key: list(entry) for key, entry in self._entries.items()})
+                self._file_mtime = os.path.getmtime(self.path)
+        except Exception as e:
+            print(f"⚠️ Could not write cache file {self.path}: {e}")
+            if not applied:
+                mutate()
+                self._evict()
+
+    # ---- cache API ---------------------------------------------------
+
+    def _evict(self):
+        now = time.time()
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        while self.max_entries and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, key):
+        """
+        Look up key without confusing a cached None with a miss.
+
+        Returns:
+            tuple: (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._reload_if_changed()
+                entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def get(self, key, default=None):
+        found, value = self.lookup(key)
+        return value if found else default
+
+    def set(self, key, value, ttl=_MISSING):
+        """Store value under key; ttl overrides the default (None = never expires)."""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        self.set_many([(key, value)], ttl=ttl)
+
+    def set_many(self, items, ttl=_MISSING):
+        """Store several key/value pairs with a single file write."""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        items = list(items)
+
+        def store():
+            for key, value in items:
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+
+        with self._lock:
+            self._flush_locked(store)
+
+    def delete(self, key):
+        with self._lock:
+            # The pop happens after the merge, so the copy on disk cannot bring the key back
+            self._flush_locked(lambda: self._entries.pop(key, None) is not None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            self._file_mtime = None
+
+    def __len__(self):
+        with self._lock:
+            self._evict()
+            return len(self._entries)
+
+    def __contains__(self, key):
+        return self.lookup(key)[0]
@@ -5,6 +5,7 @@ Simple script to check if the target order exists and is valid
 
 import sys
 from googleads import ad_manager
+from get_order_name import get_order_metadata
 
 def main():
     order_id = "3811823998"
@@ -16,25 +17,19 @@ def main():
         client = ad_manager.AdManagerClient.LoadFromStorage("googleads1.yaml")
         print("✅ Successfully authenticated with Google Ad Manager")
         
-        # Get order service
-        order_service = client.GetService('OrderService', version='v202408')
-        
-        # Try to get the order directly using the service
+        # Always ask GAM rather than the order cache
         try:
-            orders = order_service.getOrdersByStatement({
-                'query': f'WHERE Id = {order_id}'
-            })
+            order = get_order_metadata(client, order_id, refresh=True)
             
-            if orders and orders.results:
-                order = orders.results[0]
+            if order:
                 print(f"✅ Order found!")
-                print(f"   - ID: {order.id}")
-                print(f"   - Name: {order.name}")
-                print(f"   - Status: {order.status}")
-                print(f"   - Advertiser ID: {order.advertiserId}")
-                print(f"   - Currency: {order.currencyCode}")
-                print(f"   - Start Date: {order.startDateTime}")
-                print(f"   - End Date: {order.endDateTime}")
+                print(f"   - ID: {order['id']}")
+                print(f"   - Name: {order['name']}")
+                print(f"   - Status: {order['status']}")
+                print(f"   - Advertiser ID: {order['advertiserId']}")
+                print(f"   - Currency: {order['currencyCode']}")
+                print(f"   - Start Date: {order['startDateTime']}")
+                print(f"   - End Date: {order['endDateTime']}")
                 return 0
             else:
                 print(f"❌ Order {order_id} not found!")
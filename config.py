@@ -4,6 +4,19 @@ import os
 WORKSPACE_ROOT = os.path.dirname(os.path.abspath(__file__))
 CREATIVES_FOLDER = os.path.join(WORKSPACE_ROOT, "creatives")
 CREDENTIALS_PATH = os.path.join(WORKSPACE_ROOT, "credentials.json")
+CACHE_DIR = os.path.join(WORKSPACE_ROOT, "cache")
+
+# Placement spreadsheet and its worksheets
+PLACEMENT_SHEET_URL = "https://docs.google.com/spreadsheets/d/11_SZJnn5KALr6zi0JA27lKbmQvA1WSK4snp0UTY2AaY/edit?gid=2043018330"
+PLACEMENT_SHEET_NAME_LANG = "ALL LANGUAGES"
+PLACEMENT_SHEET_NAME_TOI = "TOI + ETIMES"
+PLACEMENT_SHEET_NAME_ET = "ET Placement/Preset"
+# Where placements are read from: "sheet", "mirror" (local SQLite copy) or
+# "auto" (sheet, falling back to the mirror when Sheets is unreachable)
+PLACEMENT_SOURCE = os.environ.get("PLACEMENT_SOURCE", "auto")
 
 # Create creatives folder if it doesn't exist
-os.makedirs(CREATIVES_FOLDER, exist_ok=True) 
\ No newline at end of file
+os.makedirs(CREATIVES_FOLDER, exist_ok=True)
+
+# Create local cache folder if it doesn't exist
+os.makedirs(CACHE_DIR, exist_ok=True)
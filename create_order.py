@@ -1,5 +1,6 @@
 from googleads import ad_manager
 from create_advertiserId import create_advertiser
+from get_order_name import remember_order
 
 def get_adbvertiser_id(client, company_name, company_type):
     """Fetch the ID of a company (advertiser) from Google Ad Manager."""
@@ -84,6 +85,7 @@ def create_order(client, advertiser_name, trafficker_name, order_name, line_item
 
         # Create the order
         created_order = order_service.createOrders([order])[0]
+        remember_order(client, created_order)
         print(f"Order '{created_order['name']}' created with ID: {created_order['id']}")
         return created_order['id']
 
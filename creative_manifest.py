@@ -0,0 +1,112 @@
+"""
+Manifest of the creatives folder for one submission.
+
+The folder used to be listed once per size and again for every companion
+image lookup (600x250 with its 300x250, 320x100 with its 320x250, 300x600
+with its 450x600). The manifest lists it once, precomputes the per-file
+flags the template selection looks at (2x, nolp, ai, html) and answers size
+and companion lookups from memory, in the same order os.listdir returned the
+files.
+
+get_creative_manifest returns the current manifest and lists the folder
+again only when its modification time changes (a file was added, removed or
+renamed).
+"""
+
+import os
+import threading
+
+from config import CREATIVES_FOLDER
+
+IMAGE_EXTENSIONS = ('.png', '.jpeg', '.jpg', '.webp', '.gif')
+SCRIPT_EXTENSIONS = ('.html', '.xlsx', '.xls')
+CREATIVE_EXTENSIONS = IMAGE_EXTENSIONS + SCRIPT_EXTENSIONS
+
+
+def _file_entry(folder, name):
+    lower = name.lower()
+    return {
+        'name': name,
+        'path': os.path.join(folder, name),
+        'lower': lower,
+        'is_image': lower.endswith(IMAGE_EXTENSIONS),
+        'is_html': lower.endswith('.html'),
+        'is_2x': '2x' in lower,
+        'is_nolp': 'nolp' in lower,
+        'is_ai': 'ai' in lower or lower.endswith('.html'),
+    }
+
+
+class CreativeManifest:
+    """One listing of a creatives folder with size lookups and file flags."""
+
+    def __init__(self, folder=CREATIVES_FOLDER):
+        self.folder = folder
+        self.mtime_ns = os.stat(folder).st_mtime_ns
+        self.entries = [_file_entry(folder, name) for name in os.listdir(folder)]
+        self._by_name = {entry['name']: entry for entry in self.entries}
+        self._lookups = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entry(self, name):
+        """Flags and path of one file (None if it was not in the folder)."""
+        return self._by_name.get(name)
+
+    def files_for_size(self, size, extensions=CREATIVE_EXTENSIONS, exclude=None):
+        """
+        Names of files whose name contains size and ends with one of extensions, in listing order.
+
+        Args:
+            size: Size text such as '300x250', looked for in the lowercased file name
+            extensions: Accepted file extensions
+            exclude: Skip names that also contain this text
+        """
+        key = (size, extensions, exclude)
+        names = self._lookups.get(key)
+        if names is None:
+            names = [entry['name'] for entry in self.entries
+                     if key[0] in entry['lower'] and entry['lower'].endswith(extensions)
+                     and not (exclude and exclude in entry['lower'])]
+            self._lookups[key] = names
+        return list(names)
+
+    def first_path(self, size, extensions=IMAGE_EXTENSIONS):
+        """Path of the first file for size, or None."""
+        names = self.files_for_size(size, extensions)
+        return self._by_name[names[0]]['path'] if names else None
+
+    def last_path(self, size, extensions=IMAGE_EXTENSIONS, exclude=None):
+        """Path of the last file for size, or None."""
+        names = self.files_for_size(size, extensions, exclude)
+        return self._by_name[names[-1]]['path'] if names else None
+
+    def paths(self):
+        """Same paths as glob.glob(os.path.join(folder, '*.*'))."""
+        return [entry['path'] for entry in self.entries
+                if '.' in entry['name'] and not entry['name'].startswith('.')]
+
+
+_manifests = {}  # folder -> CreativeManifest
+_manifests_lock = threading.Lock()
+
+
+def get_creative_manifest(folder=CREATIVES_FOLDER, refresh=False):
+    """
+    Return the manifest of folder, listing it again only if it changed.
+
+    Args:
+        folder: Creatives folder
+        refresh: List the folder even if its modification time is unchanged
+
+    Returns:
+        CreativeManifest
+    """
+    with _manifests_lock:
+        manifest = _manifests.get(folder)
+        if manifest is None or refresh or os.stat(folder).st_mtime_ns != manifest.mtime_ns:
+            manifest = CreativeManifest(folder)
+            _manifests[folder] = manifest
+            print(f"🗂️ Creative manifest for {folder}: {len(manifest)} file(s)")
+        return manifest
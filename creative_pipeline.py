@@ -0,0 +1,88 @@
+"""
+Bounded, rate-limited worker pool for building and submitting creatives.
+
+Creative creation used to run one size, one tag and one GAM call at a time.
+run_ordered runs the builds and createCreatives chunks of a line on at most
+CREATIVE_PIPELINE_WORKERS threads and returns the results in input order, so
+logs and creative ID lists come out the same on every run.
+
+Every creative and LICA call takes a token from gam_rate_limiter first, a
+token bucket shared by all threads of the process (Dash serves several
+submissions at once), so parallel workers stay under the Ad Manager quota of
+GAM_REQUESTS_PER_SECOND with bursts of up to GAM_BURST calls. Timeouts are
+per service (see gam_transport), so concurrent calls do not affect each other.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CREATIVE_PIPELINE_WORKERS = int(os.environ.get("CREATIVE_PIPELINE_WORKERS", "4"))
+GAM_REQUESTS_PER_SECOND = float(os.environ.get("GAM_REQUESTS_PER_SECOND", "4"))
+GAM_BURST = int(os.environ.get("GAM_BURST", "8"))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate: Tokens added per second
+        capacity: Most tokens that can accumulate (the burst size)
+    """
+
+    def __init__(self, rate=GAM_REQUESTS_PER_SECOND, capacity=GAM_BURST):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available and take them; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+gam_rate_limiter = TokenBucket()
+
+
+def run_ordered(func, items, max_workers=None):
+    """
+    Run func on every item on a bounded thread pool.
+
+    Args:
+        func: Callable taking one item
+        items: Inputs
+        max_workers: Threads (default: CREATIVE_PIPELINE_WORKERS)
+
+    Returns:
+        list: (result, exception) per item, in the order of items
+    """
+    items = list(items)
+    max_workers = max(1, min(max_workers or CREATIVE_PIPELINE_WORKERS, len(items) or 1))
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    if max_workers == 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="creative") as executor:
+        return list(executor.map(call, items))
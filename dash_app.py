@@ -33,7 +33,7 @@ assets_folder = os.path.join(parent_dir, 'assets')
 # Now import the modules after adding parent directory to path
 from create_order import create_order
 from single_line import single_line
-from single_line import LocationNotFoundError
+from single_line import LocationNotFoundError, describe_unresolved_locations
 from config import CREATIVES_FOLDER
 from DSD.Dsd_Download import Dsd_Download
 from dsd_read import load_dsd
@@ -711,7 +711,7 @@ def handle_all_inputs(submit_n, clear_n, order_option_trigger, upload_contents,
                 
                 # Create line item
                 try:
-                    line_id, creative_id = single_line(client, order_id, line_item_data, line_name)
+                    line_id, creative_id, unresolved_locations = single_line(client, order_id, line_item_data, line_name)
                     print(f"Created line item with ID: {line_id}")
                     success_message = "Line item created successfully!"
                     # Check if creatives were created
@@ -719,8 +719,10 @@ def handle_all_inputs(submit_n, clear_n, order_option_trigger, upload_contents,
                         success_message += f" Creatives: {len(creative_id)} created."
                     else:
                         success_message += " Note: No creatives were created (check creative files)."
+                    if unresolved_locations:
+                        success_message += f" Locations not targeted: {describe_unresolved_locations(unresolved_locations)}."
                 except LocationNotFoundError as e:
-                    error_message = f"Location '{e.location_name}' is not found. Please enter it manually."
+                    error_message = f"Location {e.describe()} is not found. Please enter it manually."
                     print(error_message)
                     
                     # Log location error
@@ -1,64 +1,191 @@
+"""
+DSD (deal sheet) reader.
+
+Usage:
+    python dsd_read.py <directory or file> [...]   # parse DSDs, in parallel
+    python dsd_read.py clear-cache
+"""
+
+import glob
+import hashlib
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 from dateutil import parser
 
-def load_dsd(dsd_file_path):
-    df = pd.read_excel(dsd_file_path, engine="openpyxl")
-
-    def find_rate_value():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "rate" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    def total_impressions():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "impressions" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    def start_date():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "start date" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    def end_date():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "end date" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    def site():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "site" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    def geo():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "geo" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    def Fcap():
-        for index, row in df.iterrows():
-            for col_index, (col_name, value) in enumerate(row.items()):
-                if isinstance(value, str) and "fcap" in value.lower():
-                    return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
-        return None
-
-    return {
-        "rate": find_rate_value(),
-        "total_impressions": total_impressions(),
-        "start_date": start_date(),
-        "end_date": end_date(),
-        "site": site(),
-        "geo": geo(),
-        "fcap": Fcap()
-    }
+from cache_utils import TTLDiskCache
+from config import CACHE_DIR
+from excel_reader import default_engine, read_sheet, stop_after_labels
+
+# Result key -> label; a cell whose text contains the label holds the value in the row below
+DSD_FIELDS = {
+    "rate": "rate",
+    "total_impressions": "impressions",
+    "start_date": "start date",
+    "end_date": "end date",
+    "site": "site",
+    "geo": "geo",
+    "fcap": "fcap",
+}
+DSD_LABELS = list(DSD_FIELDS.values())
+# Cheap test for "does this cell contain any label"; the labels are then checked one by one
+DSD_LABEL_PATTERN = re.compile("|".join(re.escape(label) for label in DSD_LABELS))
+
+
+def find_label_values(df):
+    """
+    Find every DSD label in one pass over the sheet.
+
+    Cells are visited row by row, left to right, so each label resolves to its
+    first occurrence, and its value is the cell one row below in the same column.
+
+    Returns:
+        dict: Label -> value, or None if the label is missing or on the last row
+    """
+    values = dict.fromkeys(DSD_LABELS)
+    pending = list(DSD_LABELS)
+    row_count = len(df)
+    for row_index, row in enumerate(df.to_numpy(dtype=object)):
+        for col_index, value in enumerate(row):
+            if not isinstance(value, str):
+                continue
+            lowered = value.lower()
+            if not DSD_LABEL_PATTERN.search(lowered):
+                continue
+            for label in [label for label in pending if label in lowered]:
+                values[label] = df.iloc[row_index + 1, col_index] if row_index + 1 < row_count else None
+                pending.remove(label)
+            if not pending:
+                return values
+    return values
+
+
+# Parsed DSDs keyed by file content, so a re-downloaded copy of the same DSD is not parsed again
+DSD_CACHE_PATH = os.path.join(CACHE_DIR, "dsd_cache.pkl")
+DSD_CACHE_TTL = 30 * 24 * 3600
+DSD_CACHE_MAX_ENTRIES = 500
+# Bump when the parsing rules change so older cached results are ignored
+DSD_CACHE_VERSION = 1
+# Processes used by load_dsd_batch (default: one per CPU)
+DSD_BATCH_WORKERS = os.cpu_count() or 1
+
+dsd_cache = TTLDiskCache(DSD_CACHE_PATH, ttl=DSD_CACHE_TTL, max_entries=DSD_CACHE_MAX_ENTRIES, serializer="pickle")
+
+
+def dsd_content_hash(dsd_file_path):
+    """SHA-256 of the file contents."""
+    digest = hashlib.sha256()
+    with open(dsd_file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dsd_cache_key(content_hash):
+    return (DSD_CACHE_VERSION, content_hash)
+
+
+def parse_dsd(dsd_file_path):
+    """Read a DSD workbook and extract its fields (no caching)."""
+    # Only the rows up to the last label's value are read, not the whole sheet.
+    # openpyxl cannot open legacy .xls DSDs, so the engine follows the extension
+    df = read_sheet(dsd_file_path, engine=default_engine(dsd_file_path), stop=stop_after_labels(DSD_LABELS))
+    values = find_label_values(df)
+    return {key: values[label] for key, label in DSD_FIELDS.items()}
+
+
+def load_dsd(dsd_file_path, use_cache=True):
+    """
+    Extract rate, impressions, dates, site, geo and fcap from a DSD.
+
+    Results are cached by the file's content hash, so the same DSD is parsed
+    once however often (and under whatever name) it is downloaded.
+
+    Args:
+        dsd_file_path: Path to the DSD workbook
+        use_cache: Set False to parse the file again and refresh the cache
+
+    Returns:
+        dict: rate, total_impressions, start_date, end_date, site, geo, fcap
+    """
+    cache_key = _dsd_cache_key(dsd_content_hash(dsd_file_path))
+    if use_cache:
+        found, dsd = dsd_cache.lookup(cache_key)
+        if found:
+            print(f"♻️ Reusing parsed DSD {os.path.basename(dsd_file_path)}")
+            return dict(dsd)
+    dsd = parse_dsd(dsd_file_path)
+    dsd_cache.set(cache_key, dsd)
+    return dict(dsd)
+
+
+def load_dsd_batch(paths, max_workers=None):
+    """
+    Parse many DSDs, spreading the uncached ones over worker processes.
+
+    Args:
+        paths: A directory (all .xlsx/.xls files in it) or a list of file paths
+        max_workers: Number of processes (default: DSD_BATCH_WORKERS)
+
+    Returns:
+        dict: File path -> load_dsd result, or None if the file could not be parsed
+    """
+    if isinstance(paths, str):
+        directory = paths
+        paths = sorted(glob.glob(os.path.join(directory, "*.xlsx")) + glob.glob(os.path.join(directory, "*.xls")))
+        # Skip Excel's "~$" lock files of open workbooks
+        paths = [path for path in paths if not os.path.basename(path).startswith("~$")]
+
+    results = {}
+    pending = {}  # cache key -> paths with that content
+    for path in paths:
+        try:
+            cache_key = _dsd_cache_key(dsd_content_hash(path))
+        except OSError as e:
+            print(f"❌ Could not read DSD {path}: {e}")
+            results[path] = None
+            continue
+        found, dsd = dsd_cache.lookup(cache_key)
+        if found:
+            results[path] = dict(dsd)
+        else:
+            pending.setdefault(cache_key, []).append(path)
+
+    if pending:
+        workers = min(max_workers or DSD_BATCH_WORKERS, len(pending))
+        print(f"📄 Parsing {len(pending)} DSD(s) with {workers} process(es), {len(results)} from cache")
+        parsed = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {cache_key: executor.submit(parse_dsd, same_paths[0]) for cache_key, same_paths in pending.items()}
+            for cache_key, future in futures.items():
+                try:
+                    dsd = future.result()
+                except Exception as e:
+                    print(f"❌ Could not parse DSD {pending[cache_key][0]}: {e}")
+                    dsd = None
+                else:
+                    parsed.append((cache_key, dsd))
+                for path in pending[cache_key]:
+                    results[path] = dict(dsd) if dsd is not None else None
+        # Stored from this process in one write, not by each worker
+        dsd_cache.set_many(parsed)
+
+    return {path: results[path] for path in paths}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python dsd_read.py <directory or file> [...] | clear-cache")
+        sys.exit(1)
+    if sys.argv[1] == "clear-cache":
+        dsd_cache.clear()
+        print(f"🗑️ Cleared DSD cache {DSD_CACHE_PATH}")
+    else:
+        targets = sys.argv[1:]
+        if len(targets) == 1 and os.path.isdir(targets[0]):
+            targets = targets[0]
+        for path, dsd in load_dsd_batch(targets).items():
+            print(f"{'✅' if dsd else '❌'} {os.path.basename(path)}: {dsd}")
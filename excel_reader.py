@@ -0,0 +1,319 @@
+"""
+Streaming, read-only reader for tag and DSD workbooks.
+
+pd.ExcelFile + pd.read_excel open a workbook twice and load the whole sheet.
+read_sheet opens the workbook once, reads only the selected sheet row by row
+and can stop as soon as the cells it is looking for have been seen (the DSD
+labels sit at the top of a sheet that can hold thousands of rows).
+
+Engines are pluggable and convert cells exactly as the pandas engine of the
+same name does; the rows then go through pandas' TextParser with the
+read_excel defaults, so the DataFrame is the one pd.read_excel would return
+for the rows read:
+
+- openpyxl: .xlsx, read-only streaming mode (default for .xlsx)
+- xlrd: legacy .xls, loads only the selected sheet (default for .xls)
+- calamine: optional Rust backend for both formats (pip install python-calamine)
+
+Set EXCEL_READER_ENGINE to force an engine for every workbook.
+
+Usage:
+    python excel_reader.py <workbook> [sheet]
+"""
+
+import math
+import os
+import sys
+from datetime import date, time, timedelta
+
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+EXCEL_READER_ENGINE = os.environ.get("EXCEL_READER_ENGINE")
+
+
+class OpenpyxlEngine:
+    """openpyxl in read-only mode: rows are parsed from the sheet XML as they are iterated."""
+
+    name = "openpyxl"
+    # Trailing empty cells and rows are dropped, as pandas' openpyxl reader does
+    trims_empty = True
+
+    def __init__(self, path):
+        from openpyxl import load_workbook
+        self.book = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+
+    @property
+    def sheet_names(self):
+        return self.book.sheetnames
+
+    def iter_rows(self, sheet_name):
+        from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+        sheet = self.book[sheet_name]
+        # Some writers store a wrong <dimension>, which would cut the rows short
+        sheet.reset_dimensions()
+        for row in sheet.rows:
+            converted_row = []
+            for cell in row:
+                value = cell.value
+                if value is None:
+                    value = ""
+                elif cell.data_type == TYPE_ERROR:
+                    value = np.nan
+                elif cell.data_type == TYPE_NUMERIC:
+                    integer = int(value)
+                    value = integer if integer == value else float(value)
+                converted_row.append(value)
+            yield converted_row
+
+    def close(self):
+        self.book.close()
+
+
+class XlrdEngine:
+    """xlrd with on-demand loading: only the selected sheet of an .xls file is parsed."""
+
+    name = "xlrd"
+    trims_empty = False
+
+    def __init__(self, path):
+        import xlrd
+        self.book = xlrd.open_workbook(path, on_demand=True)
+
+    @property
+    def sheet_names(self):
+        return self.book.sheet_names()
+
+    def iter_rows(self, sheet_name):
+        from xlrd import XL_CELL_BOOLEAN, XL_CELL_DATE, XL_CELL_ERROR, XL_CELL_NUMBER, xldate
+
+        epoch1904 = self.book.datemode
+        sheet = self.book.sheet_by_name(sheet_name)
+
+        def convert(value, cell_type):
+            if cell_type == XL_CELL_DATE:
+                try:
+                    value = xldate.xldate_as_datetime(value, epoch1904)
+                except OverflowError:
+                    return value
+                # Dates on the epoch are times of day
+                if (not epoch1904 and value.timetuple()[0:3] == (1899, 12, 31)) or (
+                        epoch1904 and value.timetuple()[0:3] == (1904, 1, 1)):
+                    value = time(value.hour, value.minute, value.second, value.microsecond)
+            elif cell_type == XL_CELL_ERROR:
+                value = np.nan
+            elif cell_type == XL_CELL_BOOLEAN:
+                value = bool(value)
+            elif cell_type == XL_CELL_NUMBER and math.isfinite(value):
+                integer = int(value)
+                if integer == value:
+                    value = integer
+            return value
+
+        for i in range(sheet.nrows):
+            yield [convert(value, cell_type) for value, cell_type in zip(sheet.row_values(i), sheet.row_types(i))]
+
+    def close(self):
+        self.book.release_resources()
+
+
+class CalamineEngine:
+    """python-calamine (Rust): reads .xlsx and .xls several times faster than the pure Python engines."""
+
+    name = "calamine"
+    trims_empty = False
+
+    def __init__(self, path):
+        if CalamineWorkbook is None:
+            raise ImportError("python-calamine is not installed. Run: pip install python-calamine")
+        self.book = CalamineWorkbook.from_path(path)
+
+    @property
+    def sheet_names(self):
+        return self.book.sheet_names
+
+    def iter_rows(self, sheet_name):
+        sheet = self.book.get_sheet_by_name(sheet_name)
+        for row in sheet.to_python(skip_empty_area=False):
+            converted_row = []
+            for value in row:
+                if isinstance(value, float):
+                    integer = int(value)
+                    if integer == value:
+                        value = integer
+                elif isinstance(value, date):
+                    value = pd.Timestamp(value)
+                elif isinstance(value, timedelta):
+                    value = pd.Timedelta(value)
+                converted_row.append(value)
+            yield converted_row
+
+    def close(self):
+        close = getattr(self.book, "close", None)
+        if close:
+            close()
+
+
+EXCEL_ENGINES = {
+    "openpyxl": OpenpyxlEngine,
+    "xlrd": XlrdEngine,
+    "calamine": CalamineEngine,
+}
+
+
+def available_engines():
+    """Names of the engines whose library is installed."""
+    engines = ["openpyxl", "xlrd"]
+    if CalamineWorkbook is not None:
+        engines.append("calamine")
+    return engines
+
+
+def default_engine(path):
+    """Engine pd.read_excel would pick for path, unless EXCEL_READER_ENGINE overrides it."""
+    if EXCEL_READER_ENGINE:
+        return EXCEL_READER_ENGINE
+    return "xlrd" if path.lower().endswith('.xls') else "openpyxl"
+
+
+def select_sheet(sheet_names, prefer_sheet=None):
+    """The sheet named prefer_sheet (case-insensitive) if there is one, else the first sheet."""
+    if prefer_sheet:
+        for sheet_name in sheet_names:
+            if sheet_name.lower() == prefer_sheet.lower():
+                return sheet_name
+    return sheet_names[0]
+
+
+def stop_after_labels(labels, value_offset=1, header_rows=1):
+    """
+    Stop condition for read_sheet: every label has been seen and the rows after it were read.
+
+    Labels are matched as lowercase substrings of text cells below the header
+    row, so the rows read hold the first occurrence of each label and the
+    value `value_offset` rows below it.
+
+    Returns:
+        callable: (row_number, row) -> True once reading can stop
+    """
+    pending = {label.lower() for label in labels}
+    state = {"last_row_needed": -1}
+
+    def should_stop(row_number, row):
+        if pending and row_number >= header_rows:
+            for value in row:
+                if isinstance(value, str):
+                    lowered = value.lower()
+                    found = [label for label in pending if label in lowered]
+                    if found:
+                        pending.difference_update(found)
+                        state["last_row_needed"] = row_number + value_offset
+        return not pending and row_number >= state["last_row_needed"]
+
+    return should_stop
+
+
+def _trim_rows(data):
+    """Drop trailing empty rows and pad the rest to the same width (pandas' openpyxl layout)."""
+    last_row_with_data = -1
+    for row_number, row in enumerate(data):
+        if row:
+            last_row_with_data = row_number
+    data = data[:last_row_with_data + 1]
+    if data:
+        max_width = max(len(row) for row in data)
+        if min(len(row) for row in data) < max_width:
+            data = [row + (max_width - len(row)) * [""] for row in data]
+    return data
+
+
+def read_sheet_rows(path, sheet_name=None, prefer_sheet=None, engine=None, stop=None):
+    """
+    Read the converted cell rows of one sheet.
+
+    Args:
+        path: Workbook path
+        sheet_name: Sheet to read (default: prefer_sheet, else the first sheet)
+        prefer_sheet: Sheet name to use when present (case-insensitive)
+        engine: Engine name (default: by file extension)
+        stop: Optional callable(row_number, row); reading stops after the first
+              row for which it returns True (and after any empty rows before
+              the next non-empty one, so the result does not depend on where
+              reading stopped)
+
+    Returns:
+        tuple: (sheet name, rows as lists of cell values)
+    """
+    engine = engine or default_engine(path)
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'. Use one of {list(EXCEL_ENGINES)}")
+    reader = EXCEL_ENGINES[engine](path)
+    try:
+        sheet_names = reader.sheet_names
+        if sheet_name is None:
+            print(f"Available sheets: {sheet_names}")
+            sheet_name = select_sheet(sheet_names, prefer_sheet)
+            if prefer_sheet and sheet_name.lower() == prefer_sheet.lower():
+                print(f"Found '{prefer_sheet}' sheet: {sheet_name}")
+            elif prefer_sheet:
+                print(f"No '{prefer_sheet}' sheet found, using first sheet: {sheet_name}")
+        elif sheet_name not in sheet_names:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+        data = []
+        stopping = False
+        for row_number, row in enumerate(reader.iter_rows(sheet_name)):
+            if reader.trims_empty:
+                while row and row[-1] == "":
+                    row.pop()
+            data.append(row)
+            if stopping:
+                if any(value != "" for value in row):
+                    break
+            elif stop is not None and stop(row_number, row):
+                stopping = True
+                if any(value != "" for value in row):
+                    break
+    finally:
+        reader.close()
+
+    if reader.trims_empty:
+        data = _trim_rows(data)
+    return sheet_name, data
+
+
+def read_sheet(path, sheet_name=None, prefer_sheet=None, engine=None, stop=None):
+    """
+    Read one sheet into a DataFrame, like pd.read_excel(path, sheet_name=...).
+
+    Takes the same arguments as read_sheet_rows; with a stop condition the
+    DataFrame holds the rows read up to that point.
+
+    Returns:
+        pd.DataFrame: Sheet contents, first row as header
+    """
+    sheet_name, data = read_sheet_rows(path, sheet_name, prefer_sheet, engine, stop)
+    if not data:
+        return pd.DataFrame()
+    try:
+        # Same parser settings as pd.read_excel's defaults
+        return TextParser(data, header=0, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python excel_reader.py <workbook> [sheet]")
+        sys.exit(1)
+    df = read_sheet(sys.argv[1], sheet_name=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"📊 {len(df)} rows x {len(df.columns)} columns")
+    print(df.head(20).to_string())
@@ -0,0 +1,124 @@
+"""
+Transport configuration for the googleads SOAP services.
+
+Every GetService call builds a zeep client with its own requests session, so
+each service opened new TLS connections, all services shared the client's
+single one-hour timeout, and the LICA call shortened it by changing the
+process-wide socket default, which raced with other threads of the Dash
+server. gam_service returns a service whose transport has:
+
+- connect/read timeouts for that service (SERVICE_READ_TIMEOUTS), passed
+  with each request rather than through the socket module
+- a keep-alive connection pool shared by all services of the process
+- gzip-compressed responses (googleads' enable_compression)
+- retries with exponential backoff and jitter for connection failures and
+  throttled/unavailable responses; a request that may have reached GAM
+  (read timeout, other errors) is not resent, so creates are not duplicated
+"""
+
+import copy
+import os
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+GAM_API_VERSION = "v202408"
+GAM_CONNECT_TIMEOUT = float(os.environ.get("GAM_CONNECT_TIMEOUT", "10"))
+GAM_READ_TIMEOUT = float(os.environ.get("GAM_READ_TIMEOUT", "120"))
+GAM_POOL_SIZE = int(os.environ.get("GAM_POOL_SIZE", "16"))
+GAM_MAX_RETRIES = int(os.environ.get("GAM_MAX_RETRIES", "3"))
+GAM_RETRY_BACKOFF = float(os.environ.get("GAM_RETRY_BACKOFF", "1"))
+GAM_RETRY_JITTER = float(os.environ.get("GAM_RETRY_JITTER", "1"))
+GAM_COMPRESSION = os.environ.get("GAM_COMPRESSION", "1") != "0"
+
+# Read timeout (seconds) per service; everything else gets GAM_READ_TIMEOUT
+SERVICE_READ_TIMEOUTS = {
+    'CreativeService': 300,  # asset uploads
+    'LineItemCreativeAssociationService': 60,
+    'LineItemService': 180,
+    'PublisherQueryLanguageService': 120,
+}
+
+# Responses for which GAM has not processed the request
+RETRY_STATUS_CODES = (429, 502, 503)
+
+_adapter = None
+_adapter_lock = threading.Lock()
+
+
+def build_retry(retries=GAM_MAX_RETRIES, status_forcelist=RETRY_STATUS_CODES, allowed_methods=("GET", "POST")):
+    """
+    urllib3 Retry: exponential backoff with jitter, honouring Retry-After.
+
+    Read errors are never retried, since the request may already have been processed.
+    """
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        other=0,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(allowed_methods),
+        backoff_factor=GAM_RETRY_BACKOFF,
+        backoff_jitter=GAM_RETRY_JITTER,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def gam_adapter():
+    """HTTPAdapter shared by every GAM service of the process (one keep-alive pool per host)."""
+    global _adapter
+    with _adapter_lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(pool_connections=4, pool_maxsize=GAM_POOL_SIZE, max_retries=build_retry())
+        return _adapter
+
+
+def service_timeout(service_name):
+    """(connect, read) timeout for a service."""
+    return (GAM_CONNECT_TIMEOUT, SERVICE_READ_TIMEOUTS.get(service_name, GAM_READ_TIMEOUT))
+
+
+def configure_service(service, service_name=None, timeout=None):
+    """
+    Apply the pooled adapter and per-service timeouts to a service from client.GetService.
+
+    Args:
+        service: googleads service proxy
+        service_name: Service name, for SERVICE_READ_TIMEOUTS
+        timeout: (connect, read) or seconds, overriding the service default
+
+    Returns:
+        The same service
+    """
+    transport = getattr(getattr(service, 'zeep_client', None), 'transport', None)
+    if transport is None:
+        return service
+    adapter = gam_adapter()
+    # Mounted on the service's own session, so its headers, proxies and credentials stay its own
+    transport.session.mount('https://', adapter)
+    transport.session.mount('http://', adapter)
+    transport.operation_timeout = timeout or service_timeout(service_name)
+    return service
+
+
+def gam_service(client, service_name, version=GAM_API_VERSION, timeout=None):
+    """
+    client.GetService with per-service timeouts, pooled connections, retries and compression.
+
+    Args:
+        client (AdManagerClient): The Google Ad Manager client
+        service_name (str): e.g. 'CreativeService'
+        version (str): API version
+        timeout: (connect, read) or seconds, overriding the service default
+
+    Returns:
+        The service proxy
+    """
+    if GAM_COMPRESSION and getattr(client, 'enable_compression', True) is False:
+        client = copy.copy(client)
+        client.enable_compression = True
+    return configure_service(client.GetService(service_name, version=version), service_name, timeout)
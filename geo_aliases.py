@@ -0,0 +1,281 @@
+"""
+Geo alias table and fuzzy matcher for location names.
+
+DSD and sales inputs use short forms, old city names and cluster names
+("Bangalore", "Top 8 metros", "NCR"). This module maps them onto the names
+Ad Manager uses in Geo_Target:
+
+- GEO_ALIASES: alternate spelling -> GAM name; lookups still fall back to the
+  name as entered, and a target missing from the synced Geo_Target index is skipped
+- GEO_CLUSTERS: cluster name -> list of GAM names
+- GeoMatcher: trigram index + edit distance over all known names, used to
+  auto-correct near-exact typos and to rank suggestions for unknown names
+
+Extra aliases/clusters can be added without code changes in geo_aliases.json
+at the workspace root:
+    {"aliases": {"bombay": "Mumbai"}, "clusters": {"south metros": ["Chennai", "Bengaluru"]}}
+"""
+
+import json
+import os
+import threading
+from collections import Counter
+
+from config import WORKSPACE_ROOT
+from geo_index import get_geo_index, normalize_geo_name
+
+CUSTOM_ALIASES_PATH = os.path.join(WORKSPACE_ROOT, "geo_aliases.json")
+
+GEO_ALIASES = {
+    "bangalore": "Bengaluru",
+    "blr": "Bengaluru",
+    "bombay": "Mumbai",
+    "calcutta": "Kolkata",
+    "madras": "Chennai",
+    "poona": "Pune",
+    "gurgaon": "Gurugram",
+    "ggn": "Gurugram",
+    "mysore": "Mysuru",
+    "baroda": "Vadodara",
+    "cochin": "Kochi",
+    "trivandrum": "Thiruvananthapuram",
+    "vizag": "Visakhapatnam",
+    "pondicherry": "Puducherry",
+    "allahabad": "Prayagraj",
+    "banaras": "Varanasi",
+    "benares": "Varanasi",
+    "mangalore": "Mangaluru",
+    "hubli": "Hubballi",
+    "belgaum": "Belagavi",
+    "calicut": "Kozhikode",
+    "orissa": "Odisha",
+    "uttaranchal": "Uttarakhand",
+    "hyd": "Hyderabad",
+    "uae": "United Arab Emirates",
+    "usa": "United States",
+    "uk": "United Kingdom",
+}
+
+GEO_CLUSTERS = {
+    "ncr": ["Delhi", "Gurugram", "Noida", "Ghaziabad", "Faridabad"],
+    "delhi ncr": ["Delhi", "Gurugram", "Noida", "Ghaziabad", "Faridabad"],
+    "top 4 metros": ["Mumbai", "Delhi", "Kolkata", "Chennai"],
+    "top 6 metros": ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Kolkata", "Hyderabad"],
+    "top 8 metros": ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Pune", "Ahmedabad"],
+    "metros": ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Kolkata", "Hyderabad", "Pune", "Ahmedabad"],
+    "mmr": ["Mumbai", "Thane", "Navi Mumbai"],
+}
+
+# Minimum combined score for silently correcting a typo to a known name
+FUZZY_AUTO_MATCH_SCORE = 0.8
+# Required lead of the best candidate over the runner-up for auto-correction
+FUZZY_AUTO_MATCH_MARGIN = 0.1
+
+
+def _load_custom_aliases():
+    """Merge aliases/clusters from geo_aliases.json into the built-in tables."""
+    if not os.path.exists(CUSTOM_ALIASES_PATH):
+        return
+    try:
+        with open(CUSTOM_ALIASES_PATH, 'r', encoding='utf-8') as f:
+            custom = json.load(f)
+        for alias, name in custom.get("aliases", {}).items():
+            GEO_ALIASES[normalize_geo_name(alias)] = name
+        for cluster, names in custom.get("clusters", {}).items():
+            GEO_CLUSTERS[normalize_geo_name(cluster)] = list(names)
+        print(f"📍 Loaded custom geo aliases from {CUSTOM_ALIASES_PATH}")
+    except Exception as e:
+        print(f"⚠️ Could not load custom geo aliases from {CUSTOM_ALIASES_PATH}: {e}")
+
+
+_load_custom_aliases()
+
+
+def canonical_geo_name(name):
+    """Return the GAM name for an alias, or the name itself."""
+    return GEO_ALIASES.get(normalize_geo_name(name), str(name).strip())
+
+
+def geo_name_candidates(name):
+    """
+    Names to look a location up by, in order: its alias target, then the name as entered.
+
+    When the Geo_Target index is synced, an alias target it does not contain is
+    left out, so an alias that is not a GAM name cannot hide the original spelling.
+
+    Returns:
+        list: One or two names
+    """
+    name = str(name).strip()
+    target = canonical_geo_name(name)
+    if normalize_geo_name(target) == normalize_geo_name(name):
+        return [name]
+    geo_index = get_geo_index()
+    if geo_index.is_available and not geo_index.candidates(target):
+        print(f"⚠️ Geo alias target '{target}' for '{name}' is not in the Geo_Target index, using '{name}'")
+        return [name]
+    print(f"📍 Mapped geo alias '{name}' to '{target}' (falling back to '{name}')")
+    return [target, name]
+
+
+def expand_geo_names(names):
+    """
+    Expand cluster names into their member locations.
+
+    Other names are kept as entered; get_geo_ids tries their alias targets first.
+
+    Args:
+        names: List of location names as entered by the user
+
+    Returns:
+        list: Location names to resolve, de-duplicated in input order
+    """
+    expanded = []
+    for name in names:
+        cluster = GEO_CLUSTERS.get(normalize_geo_name(name))
+        if cluster:
+            print(f"📍 Expanded geo cluster '{name}' to: {cluster}")
+            expanded.extend(cluster)
+        else:
+            expanded.append(name)
+    return list(dict.fromkeys(expanded))
+
+
+def _trigrams(normalized_name):
+    padded = f"  {normalized_name} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a, b, max_distance=None):
+    """Levenshtein distance; stops early once every cell exceeds max_distance."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class GeoMatcher:
+    """
+    Trigram index over location names with edit-distance re-ranking.
+
+    Args:
+        names: Names that can be suggested and auto-corrected to
+        suggest_only: Names that are suggested but never auto-corrected to
+    """
+
+    def __init__(self, names, suggest_only=()):
+        self._names = []
+        self._normalized = []
+        self._trigram_counts = []
+        self._postings = {}
+        names = list(names)
+        seen = set()
+        for name in names + list(suggest_only):
+            normalized = normalize_geo_name(name)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            name_id = len(self._names)
+            self._names.append(name)
+            self._normalized.append(normalized)
+            grams = set(_trigrams(normalized))
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(name_id)
+        # A name in both lists stays a correction target
+        self._suggest_only = set(normalize_geo_name(name) for name in suggest_only) - set(normalize_geo_name(name) for name in names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def suggest(self, name, limit=5, min_score=0.4, shortlist=25):
+        """
+        Rank known names by similarity to name.
+
+        Returns:
+            list: (name, score) tuples, best first, score in [0, 1]
+        """
+        normalized = normalize_geo_name(name)
+        if not normalized:
+            return []
+        grams = set(_trigrams(normalized))
+        shared = Counter()
+        for gram in grams:
+            for name_id in self._postings.get(gram, ()):
+                shared[name_id] += 1
+
+        # Dice coefficient on trigrams selects a shortlist, edit distance re-ranks it
+        shortlisted = sorted(
+            ((2.0 * count / (len(grams) + self._trigram_counts[name_id]), name_id)
+             for name_id, count in shared.items()),
+            reverse=True
+        )[:shortlist]
+
+        ranked = []
+        for dice, name_id in shortlisted:
+            candidate = self._normalized[name_id]
+            longest = max(len(candidate), len(normalized))
+            distance = edit_distance(normalized, candidate, max_distance=longest)
+            score = 0.3 * dice + 0.7 * (1.0 - distance / longest)
+            if score >= min_score:
+                ranked.append((self._names[name_id], round(score, 3)))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def best_match(self, name):
+        """Return the single confident correction for name, or None."""
+        ranked = self.suggest(name, limit=2)
+        if not ranked or ranked[0][1] < FUZZY_AUTO_MATCH_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < FUZZY_AUTO_MATCH_MARGIN:
+            return None
+        if normalize_geo_name(ranked[0][0]) in self._suggest_only:
+            return None
+        return ranked[0][0]
+
+
+_geo_matcher = None
+_geo_matcher_synced_at = None
+_geo_matcher_lock = threading.Lock()
+
+
+def get_geo_matcher():
+    """
+    Return the process-wide GeoMatcher, rebuilt whenever the Geo_Target index is re-synced.
+
+    Without a synced index the matcher only knows alias, cluster and canonical names.
+    Cluster names are only suggested: expand_geo_names has already run when names
+    are corrected, so a name corrected to a cluster would be looked up as one location.
+    """
+    global _geo_matcher, _geo_matcher_synced_at
+    geo_index = get_geo_index()
+    synced_at = geo_index.synced_at if geo_index.is_available else None
+    if _geo_matcher is None or synced_at != _geo_matcher_synced_at:
+        with _geo_matcher_lock:
+            if _geo_matcher is None or synced_at != _geo_matcher_synced_at:
+                names = list(GEO_ALIASES.values())
+                names.extend(alias.title() for alias in GEO_ALIASES)
+                if synced_at:
+                    names.extend(geo_index.names())
+                _geo_matcher = GeoMatcher(names, suggest_only=[cluster.title() for cluster in GEO_CLUSTERS])
+                _geo_matcher_synced_at = synced_at
+                print(f"📍 Built geo trigram index over {len(_geo_matcher)} names")
+    return _geo_matcher
+
+
+def suggest_geo_names(name, limit=5):
+    """Ranked suggestions (name, score) for an unknown location name."""
+    return get_geo_matcher().suggest(name, limit=limit)
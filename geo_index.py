@@ -0,0 +1,307 @@
+"""
+Offline Geo_Target index for geo ID resolution.
+
+The index is a local copy of the targetable Geo_Target rows, bulk-synced once
+from Ad Manager through paginated PQL and stored as JSON in the cache folder.
+Lookups apply the same rules as the live queries in single_line.get_geo_id:
+
+1. Type precedence: COUNTRY -> REGION/PROVINCE/STATE/DEPARTMENT -> CITY -> SUB_DISTRICT
+2. Pakistan (PK) is excluded for everything below country level
+3. India (IN) matches win over US matches, which win over anything else
+
+Usage:
+    python geo_index.py sync      # download/refresh the index
+    python geo_index.py status    # show what is currently stored
+    python geo_index.py lookup Mumbai
+    python geo_index.py clear-cache   # forget cached live PQL answers
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from googleads import ad_manager
+
+from cache_utils import TTLDiskCache
+from config import CACHE_DIR
+from gam_transport import gam_service
+
+GEO_INDEX_PATH = os.path.join(CACHE_DIR, "geo_target_index.json")
+GEO_LOOKUP_CACHE_PATH = os.path.join(CACHE_DIR, "geo_lookup_cache.json")
+
+# Live PQL answers are shared by every process through GEO_LOOKUP_CACHE_PATH.
+# Resolved IDs are stable, confirmed misses are re-checked sooner.
+GEO_CACHE_TTL = 7 * 24 * 3600
+GEO_NEGATIVE_CACHE_TTL = 6 * 3600
+GEO_CACHE_MAX_ENTRIES = 5000
+
+# (label, Geo_Target types) in the order they are tried
+GEO_TYPE_PRECEDENCE = [
+    ("COUNTRY", ("COUNTRY",)),
+    ("REGION", ("REGION", "PROVINCE", "STATE", "DEPARTMENT")),
+    ("CITY", ("CITY",)),
+    ("SUB_DISTRICT", ("SUB_DISTRICT",)),
+]
+
+EXCLUDED_COUNTRY_CODES = ("PK",)
+PREFERRED_COUNTRY_CODES = ("IN", "US")
+
+INDEXED_GEO_TYPES = [geo_type for _, geo_types in GEO_TYPE_PRECEDENCE for geo_type in geo_types]
+
+
+def normalize_geo_name(name):
+    """Normalize a location name for index lookups (case and whitespace insensitive)."""
+    return " ".join(str(name).split()).lower()
+
+
+def pick_preferred_match(matches):
+    """Return the IN match if any, else the US match, else the first match."""
+    for country_code in PREFERRED_COUNTRY_CODES:
+        for match in matches:
+            if match["CountryCode"] == country_code:
+                return match
+    return matches[0] if matches else None
+
+
+def resolve_from_matches(matches):
+    """
+    Apply type precedence and country preference to a list of Geo_Target rows.
+
+    Args:
+        matches: List of dicts with Id, Name, Type and CountryCode keys, all for the same name
+
+    Returns:
+        tuple: (geo_type_label, match dict), or (None, None) if nothing is targetable
+    """
+    for geo_type, allowed_types in GEO_TYPE_PRECEDENCE:
+        candidates = [
+            m for m in matches
+            if m["Type"] in allowed_types
+            and (geo_type == "COUNTRY" or m["CountryCode"] not in EXCLUDED_COUNTRY_CODES)
+        ]
+        if candidates:
+            return geo_type, pick_preferred_match(candidates)
+    return None, None
+
+
+def parse_geo_rows(response):
+    """Convert a PQL Geo_Target response (Id, Name, Targetable, Type, CountryCode) into dicts."""
+    matches = []
+    if 'rows' in response and response['rows']:
+        for row in response['rows']:
+            values = row["values"]
+            matches.append({
+                "Id": values[0]["value"],
+                "Name": values[1]["value"],
+                "Targetable": values[2]["value"],
+                "Type": values[3]["value"],
+                "CountryCode": values[4]["value"]
+            })
+    return matches
+
+
+class GeoTargetIndex:
+    """In-process Geo_Target index persisted to a JSON file."""
+
+    def __init__(self, path=GEO_INDEX_PATH):
+        self.path = path
+        self.synced_at = None
+        self._by_name = {}
+        self._row_count = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def is_available(self):
+        """True when the index has been synced and holds rows."""
+        self._ensure_loaded()
+        return self._row_count > 0
+
+    @property
+    def row_count(self):
+        self._ensure_loaded()
+        return self._row_count
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        payload = json.load(f)
+                    self._build(payload.get("rows", []))
+                    self.synced_at = payload.get("synced_at")
+                    print(f"📍 Loaded Geo_Target index with {self._row_count} rows (synced {self.synced_at})")
+                except Exception as e:
+                    print(f"⚠️ Could not load Geo_Target index from {self.path}: {e}")
+            self._loaded = True
+
+    def _build(self, rows):
+        by_name = {}
+        for geo_id, name, geo_type, country_code in rows:
+            by_name.setdefault(normalize_geo_name(name), []).append({
+                "Id": geo_id,
+                "Name": name,
+                "Targetable": True,
+                "Type": geo_type,
+                "CountryCode": country_code
+            })
+        self._by_name = by_name
+        self._row_count = len(rows)
+
+    def candidates(self, location_name):
+        """Return every indexed row whose name matches location_name."""
+        self._ensure_loaded()
+        return list(self._by_name.get(normalize_geo_name(location_name), []))
+
+    def names(self):
+        """Return the distinct indexed names (original spelling of the first row)."""
+        self._ensure_loaded()
+        return [rows[0]["Name"] for rows in self._by_name.values()]
+
+    def lookup(self, location_name):
+        """
+        Resolve a name entirely from the index.
+
+        Returns:
+            tuple: (geo_type_label, match dict), or (None, None) on a miss
+        """
+        return resolve_from_matches(self.candidates(location_name))
+
+    def sync(self, client, page_size=ad_manager.SUGGESTED_PAGE_LIMIT):
+        """
+        Download all targetable Geo_Target rows with paginated PQL and persist them.
+
+        Args:
+            client: AdManagerClient
+            page_size: Rows per PQL page
+
+        Returns:
+            int: Number of rows stored
+        """
+        pql_service = gam_service(client, "PublisherQueryLanguageService")
+        type_list = ", ".join(f"'{geo_type}'" for geo_type in INDEXED_GEO_TYPES)
+        statement = (ad_manager.StatementBuilder()
+                     .Select('Id, Name, Targetable, Type, CountryCode')
+                     .From('Geo_Target')
+                     .Where(f"Targetable = true AND Type IN ({type_list})")
+                     .OrderBy('Id', ascending=True)
+                     .Limit(page_size))
+
+        rows = []
+        start = time.time()
+        while True:
+            response = pql_service.select(statement.ToStatement())
+            page = parse_geo_rows(response)
+            if not page:
+                break
+            rows.extend([m["Id"], m["Name"], m["Type"], m["CountryCode"]] for m in page)
+            print(f"📥 Synced {len(rows)} Geo_Target rows...")
+            if len(page) < page_size:
+                break
+            statement.offset += page_size
+
+        payload = {
+            "synced_at": datetime.now().isoformat(),
+            "rows": rows
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+
+        with self._lock:
+            self._build(rows)
+            self.synced_at = payload["synced_at"]
+            self._loaded = True
+
+        print(f"✅ Geo_Target index synced: {len(rows)} rows in {time.time() - start:.1f}s")
+        return len(rows)
+
+    def reload(self):
+        """Drop the in-memory copy so the next lookup re-reads the file."""
+        with self._lock:
+            self._by_name = {}
+            self._row_count = 0
+            self.synced_at = None
+            self._loaded = False
+
+
+# Normalized location name -> Geo ID, or None for a confirmed miss
+geo_lookup_cache = TTLDiskCache(GEO_LOOKUP_CACHE_PATH, ttl=GEO_CACHE_TTL, max_entries=GEO_CACHE_MAX_ENTRIES)
+
+
+def cache_geo_lookup(location_name, geo_id):
+    """Remember a live PQL answer; geo_id=None records a confirmed miss."""
+    cache_geo_lookups({location_name: geo_id})
+
+
+def cache_geo_lookups(results):
+    """Remember several live PQL answers (name -> Geo ID or None) with one file write per TTL."""
+    found = [(normalize_geo_name(name), geo_id) for name, geo_id in results.items() if geo_id is not None]
+    missing = [(normalize_geo_name(name), None) for name, geo_id in results.items() if geo_id is None]
+    if found:
+        geo_lookup_cache.set_many(found, ttl=GEO_CACHE_TTL)
+    if missing:
+        geo_lookup_cache.set_many(missing, ttl=GEO_NEGATIVE_CACHE_TTL)
+
+
+def cached_geo_lookup(location_name):
+    """
+    Look up a location in the shared geo lookup cache.
+
+    Returns:
+        tuple: (found, geo_id) where found=True with geo_id=None means a cached miss
+    """
+    return geo_lookup_cache.lookup(normalize_geo_name(location_name))
+
+
+_geo_index = None
+_geo_index_lock = threading.Lock()
+
+
+def get_geo_index():
+    """Return the process-wide GeoTargetIndex."""
+    global _geo_index
+    if _geo_index is None:
+        with _geo_index_lock:
+            if _geo_index is None:
+                _geo_index = GeoTargetIndex()
+    return _geo_index
+
+
+def refresh_geo_index(client):
+    """Re-sync the process-wide index from Ad Manager."""
+    return get_geo_index().sync(client)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    index = get_geo_index()
+
+    if command == "sync":
+        client = ad_manager.AdManagerClient.LoadFromStorage("googleads1.yaml")
+        index.sync(client)
+    elif command == "lookup":
+        for name in sys.argv[2:]:
+            geo_type, match = index.lookup(name)
+            if match:
+                print(f"✅ {name}: {geo_type} {match['Name']}, {match['CountryCode']}, ID: {match['Id']}")
+            else:
+                print(f"❌ {name}: not in index")
+    elif command == "clear-cache":
+        geo_lookup_cache.clear()
+        print(f"🗑️ Cleared geo lookup cache at {GEO_LOOKUP_CACHE_PATH}")
+    else:
+        if index.is_available:
+            print(f"📍 Geo_Target index: {index.row_count} rows, synced {index.synced_at}")
+        else:
+            print(f"❌ No Geo_Target index at {index.path}. Run: python geo_index.py sync")
+        print(f"📍 Geo lookup cache: {len(geo_lookup_cache)} live entries")
@@ -1,16 +1,77 @@
+import os
+import threading
+
 from googleads import ad_manager
+from cache_utils import TTLDiskCache
+from gam_transport import gam_service
 
+ORDER_CACHE_TTL = int(os.environ.get("ORDER_CACHE_TTL", str(12 * 3600)))
+ORDER_FIELDS = ('id', 'name', 'advertiserId', 'currencyCode', 'status', 'startDateTime', 'endDateTime')
 
-def fetch_advertiser_id_from_order(client, order_id):
-    order_service = client.GetService('OrderService', version='v202408')  # Adjust the version as needed
-    statement = ad_manager.StatementBuilder().Where('id = :order_id').WithBindVariable('order_id', order_id)
-    try:
+# (network code, order ID) -> order metadata; in memory, shared by every lookup in the process
+order_cache = TTLDiskCache(ttl=ORDER_CACHE_TTL, max_entries=1000)
+_order_fetch_lock = threading.Lock()
+
+
+def _order_key(client, order_id):
+    return (getattr(client, 'network_code', None), str(order_id))
+
+
+def _order_metadata(order):
+    return {field: getattr(order, field, None) for field in ORDER_FIELDS}
+
+
+def remember_order(client, order):
+    """Cache an order object returned by OrderService (e.g. right after createOrders)."""
+    metadata = _order_metadata(order)
+    order_cache.set(_order_key(client, metadata['id']), metadata)
+    return metadata
+
+
+def get_order_metadata(client, order_id, refresh=False):
+    """
+    Fetch id, name, advertiserId, currencyCode, status and dates of an order, once per ORDER_CACHE_TTL.
+
+    Args:
+        client (AdManagerClient): The Google Ad Manager client
+        order_id: Order ID
+        refresh (bool): Fetch from GAM even if the order is cached
+
+    Returns:
+        dict: Order metadata, or None if there is no such order (not cached)
+    """
+    key = _order_key(client, order_id)
+    if not refresh:
+        found, metadata = order_cache.lookup(key)
+        if found:
+            return metadata
+    with _order_fetch_lock:
+        # Another thread may have fetched it while we waited
+        found, metadata = order_cache.lookup(key)
+        if found and not refresh:
+            return metadata
+        order_service = gam_service(client, 'OrderService')
+        statement = ad_manager.StatementBuilder().Where('id = :order_id').WithBindVariable('order_id', order_id)
         response = order_service.getOrdersByStatement(statement.ToStatement())
-        orders = response.results  
+        orders = getattr(response, 'results', None)
+        if not orders:
+            return None
+        return remember_order(client, orders[0])
+
+
+def invalidate_order(client, order_id=None):
+    """Drop one cached order (or every cached order when order_id is None), e.g. after updating it."""
+    if order_id is None:
+        order_cache.clear()
+    else:
+        order_cache.delete(_order_key(client, order_id))
 
 
-        if orders:
-            advertiser_id = orders[0].advertiserId
+def fetch_advertiser_id_from_order(client, order_id):
+    try:
+        order = get_order_metadata(client, order_id)
+        if order:
+            advertiser_id = order['advertiserId']
             return advertiser_id
         else:
             raise ValueError(f'No order found with ID: {order_id}')
@@ -21,22 +82,11 @@ def fetch_advertiser_id_from_order(client, order_id):
         return None
 def get_order_name(client,order_id ):
     """Fetch the name of the order for a given order_id."""
-    # Initialize the OrderService
-    order_service = client.GetService('OrderService')
-
-    # Create a statement to filter the order by its ID
-    statement = ad_manager.StatementBuilder().Where('id = :order_id').WithBindVariable('order_id', order_id)
-
-    # Get the orders matching the statement
-    response = order_service.getOrdersByStatement(statement.ToStatement())
+    order = get_order_metadata(client, order_id)
 
-    if 'results' in response:
-        # If results exist, return the name of the first order
-        order = response['results'][0]
+    if order:
+        # If the order exists, return its name
         return order['name']
     else:
         print(f'No order found for order_id: {order_id}')
         return None
-    
-
-
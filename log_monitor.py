@@ -342,6 +342,7 @@ class LogMonitor:
             "avg_line_creation_time": 0,
             "avg_creative_creation_time": 0,
             "avg_placement_lookup_time": 0,
+            "avg_placement_fetch_time_by_mode": {},
             "performance_trends": [],
             "slowest_operations": [],
             "fastest_operations": []
@@ -354,6 +355,7 @@ class LogMonitor:
         line_times = []
         creative_times = []
         placement_times = []
+        fetch_times_by_mode = {}
         
         for entry in perf_entries:
             metrics = entry.get("metrics", {})
@@ -377,6 +379,8 @@ class LogMonitor:
                 creative_times.append(creative_time)
             if placement_time:
                 placement_times.append(placement_time)
+            if metrics.get("placement_fetch_time"):
+                fetch_times_by_mode.setdefault(metrics.get("placement_fetch_mode", "unknown"), []).append(metrics["placement_fetch_time"])
         
         # Calculate averages
         if total_times:
@@ -387,6 +391,8 @@ class LogMonitor:
             report["avg_creative_creation_time"] = sum(creative_times) / len(creative_times)
         if placement_times:
             report["avg_placement_lookup_time"] = sum(placement_times) / len(placement_times)
+        for mode, times in fetch_times_by_mode.items():
+            report["avg_placement_fetch_time_by_mode"][mode] = sum(times) / len(times)
         
         # Find slowest and fastest operations
         sorted_times = sorted(total_times, reverse=True)
@@ -245,6 +245,33 @@ class LineItemLogger:
         
         self.analytics_logger.info(json.dumps(log_entry))
     
+    def log_unresolved_locations(self, unresolved: Dict[str, List[str]], line_name: str, session_id: str = None):
+        """
+        Log geo targeting names that could not be resolved, with their suggestions
+        
+        Args:
+            unresolved: Location name as entered -> suggested names
+            line_name: Line item name
+            session_id: Session identifier
+        """
+        timestamp = self.get_current_timestamp()
+        
+        log_entry = {
+            "timestamp": timestamp,
+            "event_type": "UNRESOLVED_LOCATIONS",
+            "session_id": session_id,
+            "system_email": self.system_email,
+            "line_name": line_name,
+            "unresolved_locations": unresolved
+        }
+        
+        self.line_logger.warning(f"⚠️ LOCATIONS NOT TARGETED")
+        self.line_logger.warning(f"Line Name: {line_name}")
+        for name, suggestions in unresolved.items():
+            self.line_logger.warning(f"Location '{name}': did you mean {', '.join(suggestions) if suggestions else 'no suggestions'}")
+        
+        self.analytics_logger.info(json.dumps(log_entry))
+    
     def log_creative_creation(self, template_id: str, creative_id: str, size: str, asset_files: List[str] = None, session_id: str = None):
         """
         Log creative creation details
@@ -333,6 +360,8 @@ class LineItemLogger:
         self.performance_logger.info(f"Total Time: {metrics.get('total_time', 'N/A')}s")
         self.performance_logger.info(f"Data Processing: {metrics.get('data_processing_time', 'N/A')}s")
         self.performance_logger.info(f"Placement Lookup: {metrics.get('placement_lookup_time', 'N/A')}s")
+        if 'placement_fetch_time' in metrics:
+            self.performance_logger.info(f"Placement Fetch ({metrics.get('placement_fetch_mode', 'N/A')}): {metrics['placement_fetch_time']}s")
         self.performance_logger.info(f"Line Creation: {metrics.get('line_creation_time', 'N/A')}s")
         self.performance_logger.info(f"Creative Creation: {metrics.get('creative_creation_time', 'N/A')}s")
         
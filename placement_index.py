@@ -0,0 +1,231 @@
+"""
+Inverted index over a placement worksheet.
+
+fetch_placements_ids used to scan every sheet row for every size group. The
+index is built once per worksheet snapshot and answers a size group with set
+lookups while returning exactly what the row scan returned:
+
+- site, section and ad type match when any filter value is a substring of the
+  (uppercased) cell, so each distinct cell value is tested once per filter
+  value and the result is memoized
+- platform matches on the comma separated tokens of the platform cell, with
+  the 1260x570 (WEB), 320x480 (AMP/MWEB) and richmedia overrides
+- placement IDs come back in sheet order, duplicates included
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+
+
+def clean_sheet_headers(headers):
+    """Strip headers and make empty/duplicate ones unique (empty_col_N, Name_1, ...)."""
+    clean_headers = []
+    header_count = {}
+    for header in headers:
+        clean_header = header.strip()
+        if not clean_header:
+            # Handle empty headers by giving them a unique name
+            clean_header = f"empty_col_{len(clean_headers)}"
+        elif clean_header in header_count:
+            # Handle duplicate headers by appending a number
+            header_count[clean_header] += 1
+            clean_header = f"{clean_header}_{header_count[clean_header]}"
+        else:
+            header_count[clean_header] = 0
+        clean_headers.append(clean_header)
+    return clean_headers
+
+
+def map_placement_columns(headers):
+    """Find the site/platform/adtype/section/placement columns from the raw headers."""
+    column_mapping = {}
+    for col in headers:
+        col_upper = col.upper()
+        if 'SITE' in col_upper:
+            column_mapping['site'] = col
+        elif 'PLATFORM' in col_upper:
+            column_mapping['platform'] = col
+        elif 'AD TYPE' in col_upper or 'ADTYPE' in col_upper:
+            column_mapping['adtype'] = col
+        elif 'SECTION' in col_upper:
+            column_mapping['section'] = col
+        elif 'PLACEMENT' in col_upper:
+            column_mapping['placement'] = col
+    return column_mapping
+
+
+PLACEMENT_FIELDS = ('site', 'platform', 'section', 'adtype', 'placement')
+
+# Resolved targeting signatures remembered per snapshot (least recently used evicted first)
+PLACEMENT_MEMO_SIZE = 256
+
+# Sizes whose platform check ignores the user's platform selection
+FIXED_SIZE_PLATFORMS = {
+    "1260x570": ["WEB"],
+    "320x480": ["AMP", "MWEB"],
+}
+
+
+class PlacementIndex:
+    """Placement rows of one worksheet, indexed by site, platform, section and ad type."""
+
+    def __init__(self, all_values):
+        headers = all_values[0] if all_values else []
+        self.headers = headers
+        self.clean_headers = clean_sheet_headers(headers)
+        self.column_mapping = map_placement_columns(headers)
+        self.row_count = max(len(all_values) - 1, 0)
+        self.missing_columns = [field for field in PLACEMENT_FIELDS if field not in self.column_mapping]
+
+        self._placements = []        # position -> placement ID, sheet order
+        self._values = {'site': {}, 'section': {}, 'adtype': {}}  # field -> cell value -> positions
+        self._platforms = {}         # platform token -> positions
+        self._memo = {}
+        self._results = OrderedDict()  # targeting signature -> placement data
+        self._lock = threading.Lock()
+
+        if self.missing_columns or not all_values:
+            return
+
+        # Rows are keyed by cleaned header while the mapping holds raw headers,
+        # so a raw header only finds the column whose cleaned name equals it
+        clean_index = {header: i for i, header in enumerate(self.clean_headers)}
+        columns = {field: clean_index.get(self.column_mapping[field]) for field in PLACEMENT_FIELDS}
+
+        def cell(row_values, field):
+            i = columns[field]
+            return row_values[i] if i is not None and i < len(row_values) else ''
+
+        for row_values in all_values[1:]:
+            placement = str(cell(row_values, 'placement')).strip()
+            if not placement:
+                continue
+            position = len(self._placements)
+            self._placements.append(placement)
+            for field in ('site', 'section', 'adtype'):
+                self._values[field].setdefault(str(cell(row_values, field)).upper(), []).append(position)
+            for token in set(p.strip() for p in str(cell(row_values, 'platform')).upper().split(',')):
+                self._platforms.setdefault(token, []).append(position)
+
+    def __len__(self):
+        return len(self._placements)
+
+    def _containing(self, field, needle):
+        """Positions whose field value contains needle (memoized per snapshot)."""
+        key = (field, needle)
+        positions = self._memo.get(key)
+        if positions is None:
+            positions = set()
+            for value, value_positions in self._values[field].items():
+                if needle in value:
+                    positions.update(value_positions)
+            with self._lock:
+                self._memo[key] = positions
+        return positions
+
+    def _matching(self, field, needles):
+        positions = set()
+        for needle in needles:
+            positions |= self._containing(field, needle)
+        return positions
+
+    def _on_platforms(self, platforms):
+        positions = set()
+        for platform in platforms:
+            positions.update(self._platforms.get(platform.strip().upper(), ()))
+        return positions
+
+    def find(self, site_filter, platforms, section_values, adtype_values):
+        """
+        Placement IDs matching every filter, in sheet order.
+
+        Args:
+            site_filter: Uppercased site names (substring match)
+            platforms: Platform names (exact token match, case-insensitive)
+            section_values: Uppercased sections (substring match)
+            adtype_values: Uppercased ad types (substring match)
+
+        Returns:
+            list: Placement IDs
+        """
+        if not self._placements:
+            return []
+        positions = self._matching('site', site_filter)
+        if positions:
+            positions &= self._on_platforms(platforms)
+        if positions:
+            positions &= self._matching('section', section_values)
+        if positions:
+            positions &= self._matching('adtype', adtype_values)
+        return [self._placements[position] for position in sorted(positions)]
+
+    def cached_result(self, signature):
+        """Placement data previously stored for signature (a private copy), or None."""
+        with self._lock:
+            result = self._results.get(signature)
+            if result is None:
+                return None
+            self._results.move_to_end(signature)
+        return copy.deepcopy(result)
+
+    def store_result(self, signature, placement_data):
+        """Remember placement data for signature; the index is per snapshot, so entries die with it."""
+        with self._lock:
+            self._results[signature] = copy.deepcopy(placement_data)
+            self._results.move_to_end(signature)
+            while len(self._results) > PLACEMENT_MEMO_SIZE:
+                self._results.popitem(last=False)
+
+    def platforms_for_size(self, adtype, platforms_filter, richmedia_platform_map=None):
+        """Platforms a size group is matched against (fixed sizes, richmedia, else the user's)."""
+        if adtype in FIXED_SIZE_PLATFORMS:
+            return FIXED_SIZE_PLATFORMS[adtype]
+        if richmedia_platform_map and adtype in richmedia_platform_map:
+            return richmedia_platform_map[adtype]
+        return platforms_filter
+
+
+_indexes = {}  # (sheet_url, sheet_name) -> (all_values, PlacementIndex)
+_indexes_lock = threading.Lock()
+
+
+def targeting_signature(site_filter, platforms_filter, adtype_filters, richmedia_platform_map=None, line_type="standard"):
+    """
+    Canonical, hashable form of the inputs that decide fetch_placements_ids' result.
+
+    Sites and platforms are matched as sets, so their order and case are ignored;
+    filter lists keep their order because they are echoed back in the result.
+    """
+    size_groups = tuple(
+        (adtype,
+         tuple(ad.upper() for ad in (filters.get("adtype_filter", []) or filters.get("adtypes", []))),
+         tuple(section.upper() for section in (filters.get("section_filter", []) or filters.get("sections", []))))
+        for adtype, filters in adtype_filters.items()
+    )
+    richmedia = tuple(sorted(
+        (adtype, tuple(sorted(set(p.strip().upper() for p in platforms))))
+        for adtype, platforms in (richmedia_platform_map or {}).items()
+        if adtype in adtype_filters
+    ))
+    return (
+        tuple(sorted(set(s.upper() for s in site_filter))),
+        tuple(sorted(set(p.strip().upper() for p in platforms_filter))),
+        size_groups,
+        richmedia,
+        line_type,
+    )
+
+
+def get_placement_index(sheet_url, sheet_name, all_values):
+    """Return the PlacementIndex for a worksheet snapshot, building it only when the snapshot changed."""
+    key = (sheet_url, sheet_name)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] is all_values:
+            return cached[1]
+    index = PlacementIndex(all_values)
+    with _indexes_lock:
+        _indexes[key] = (all_values, index)
+    print(f"🗂️ Built placement index for '{sheet_name}': {len(index)} placements from {index.row_count} rows")
+    return index
@@ -0,0 +1,268 @@
+"""
+Local SQLite mirror of the placement worksheets.
+
+`python placement_mirror.py sync` copies the TOI, ET and Languages placement
+worksheets into cache/placement_mirror.sqlite. fetch_placements_ids can then
+read placements from the mirror ("mirror" source), or fall back to it when
+Google Sheets is unreachable or over quota ("auto" source).
+
+Tables:
+- worksheets: one row per mirrored worksheet with row count and last sync time
+- sheet_rows: the raw worksheet rows (JSON), so filtering behaves exactly as on the sheet
+- placements: site/platform/section/ad type/placement ID per row, indexed for lookups
+
+fetch_placements_ids matches the rows with the same PlacementIndex as sheet
+downloads; loaded worksheets are kept in memory until the next sync, so the
+index and its targeting memo are reused across lookups.
+
+Usage:
+    python placement_mirror.py sync
+    python placement_mirror.py status
+    python placement_mirror.py lookup 22839441234
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+from gspread.utils import extract_id_from_url
+
+from config import (CACHE_DIR, CREDENTIALS_PATH, PLACEMENT_SHEET_URL, PLACEMENT_SHEET_NAME_TOI,
+                    PLACEMENT_SHEET_NAME_ET, PLACEMENT_SHEET_NAME_LANG)
+from placement_index import clean_sheet_headers, map_placement_columns
+from sheet_snapshot import get_sheets_client, load_sheets_values, sheet_snapshots
+
+PLACEMENT_MIRROR_PATH = os.path.join(CACHE_DIR, "placement_mirror.sqlite")
+
+MIRRORED_SHEETS = [PLACEMENT_SHEET_NAME_TOI, PLACEMENT_SHEET_NAME_ET, PLACEMENT_SHEET_NAME_LANG]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS worksheets (
+    sheet_name TEXT PRIMARY KEY,
+    spreadsheet_id TEXT NOT NULL,
+    revision TEXT,
+    row_count INTEGER NOT NULL,
+    placement_count INTEGER NOT NULL,
+    synced_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    sheet_name TEXT NOT NULL,
+    row_num INTEGER NOT NULL,
+    row_values TEXT NOT NULL,
+    PRIMARY KEY (sheet_name, row_num)
+);
+"""
+
+_PLACEMENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS placements (
+    sheet_name TEXT NOT NULL,
+    row_num INTEGER NOT NULL,
+    site TEXT,
+    platform TEXT,
+    section TEXT,
+    adtype TEXT,
+    placement_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_placements_id ON placements (placement_id);
+CREATE INDEX IF NOT EXISTS idx_placements_site ON placements (sheet_name, site);
+CREATE INDEX IF NOT EXISTS idx_placements_adtype ON placements (sheet_name, adtype);
+"""
+
+# Bumped when the stored layout changes; _migrate brings older files up to date
+MIRROR_SCHEMA_VERSION = 1
+
+_INSERT_PLACEMENTS = "INSERT INTO placements (sheet_name, row_num, site, platform, section, adtype, placement_id) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+_write_lock = threading.RLock()  # held by sync while _connect may migrate
+# (mirror path, worksheet name) -> (synced_at, rows); the same rows object is
+# returned until the worksheet is synced again, so get_placement_index reuses its index
+_loaded_values = {}
+_loaded_lock = threading.Lock()
+
+
+def _connect(path=PLACEMENT_MIRROR_PATH):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(_SCHEMA + _PLACEMENTS_SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < MIRROR_SCHEMA_VERSION:
+        _migrate(conn)
+    return conn
+
+
+def _migrate(conn):
+    """
+    One-time upgrade of a mirror written by an older version.
+
+    Version 0 files may have lost the placements table (or never filled it), so
+    it is recreated and rebuilt from sheet_rows.
+    """
+    with _write_lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the write lock
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                conn.execute("DROP TABLE IF EXISTS placements")
+                for statement in _PLACEMENTS_SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                sheet_names = [sheet_name for (sheet_name,) in conn.execute("SELECT sheet_name FROM worksheets")]
+                for sheet_name in sheet_names:
+                    rows = conn.execute(
+                        "SELECT row_values FROM sheet_rows WHERE sheet_name = ? ORDER BY row_num", (sheet_name,)
+                    ).fetchall()
+                    conn.executemany(_INSERT_PLACEMENTS, _placement_rows(sheet_name, [json.loads(row_values) for (row_values,) in rows]))
+                if sheet_names:
+                    print(f"🔧 Rebuilt placement mirror index for {len(sheet_names)} worksheet(s)")
+            conn.execute(f"PRAGMA user_version = {MIRROR_SCHEMA_VERSION}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def _placement_rows(sheet_name, all_values):
+    """Placement rows of a worksheet as (sheet_name, row_num, site, platform, section, adtype, placement_id)."""
+    if not all_values:
+        return []
+    clean_index = {header: i for i, header in enumerate(clean_sheet_headers(all_values[0]))}
+    column_mapping = map_placement_columns(all_values[0])
+    columns = {field: clean_index.get(header) for field, header in column_mapping.items()}
+    if columns.get('placement') is None:
+        return []
+
+    def cell(row_values, field):
+        i = columns.get(field)
+        return row_values[i] if i is not None and i < len(row_values) else ''
+
+    rows = []
+    for row_num, row_values in enumerate(all_values[1:], 1):
+        placement_id = str(cell(row_values, 'placement')).strip()
+        if placement_id:
+            rows.append((sheet_name, row_num, cell(row_values, 'site'), cell(row_values, 'platform'),
+                         cell(row_values, 'section'), cell(row_values, 'adtype'), placement_id))
+    return rows
+
+
+def sync_placement_mirror(credentials_path=CREDENTIALS_PATH, sheet_url=PLACEMENT_SHEET_URL, sheet_names=None, path=PLACEMENT_MIRROR_PATH):
+    """
+    Download the placement worksheets and replace their copies in the mirror.
+
+    Returns:
+        dict: Worksheet name -> number of rows stored (header excluded)
+    """
+    sheet_names = sheet_names or MIRRORED_SHEETS
+    spreadsheet_id = extract_id_from_url(sheet_url)
+    values_by_name = load_sheets_values(credentials_path, sheet_url, sheet_names, force_refresh=True)
+    synced_at = datetime.now().isoformat()
+    # Checked by the download above, so this is answered from memory
+    revision = sheet_snapshots.get_revision(get_sheets_client(credentials_path), spreadsheet_id)
+
+    counts = {}
+    with _write_lock:
+        conn = _connect(path)
+        try:
+            with conn:
+                for sheet_name, all_values in values_by_name.items():
+                    placement_rows = _placement_rows(sheet_name, all_values)
+                    conn.execute("DELETE FROM sheet_rows WHERE sheet_name = ?", (sheet_name,))
+                    conn.execute("DELETE FROM placements WHERE sheet_name = ?", (sheet_name,))
+                    conn.executemany(
+                        "INSERT INTO sheet_rows (sheet_name, row_num, row_values) VALUES (?, ?, ?)",
+                        ((sheet_name, row_num, json.dumps(row_values)) for row_num, row_values in enumerate(all_values))
+                    )
+                    conn.executemany(_INSERT_PLACEMENTS, placement_rows)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO worksheets (sheet_name, spreadsheet_id, revision, row_count, placement_count, synced_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (sheet_name, spreadsheet_id, revision, max(len(all_values) - 1, 0), len(placement_rows), synced_at)
+                    )
+                    counts[sheet_name] = max(len(all_values) - 1, 0)
+                    print(f"✅ Mirrored '{sheet_name}': {counts[sheet_name]} rows, {len(placement_rows)} placements")
+        finally:
+            conn.close()
+    return counts
+
+
+def load_mirror_values(sheet_names, path=PLACEMENT_MIRROR_PATH):
+    """
+    Read worksheets back from the mirror in the same shape as Worksheet.get_all_values.
+
+    A worksheet already loaded since its last sync is returned from memory (the same list object).
+
+    Returns:
+        dict: Worksheet name -> rows of cell strings
+
+    Raises:
+        ValueError: If a worksheet has never been synced
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"No placement mirror at {path}. Run: python placement_mirror.py sync")
+    conn = _connect(path)
+    try:
+        values_by_name = {}
+        for sheet_name in sheet_names:
+            synced = conn.execute("SELECT synced_at FROM worksheets WHERE sheet_name = ?", (sheet_name,)).fetchone()
+            if synced is None:
+                raise ValueError(f"Worksheet '{sheet_name}' is not in the placement mirror. Run: python placement_mirror.py sync")
+            key = (path, sheet_name)
+            with _loaded_lock:
+                loaded = _loaded_values.get(key)
+            if loaded is not None and loaded[0] == synced[0]:
+                values_by_name[sheet_name] = loaded[1]
+                continue
+            rows = conn.execute(
+                "SELECT row_values FROM sheet_rows WHERE sheet_name = ? ORDER BY row_num", (sheet_name,)
+            ).fetchall()
+            values = [json.loads(row_values) for (row_values,) in rows]
+            with _loaded_lock:
+                _loaded_values[key] = (synced[0], values)
+            values_by_name[sheet_name] = values
+            print(f"📋 Using placement mirror for '{sheet_name}' (synced {synced[0]})")
+        return values_by_name
+    finally:
+        conn.close()
+
+
+def placement_mirror_status(path=PLACEMENT_MIRROR_PATH):
+    """
+    Describe what the mirror currently holds.
+
+    Returns:
+        list: dicts with sheet_name, row_count, placement_count, revision and synced_at
+    """
+    if not os.path.exists(path):
+        return []
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT sheet_name, row_count, placement_count, revision, synced_at FROM worksheets ORDER BY sheet_name"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(("sheet_name", "row_count", "placement_count", "revision", "synced_at"), row)) for row in rows]
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "sync":
+        sync_placement_mirror()
+    elif command == "lookup":
+        conn = _connect()
+        try:
+            for placement_id in sys.argv[2:]:
+                rows = conn.execute(
+                    "SELECT sheet_name, site, platform, section, adtype FROM placements WHERE placement_id = ?", (placement_id,)
+                ).fetchall()
+                if not rows:
+                    print(f"❌ {placement_id}: not in mirror")
+                for sheet_name, site, platform, section, adtype in rows:
+                    print(f"✅ {placement_id}: {sheet_name} | site={site} platform={platform} section={section} adtype={adtype}")
+        finally:
+            conn.close()
+    else:
+        status = placement_mirror_status()
+        if not status:
+            print(f"❌ No placement mirror at {PLACEMENT_MIRROR_PATH}. Run: python placement_mirror.py sync")
+        for sheet in status:
+            print(f"📋 {sheet['sheet_name']}: {sheet['row_count']} rows, {sheet['placement_count']} placements, synced {sheet['synced_at']} (revision {sheet['revision']})")
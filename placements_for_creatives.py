@@ -1,59 +1,36 @@
-import gspread
-from google.oauth2.service_account import Credentials
+from concurrent.futures import ThreadPoolExecutor
 
-def fetch_placements_ids(credentials_path, sheet_url, sheet_name, site_filter, platforms_filter, adtype_filters, richmedia_platform_map=None, line_type="standard"):
+from placement_index import get_placement_index, targeting_signature
+from placement_mirror import load_mirror_values
+from sheet_snapshot import load_sheet_values, load_sheets_values
+
+PLACEMENT_FETCH_MODES = ("batched", "concurrent", "serial")
+PLACEMENT_SOURCES = ("sheet", "mirror", "auto")
+# Upper bound on parallel worksheet downloads in "concurrent" mode
+PLACEMENT_FETCH_WORKERS = 3
+
+
+def _mirror_fallback(sheet_names, sheets_error):
+    """Load worksheets from the mirror after Google Sheets failed, keeping the Sheets error if that fails too."""
+    try:
+        return load_mirror_values(sheet_names)
+    except ValueError as mirror_error:
+        raise ValueError(f"Google Sheets failed ({sheets_error}) and {mirror_error}") from sheets_error
+
+def fetch_placements_ids(credentials_path, sheet_url, sheet_name, site_filter, platforms_filter, adtype_filters, richmedia_platform_map=None, line_type="standard", all_values=None):
     print("credentials_path::"+credentials_path)
-    creds = Credentials.from_service_account_file(
-        credentials_path,
-        scopes=["https://www.googleapis.com/auth/spreadsheets"]
-    )
-    client = gspread.authorize(creds)
-    spreadsheet = client.open_by_url(sheet_url)
-    worksheet = spreadsheet.worksheet(sheet_name)
     
-    # Get all values instead of using get_all_records to avoid duplicate header issues
-    all_values = worksheet.get_all_values()
+    # Get all values instead of using get_all_records to avoid duplicate header issues.
+    # The worksheet is served from the local snapshot unless the sheet has changed,
+    # or passed in by fetch_placements_for_sheets after a batched download.
+    if all_values is None:
+        all_values = load_sheet_values(credentials_path, sheet_url, sheet_name)
     if not all_values:
         print("No data found in worksheet")
         return {}
     
-    # Get headers from first row and clean them up
-    headers = all_values[0]
-    print(f"\n📊 Sheet Structure:")
-    print(f"Raw headers: {headers}")
-    
-    # Create a mapping of clean headers to avoid duplicates
-    clean_headers = []
-    header_count = {}
-    for header in headers:
-        clean_header = header.strip()
-        if not clean_header:
-            # Handle empty headers by giving them a unique name
-            clean_header = f"empty_col_{len(clean_headers)}"
-        elif clean_header in header_count:
-            # Handle duplicate headers by appending a number
-            header_count[clean_header] += 1
-            clean_header = f"{clean_header}_{header_count[clean_header]}"
-        else:
-            header_count[clean_header] = 0
-        clean_headers.append(clean_header)
-    
-    print(f"Cleaned headers: {clean_headers}")
-    
-    # Convert data rows to dictionaries manually
-    data = []
-    for row_values in all_values[1:]:  # Skip header row
-        # Pad row with empty strings if it's shorter than headers
-        while len(row_values) < len(clean_headers):
-            row_values.append('')
-        
-        row_dict = {}
-        for i, header in enumerate(clean_headers):
-            if i < len(row_values):
-                row_dict[header] = row_values[i]
-            else:
-                row_dict[header] = ''
-        data.append(row_dict)
+    # Header cleanup, column mapping and the row index are built once per snapshot
+    index = get_placement_index(sheet_url, sheet_name, all_values)
 
     # Clone site_filter so we don't modify the original list
     site_filter = list(site_filter)
@@ -70,30 +47,19 @@ def fetch_placements_ids(credentials_path, sheet_url, sheet_name, site_filter, p
         site_filter.append("ETIMES")
         print(f"Added ETIMES to site filter: {site_filter}")
     
-    # Find the exact column names from the sheet using original headers
-    column_mapping = {}
-    for col in headers:
-        col_upper = col.upper()
-        if 'SITE' in col_upper:
-            column_mapping['site'] = col
-        elif 'PLATFORM' in col_upper:
-            column_mapping['platform'] = col
-        elif 'AD TYPE' in col_upper or 'ADTYPE' in col_upper:
-            column_mapping['adtype'] = col
-        elif 'SECTION' in col_upper:
-            column_mapping['section'] = col
-        elif 'PLACEMENT' in col_upper:
-            column_mapping['placement'] = col
-            
-    print("\n📋 Using column mapping:")
-    print(column_mapping)
+    # Identical targeting against the same snapshot was already resolved
+    signature = targeting_signature(site_filter, platforms_filter, adtype_filters, richmedia_platform_map, line_type)
+    cached = index.cached_result(signature)
+    if cached is not None:
+        print(f"♻️ Reusing placements for identical targeting on '{sheet_name}': {[(size, len(data['placement_ids'])) for size, data in cached.items()]}")
+        return cached
     
-    print(f"\nFound {len(data)} rows in sheet")
+    print("\n📋 Using column mapping:")
+    print(index.column_mapping)
+    if index.missing_columns:
+        print(f"Error processing rows: missing columns {index.missing_columns}")
     
-    # Print first few rows of data to verify structure
-    print("\n📝 Sample data rows:")
-    for row in data[:3]:
-        print(row)
+    print(f"\nFound {index.row_count} rows in sheet, {len(index)} with placement IDs")
         
     placement_data = {}
 
@@ -109,51 +75,14 @@ def fetch_placements_ids(credentials_path, sheet_url, sheet_name, site_filter, p
         print(f"Looking for ad types: {adtype_values}")
         print(f"Looking for sections: {section_values}")
         
-        placement_ids = []
+        # 1260x570 and 320x480 have fixed platforms, richmedia sizes use their own
+        # platform list, everything else respects the user's platform choices
+        size_platforms = index.platforms_for_size(adtype, platforms_filter, richmedia_platform_map)
+        if richmedia_platform_map and adtype in richmedia_platform_map:
+            print(f"🎯 Richmedia platform check for {adtype}: required {size_platforms}")
         
-        for row in data:
-            try:
-                # Get values using mapped column names
-                row_site = str(row.get(column_mapping['site'], '')).upper()
-                row_platform = str(row.get(column_mapping['platform'], '')).upper()
-                row_section = str(row.get(column_mapping['section'], '')).upper()
-                row_adtype = str(row.get(column_mapping['adtype'], '')).upper()
-                row_placement = str(row.get(column_mapping['placement'], '')).strip()
-
-                # Skip row if no placement ID
-                if not row_placement:
-                    continue
-
-                # Case-insensitive site matching
-                site_match = any(site in row_site for site in site_filter)
-                
-                # Platform-specific checks with case-insensitive matching
-                row_platforms = [p.strip() for p in row_platform.split(',')]
-                if adtype == "1260x570":
-                    platform_match = "WEB" in row_platforms
-                elif adtype == "320x480":
-                    platform_match = any(p in ["AMP", "MWEB"] for p in row_platforms)
-                elif richmedia_platform_map and adtype in richmedia_platform_map:
-                    # Use richmedia-specific platform filtering for this size
-                    richmedia_platforms = richmedia_platform_map[adtype]
-                    platform_match = any(p.strip().upper() in [plat.upper() for plat in row_platforms] for p in richmedia_platforms)
-                    print(f"🎯 Richmedia platform check for {adtype}: required {richmedia_platforms}, row has {row_platforms}, match: {platform_match}")
-                else:
-                    # For standard lines, apply user platform filtering normally
-                    # This ensures user's platform choices (like Mweb, AMP only) are respected
-                    platform_match = any(p.strip().upper() in [plat.upper() for plat in row_platforms] for p in platforms_filter)
-                
-                # Case-insensitive section and ad type matching
-                section_match = any(section in row_section for section in section_values)
-                adtype_match = any(ad in row_adtype for ad in adtype_values)
-
-                if site_match and platform_match and section_match and adtype_match:
-                    if row_placement:
-                        placement_ids.append(row_placement)
-                        print(f"✅ Found placement ID {row_placement} for {adtype}")
-            except Exception as e:
-                print(f"Error processing row: {e}")
-                continue
+        placement_ids = index.find(site_filter, size_platforms, section_values, adtype_values)
+        print(f"✅ Found {len(placement_ids)} placement IDs for {adtype}")
 
         # Assign base structure
         placement_data[adtype] = {
@@ -175,6 +104,118 @@ def fetch_placements_ids(credentials_path, sheet_url, sheet_name, site_filter, p
         elif adtype == "320x100":
             placement_data[adtype]["additional_sizes"] = ['320x50']
 
+    index.store_result(signature, placement_data)
+    return placement_data
+
+
+def merge_placement_data(placement_data, new_data, label=""):
+    """
+    Merge one worksheet's placement data into placement_data in place.
+
+    Placement IDs and original_sizes of a size present in both are unioned.
+    """
+    for size, data in new_data.items():
+        if size not in placement_data:
+            placement_data[size] = data.copy()
+        else:
+            # Ensure we're working with dictionaries
+            if not isinstance(placement_data[size], dict):
+                print(f"⚠️ {label} - placement_data[{size}] is not a dict: {type(placement_data[size])}")
+                placement_data[size] = {}
+            if not isinstance(data, dict):
+                print(f"⚠️ {label} - incoming data is not a dict: {type(data)}")
+                continue
+
+            # Combine placement IDs from both sources
+            existing_ids = set(placement_data[size].get('placement_ids', []))
+            new_ids = set(data.get('placement_ids', []))
+            placement_data[size]['placement_ids'] = list(existing_ids | new_ids)
+
+            # Preserve original_sizes information
+            existing_original_sizes = set(placement_data[size].get('original_sizes', []))
+            new_original_sizes = set(data.get('original_sizes', []))
+            placement_data[size]['original_sizes'] = list(existing_original_sizes | new_original_sizes)
+
+            print(f"🔄 Merged {label} placements for {size}: {len(new_ids)} new IDs")
+    return placement_data
+
+
+def fetch_placements_for_sheets(credentials_path, sheet_url, sheet_sites, platforms_filter, adtype_filters, richmedia_platform_map=None, line_type="standard", fetch_mode="batched", source="sheet"):
+    """
+    Fetch and merge placements from several worksheets of the placement spreadsheet.
+
+    Args:
+        credentials_path: Service account JSON file
+        sheet_url: Placement spreadsheet URL
+        sheet_sites: List of (label, worksheet name, site list) in merge order
+        platforms_filter: User platforms
+        adtype_filters: Size groups with adtype/section filters
+        richmedia_platform_map: Optional size -> platforms for richmedia lines
+        line_type: Line type passed through to fetch_placements_ids
+        fetch_mode: "batched" (one batched download for all worksheets),
+            "concurrent" (one download per worksheet, in parallel) or "serial"
+        source: "sheet", "mirror" (local SQLite copy, see placement_mirror) or
+            "auto" (sheet, falling back to the mirror when Sheets fails)
+
+    Returns:
+        dict: Merged placement data by size
+    """
+    if fetch_mode not in PLACEMENT_FETCH_MODES:
+        raise ValueError(f"Unsupported placement fetch mode: {fetch_mode}")
+    if source not in PLACEMENT_SOURCES:
+        raise ValueError(f"Unsupported placement source: {source}")
+
+    sheet_names = [sheet_name for _, sheet_name, _ in sheet_sites]
+    sheet_values = {}
+    if source == "mirror" and sheet_names:
+        sheet_values = load_mirror_values(sheet_names)
+    elif fetch_mode == "batched" and sheet_names:
+        try:
+            sheet_values = load_sheets_values(credentials_path, sheet_url, sheet_names)
+        except Exception as e:
+            if source != "auto":
+                raise
+            print(f"⚠️ Google Sheets unavailable ({e}), using the local placement mirror")
+            sheet_values = _mirror_fallback(sheet_names, e)
+
+    def values_for(sheet_name):
+        if sheet_name in sheet_values:
+            return sheet_values[sheet_name]
+        try:
+            return load_sheet_values(credentials_path, sheet_url, sheet_name)
+        except Exception as e:
+            if source != "auto":
+                raise
+            print(f"⚠️ Google Sheets unavailable for '{sheet_name}' ({e}), using the local placement mirror")
+            return _mirror_fallback([sheet_name], e)[sheet_name]
+
+    def fetch_sheet(label, sheet_name, sites):
+        print(f"\nFetching {label} placements:")
+        all_values = values_for(sheet_name)
+        return fetch_placements_ids(
+            credentials_path,
+            sheet_url,
+            sheet_name,
+            sites,
+            platforms_filter,
+            adtype_filters,
+            richmedia_platform_map,
+            line_type,
+            all_values=all_values
+        )
+
+    if fetch_mode == "concurrent" and len(sheet_sites) > 1:
+        # Worksheets are independent; the gspread client is shared through sheet_snapshot
+        with ThreadPoolExecutor(max_workers=min(PLACEMENT_FETCH_WORKERS, len(sheet_sites))) as executor:
+            futures = [executor.submit(fetch_sheet, *sheet_site) for sheet_site in sheet_sites]
+            results = [future.result() for future in futures]
+    else:
+        results = [fetch_sheet(*sheet_site) for sheet_site in sheet_sites]
+
+    # Merge in sheet_sites order so the result does not depend on which fetch finished first
+    placement_data = {}
+    for (label, _, _), sheet_placement_data in zip(sheet_sites, results):
+        merge_placement_data(placement_data, sheet_placement_data, label)
     return placement_data
 
 
@@ -3,13 +3,20 @@ import logging
 import time
 import copy
 import re
+import threading
 import requests
 from googleads import ad_manager
+from googleads.errors import GoogleAdsServerFault
 from get_order_name import fetch_advertiser_id_from_order
 from config import CREATIVES_FOLDER
+from creative_manifest import get_creative_manifest, IMAGE_EXTENSIONS, SCRIPT_EXTENSIONS
+from asset_store import AssetStore, asset_store
+from template_registry import template_registry
+from asset_dedupe import prepare_creative_assets, materialize_assets, remember_created_assets, forget_assets
+from creative_pipeline import CREATIVE_PIPELINE_WORKERS, gam_rate_limiter, run_ordered
+from gam_transport import gam_service
 
 # Add retry and timeout handling
-import socket
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 
@@ -39,7 +46,7 @@ def setup_retry_session():
     retry_strategy = Retry(
         total=3,
         status_forcelist=[429, 500, 502, 503, 504],
-        method_whitelist=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"],
+        allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"],
         backoff_factor=1
     )
     adapter = HTTPAdapter(max_retries=retry_strategy)
@@ -48,20 +55,18 @@ def setup_retry_session():
     return session
 
 def create_lica_with_retry(lica_service, lica, max_retries=3, initial_delay=2):
-    """Create Line Item Creative Association with retry logic"""
+    """
+    Create Line Item Creative Association with retry logic.
+
+    The call times out after the service's read timeout; create lica_service
+    with gam_transport.gam_service to get the LICA timeout.
+    """
     for attempt in range(max_retries):
         try:
             print(f"Attempting to create LICA (attempt {attempt + 1}/{max_retries})...")
             
-            # Set a shorter timeout for the specific operation
-            original_socket_timeout = socket.getdefaulttimeout()
-            socket.setdefaulttimeout(60)  # 60 seconds instead of 3600
-            
             result = lica_service.createLineItemCreativeAssociations([lica])
             
-            # Restore original timeout
-            socket.setdefaulttimeout(original_socket_timeout)
-            
             print(f"✅ Successfully created LICA on attempt {attempt + 1}")
             return result
             
@@ -69,10 +74,6 @@ def create_lica_with_retry(lica_service, lica, max_retries=3, initial_delay=2):
             error_msg = str(e)
             print(f"❌ LICA creation attempt {attempt + 1} failed: {error_msg}")
             
-            # Restore original timeout in case of error
-            if 'original_socket_timeout' in locals():
-                socket.setdefaulttimeout(original_socket_timeout)
-            
             # Check if it's a timeout or connection error
             if "timeout" in error_msg.lower() or "connection" in error_msg.lower():
                 if attempt < max_retries - 1:
@@ -88,9 +89,167 @@ def create_lica_with_retry(lica_service, lica, max_retries=3, initial_delay=2):
             
     raise Exception(f"Failed to create LICA after {max_retries} attempts")
 
-def process_html_creative(html_path, landing_page_url, impression_tracker=None):
-    with open(html_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+# LICAs per createLineItemCreativeAssociations call
+LICA_BATCH_SIZE = int(os.environ.get("LICA_BATCH_SIZE", "50"))
+
+# "lineItemCreativeAssociations[3].creativeId" -> entry 3 of the request was rejected
+LICA_FIELD_PATH_PATTERN = re.compile(r'lineItemCreativeAssociations\[(\d+)\]')
+# "creatives[2].size" -> entry 2 of the createCreatives request was rejected
+CREATIVE_FIELD_PATH_PATTERN = re.compile(r'creatives\[(\d+)\]')
+
+
+def _is_transient_error(error_msg):
+    error_msg = error_msg.lower()
+    return "timeout" in error_msg or "timed out" in error_msg or "connection" in error_msg
+
+
+def _is_api_rejection(error):
+    """True if GAM answered with an ApiException: the call was rejected as a whole and created nothing."""
+    return isinstance(error, GoogleAdsServerFault) or bool(getattr(error, 'errors', None))
+
+
+def _rejected_positions(error, count, pattern=LICA_FIELD_PATH_PATTERN):
+    """Request positions GAM named in the error's field paths (empty if it named none)."""
+    paths = [str(error)] + [str(getattr(api_error, 'fieldPath', '') or '') for api_error in (getattr(error, 'errors', None) or [])]
+    positions = set()
+    for path in paths:
+        for match in pattern.finditer(path):
+            position = int(match.group(1))
+            if position < count:
+                positions.add(position)
+    return positions
+
+
+def _submit_lica_chunk(lica_service, licas, indices, outcomes):
+    """
+    Submit one chunk; returns the indices that failed with a transient error.
+
+    The call is all-or-nothing, so when GAM rejects it the entries it names are
+    marked failed and the others are sent again at once. If no entry is named
+    the chunk is split in half until the bad entries are isolated.
+    """
+    for index in indices:
+        outcomes[index]['attempts'] += 1
+    gam_rate_limiter.acquire()
+    try:
+        created = lica_service.createLineItemCreativeAssociations([licas[index] for index in indices]) or []
+        for position, index in enumerate(indices):
+            outcomes[index]['result'] = created[position] if position < len(created) else None
+            outcomes[index]['error'] = None
+        return []
+    except Exception as e:
+        error_msg = str(e)
+        if _is_transient_error(error_msg):
+            for index in indices:
+                outcomes[index]['error'] = error_msg
+            return list(indices)
+
+        rejected = _rejected_positions(e, len(indices))
+        if rejected:
+            for position in rejected:
+                outcomes[indices[position]]['error'] = error_msg
+            remaining = [index for position, index in enumerate(indices) if position not in rejected]
+            return _submit_lica_chunk(lica_service, licas, remaining, outcomes) if remaining else []
+        if len(indices) == 1:
+            outcomes[indices[0]]['error'] = error_msg
+            return []
+        middle = len(indices) // 2
+        return (_submit_lica_chunk(lica_service, licas, indices[:middle], outcomes)
+                + _submit_lica_chunk(lica_service, licas, indices[middle:], outcomes))
+
+
+def _find_created_licas(lica_service, licas, indices):
+    """
+    LICAs among indices that already exist in GAM, e.g. created by a call that timed out.
+
+    Returns:
+        dict: Index -> existing LICA (empty if the lookup itself failed)
+    """
+    by_line_item = {}
+    for index in indices:
+        by_line_item.setdefault(str(licas[index]['lineItemId']), {})[str(licas[index]['creativeId'])] = index
+    found = {}
+    try:
+        for line_item_id, index_by_creative in by_line_item.items():
+            creative_ids = ", ".join(str(int(creative_id)) for creative_id in index_by_creative)
+            statement = (ad_manager.StatementBuilder()
+                         .Where(f"lineItemId = :line_item_id AND creativeId IN ({creative_ids})")
+                         .WithBindVariable('line_item_id', int(line_item_id)))
+            while True:
+                gam_rate_limiter.acquire()
+                response = lica_service.getLineItemCreativeAssociationsByStatement(statement.ToStatement())
+                results = getattr(response, 'results', None) or []
+                for existing in results:
+                    index = index_by_creative.get(str(existing['creativeId']))
+                    if index is not None:
+                        found[index] = existing
+                if len(results) < statement.limit:
+                    break
+                statement.offset += statement.limit
+    except Exception as e:
+        print(f"⚠️ Could not check which LICAs were already created, resending them: {e}")
+        return {}
+    return found
+
+
+def create_licas_bulk(lica_service, licas, chunk_size=None, max_retries=3, initial_delay=2):
+    """
+    Create Line Item Creative Associations in chunked calls, retrying only the entries that failed.
+    
+    Entries GAM rejects (invalid creative, size mismatch, ...) fail on their own
+    without holding back the rest of their chunk. Entries caught in a timeout or
+    connection error are retried with exponential backoff; since GAM may have
+    created them before the call failed, the ones that already exist are
+    looked up first and counted as created instead of being sent again.
+    
+    Args:
+        lica_service: LineItemCreativeAssociationService
+        licas (list): LICA dicts (creativeId, lineItemId, targetingName, sizes)
+        chunk_size (int, optional): LICAs per call (default: LICA_BATCH_SIZE)
+        max_retries (int): Attempts per entry for transient errors
+        initial_delay (int): Seconds before the first retry, doubled on each retry
+        
+    Returns:
+        list: One dict per LICA, in order, with lica, result (created LICA or None),
+              error (None on success) and attempts (calls the entry was sent in)
+    """
+    chunk_size = max(1, chunk_size or LICA_BATCH_SIZE)
+    outcomes = [{'lica': lica, 'result': None, 'error': None, 'attempts': 0} for lica in licas]
+    pending = list(range(len(licas)))
+    for attempt in range(max_retries):
+        if not pending:
+            break
+        if attempt:
+            delay = initial_delay * (2 ** (attempt - 1))  # Exponential backoff
+            print(f"⏳ Retrying {len(pending)} LICA(s) in {delay} seconds (attempt {attempt + 1}/{max_retries})...")
+            time.sleep(delay)
+            existing = _find_created_licas(lica_service, licas, pending)
+            for index, lica in existing.items():
+                outcomes[index]['result'] = lica
+                outcomes[index]['error'] = None
+            if existing:
+                print(f"♻️ {len(existing)} LICA(s) were created before the failed call, not resending them")
+                pending = [index for index in pending if index not in existing]
+                if not pending:
+                    break
+        failed = []
+        for start in range(0, len(pending), chunk_size):
+            failed.extend(_submit_lica_chunk(lica_service, licas, pending[start:start + chunk_size], outcomes))
+        pending = failed
+
+    created = sum(1 for outcome in outcomes if outcome['error'] is None)
+    if created == len(outcomes):
+        print(f"✅ Created {created} LICA(s)")
+    else:
+        print(f"⚠️ Created {created} of {len(outcomes)} LICA(s)")
+        for outcome in outcomes:
+            if outcome['error']:
+                print(f"❌ LICA for creative {outcome['lica']['creativeId']} ({outcome['lica']['targetingName']}) failed after {outcome['attempts']} attempt(s): {outcome['error']}")
+    return outcomes
+
+def process_html_creative(html_path, landing_page_url, impression_tracker=None, store=None):
+    """Point an HTML creative at the landing page and inject the impression tracker; returns the new HTML without changing the file."""
+    html_content = (store or asset_store).read_text(html_path)
 
     # 1. Replace all instances of the default URL with the landing page URL
     if landing_page_url:
@@ -105,37 +264,58 @@ def process_html_creative(html_path, landing_page_url, impression_tracker=None):
             # If <!--NO_REFRESH--> is not present, just prepend the block
             html_content = tracker_block + '\n' + html_content
 
-    # Overwrite the original file
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # The source file is left untouched, so the next line starts from the original HTML again
+    return html_content
 
-def create_custom_template_creatives(client, order_id, line_item_id, destination_url, expresso_id,
-                                     size_name, landing_page=None,
-                                     impression_tracker=None, script_code=None, template_id=None, In_Banner_video=None, line_type=None, tracking_tag=None):
+# Creatives per createCreatives call, and the asset/script payload allowed in one call
+CREATIVE_BATCH_SIZE = int(os.environ.get("CREATIVE_BATCH_SIZE", "20"))
+CREATIVE_BATCH_MAX_BYTES = 20 * 1024 * 1024
+
+
+def _lica_targeting_name(width, height, line_type):
+    return "Mweb_PPD" if (width == 320 and height == 100) else ("Mrec_ex" if (width == 300 and height == 250 and line_type == "richmedia") else f'{width}x{height}')
+
+
+def _creative_spec(kind, template_creative, line_item_id, size, template_id, targeting_name, lica_sizes, asset_files,
+                   impression_tracker=None, strict=False):
+    """Everything needed to create one TemplateCreative and its LICA later."""
+    return {
+        'kind': kind,  # 'script', 'in_banner' or 'banner' (only used for log messages)
+        'creative': template_creative,
+        'line_item_id': line_item_id,
+        'size': size,
+        'template_id': template_id,
+        'targeting_name': targeting_name,
+        'lica_sizes': lica_sizes,
+        'asset_files': asset_files,
+        'impression_tracker': impression_tracker,
+        # Script-only and In-Banner creatives used to abort the size when they failed
+        'strict': strict,
+    }
+
+
+def build_custom_template_creatives(client, order_id, line_item_id, destination_url, expresso_id,
+                                    size_name, landing_page=None,
+                                    impression_tracker=None, script_code=None, template_id=None, In_Banner_video=None, line_type=None, tracking_tag=None,
+                                    advertiser_id=None, store=None):
     """
-    Creates custom template creatives and associates them with a line item.
+    Builds the TemplateCreative payloads for one size without calling createCreatives.
+    
+    Takes the same arguments as create_custom_template_creatives. Pass the
+    result (or the specs of several sizes together) to submit_template_creatives.
     
     Args:
-        client (AdManagerClient): The Google Ad Manager client
-        order_id (str): Order ID to associate the creative with
-        line_item_id (str): Line item ID to associate the creative with
-        destination_url (str): Default click-through URL
-        expresso_id (str): Expresso tracking ID
-        size_name (str): Size name in format 'WIDTHxHEIGHT' (e.g., '300x250')
-        landing_page (str, optional): Landing page URL (falls back to destination_url if not provided)
-        impression_tracker (str, optional): Third-party impression tracker URL
-        script_code (str, optional): JavaScript or HTML code from tag file for AI template
-        template_id (int, optional): Custom template ID to use, overrides auto-detection
+        advertiser_id (str, optional): Order's advertiser, looked up from the order if not given
+        store (AssetStore, optional): The submission's asset store (default: the shared asset_store)
         
     Returns:
-        list: List of created creative IDs
+        list: Creative specs (payload, size, template ID, targeting name and LICA sizes)
         
     Raises:
         ValueError: If required fields are missing or no creatives are found
     """
-    creative_service = client.GetService('CreativeService', version='v202408')
-    lica_service = client.GetService('LineItemCreativeAssociationService', version='v202408')
-    logging.info(f"Creating creatives for size: {size_name}")
+    logging.info(f"Building creatives for size: {size_name}")
+    store = store or asset_store
 
     # For AI template (12435443), impression/click template (12330939), In-Banner Video template (12344286), 320x100 special template (12363950), 300x250 richmedia template (12460223), 300x600 richmedia template (12443458), no destination template (12473441), and no landing page template (12399020), destination_url is not strictly required
     if template_id in [12435443, 12330939, 12344286, 12363950, 12460223, 12443458, 12473441, 12399020]:
@@ -145,25 +325,22 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
         if not all([order_id, line_item_id, destination_url, expresso_id]):
             raise ValueError("Required fields must be provided (order_id, line_item_id, destination_url, expresso_id)")
      
-    advertiser_id = fetch_advertiser_id_from_order(client, order_id)
+    if advertiser_id is None:
+        advertiser_id = fetch_advertiser_id_from_order(client, order_id)
     base_size = size_name.split('_')[0]
     # Handle both uppercase and lowercase 'x' in dimensions (e.g., "600X250" or "600x250")
     width, height = map(int, base_size.lower().split('x'))
     # Define file extensions
-    image_extensions = ('.png', '.jpeg', '.jpg', '.webp', '.gif')
-    script_extensions = ('.html', '.xlsx', '.xls')
+    image_extensions = IMAGE_EXTENSIONS
+    script_extensions = SCRIPT_EXTENSIONS
     valid_extensions = image_extensions + script_extensions
     
-    # Check for both 300x250 and 600x250 images
-    # has_300x250 = any('300x250' in f.lower() for f in os.listdir(CREATIVES_FOLDER) if f.lower().endswith(valid_extensions))
-    # has_600x250 = any('600x250' in f.lower() for f in os.listdir(CREATIVES_FOLDER) if f.lower().endswith(valid_extensions))
-    
-    banner_files = [f for f in os.listdir(CREATIVES_FOLDER) if base_size in f.lower() and f.lower().endswith(valid_extensions)]
+    # The folder is listed once per submission; sizes and companions are looked up in the manifest
+    manifest = get_creative_manifest(CREATIVES_FOLDER)
+    banner_files = manifest.files_for_size(base_size, valid_extensions)
     
     # If no image files found but script_code is provided, we can still create a creative using the AI template
     if not banner_files and script_code and len(script_code.strip()) > 10:
-        creative_ids = []
-        
         # Generate a unique name for the creative
         timestamp = int(time.time() * 1000)
         unique_creative_name = f"{order_id}_{base_size}_script_{timestamp}"
@@ -218,39 +395,9 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
         if destination_url and destination_url.strip():
             template_creative['destinationUrl'] = destination_url
         
-        try:
-            created_creative = creative_service.createCreatives([template_creative])
-            if created_creative:
-                creative_id = created_creative[0]['id']
-                creative_ids.append(creative_id)
-
-                lica = {
-                    'creativeId': creative_id,
-                    'lineItemId': line_item_id,
-                    'targetingName': "Mweb_PPD" if (width == 320 and height == 100) else ("Mrec_ex" if (width == 300 and height == 250 and line_type == "richmedia") else f'{width}x{height}'),
-                    'sizes': [{'width': width, 'height': height}]
-                }
-
-                create_lica_with_retry(lica_service, lica)
-                log_msg = f"✅ Created script-only creative ID: {creative_id} for {base_size} using AI template"
-                if impression_tracker:
-                    log_msg += " with impression tracker"
-                logging.info(log_msg)
-                print(log_msg)
-                
-                # Log creative creation with actual template_id and creative_id
-                from logging_utils import logger
-                logger.log_creative_creation(
-                    template_id=str(current_template_id),
-                    creative_id=str(creative_id),
-                    size=base_size,
-                    asset_files=["Script-only creative"]
-                )
-                
-                return creative_ids
-        except Exception as e:
-            logging.error(f"⚠️ Failed to create script-only creative for size {base_size}: {str(e)}")
-            raise
+        return [_creative_spec('script', template_creative, line_item_id, base_size, current_template_id,
+                               _lica_targeting_name(width, height, line_type), [{'width': width, 'height': height}],
+                               ["Script-only creative"], impression_tracker=impression_tracker, strict=True)]
     
     # Check if In_Banner_video is provided and not empty
     if not banner_files and In_Banner_video and In_Banner_video.strip():
@@ -258,8 +405,6 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
         if not (landing_page or destination_url):
             raise ValueError("In-Banner Video template requires either landing_page or destination_url")
         
-        creative_ids = []
-        
         # Generate a unique name for the creative
         timestamp = int(time.time() * 1000)
         unique_creative_name = f"{order_id}_inbanner_video_{timestamp}"
@@ -290,48 +435,21 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
             'creativeTemplateVariableValues': template_variables
         }
         
-        try:
-            created_creative = creative_service.createCreatives([template_creative])
-            if created_creative:
-                creative_id = created_creative[0]['id']
-                creative_ids.append(creative_id)
-
-                lica = {
-                    'creativeId': creative_id,
-                    'lineItemId': line_item_id,
-                    'targetingName': "Mweb_PPD" if (width == 320 and height == 100) else ("Mrec_ex" if (width == 300 and height == 250 and line_type == "richmedia") else f'{width}x{height}'),
-                    'sizes': [{'width': width, 'height': height}]
-                }
-
-                create_lica_with_retry(lica_service, lica)
-                log_msg = f"✅ Created In-Banner video creative ID: {creative_id} with size {width}x{height}"
-                logging.info(log_msg)
-                print(log_msg)
-                
-                # Log creative creation with actual template_id and creative_id
-                from logging_utils import logger
-                logger.log_creative_creation(
-                    template_id=str(current_template_id),
-                    creative_id=str(creative_id),
-                    size=f"{width}x{height}",
-                    asset_files=["In-Banner Video"]
-                )
-                
-                return creative_ids
-        except Exception as e:
-            logging.error(f"⚠️ Failed to create In-Banner video creative: {str(e)}")
-            raise
+        return [_creative_spec('in_banner', template_creative, line_item_id, f"{width}x{height}", current_template_id,
+                               _lica_targeting_name(width, height, line_type), [{'width': width, 'height': height}],
+                               ["In-Banner Video"], strict=True)]
     
     if not banner_files:
         raise ValueError("No creatives detected in the creatives folder and no valid tag file found")
     
-    creative_ids = []
+    specs = []
 
     for banner_filename in banner_files:
-        banner_file_path = os.path.join(CREATIVES_FOLDER, banner_filename)
+        banner_entry = manifest.entry(banner_filename)
+        banner_file_path = banner_entry['path']
         
         # Determine file type and read accordingly
-        is_image_file = banner_filename.lower().endswith(image_extensions)
+        is_image_file = banner_entry['is_image']
         is_script_file = banner_filename.lower().endswith(script_extensions)
         
         # Initialize variables
@@ -340,15 +458,15 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
         
         # Read file content based on type
         if is_image_file:
-            # Read image files as binary
-            with open(banner_file_path, 'rb') as file:
-                banner_byte_array = file.read()
-        elif is_script_file and banner_filename.lower().endswith('.html'):
-            # Process HTML creative before reading
-            process_html_creative(banner_file_path, landing_page or destination_url, impression_tracker)
-            # Read HTML files as text
-            with open(banner_file_path, 'r', encoding='utf-8') as file:
-                ai_html_content = file.read()
+            # Read image files as binary (shared with every other creative using the file)
+            banner_byte_array = store.read_bytes(banner_file_path)
+        elif is_script_file and banner_entry['is_html']:
+            # Process the HTML creative once per landing page/tracker; later sizes reuse the result
+            html_landing_page = landing_page or destination_url
+            ai_html_content = store.derived(
+                banner_file_path, ('html', html_landing_page, impression_tracker),
+                lambda: process_html_creative(banner_file_path, html_landing_page, impression_tracker, store)
+            )
         else:
             print(f"⚠️ Skipping unsupported file: {banner_filename}")
             continue
@@ -367,26 +485,24 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
         unique_asset_name = f"{unique_creative_name}.png"
         
         # Detect banner characteristics
-        is_ai = 'ai' in banner_filename.lower() or banner_filename.lower().endswith('.html')
-        is_2x = '2x' in banner_filename.lower() or '2x' in size_name.lower()
-        is_NoLP = 'nolp' in banner_filename.lower() or 'nolp' in size_name.lower()
+        is_ai = banner_entry['is_ai']
+        is_2x = banner_entry['is_2x'] or '2x' in size_name.lower()
+        is_NoLP = banner_entry['is_nolp'] or 'nolp' in size_name.lower()
         
         # Initialize template_creative variable 
         template_creative = None
         
         if base_size == '600x250':
-            # Read both images
+            # Read both images (the last one of each size in the folder)
             banner_300x250 = None
             banner_600x250 = None
             
-            for f in os.listdir(CREATIVES_FOLDER):
-                if f.lower().endswith(image_extensions):
-                    if '300x250' in f.lower():
-                        with open(os.path.join(CREATIVES_FOLDER, f), 'rb') as file:
-                            banner_300x250 = file.read()
-                    elif '600x250' in f.lower():
-                        with open(os.path.join(CREATIVES_FOLDER, f), 'rb') as file:
-                            banner_600x250 = file.read()
+            banner_300x250_path = manifest.last_path('300x250', image_extensions)
+            banner_600x250_path = manifest.last_path('600x250', image_extensions, exclude='300x250')
+            if banner_300x250_path:
+                banner_300x250 = store.read_bytes(banner_300x250_path)
+            if banner_600x250_path:
+                banner_600x250 = store.read_bytes(banner_600x250_path)
             
             # If we don't have both images, use the available one for both
             if not banner_300x250:
@@ -492,13 +608,10 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
                 
                 # Look for 320x250 image for BigBanner
                 big_banner_size_info = "320x100"  # Default fallback size info
-                for f in os.listdir(CREATIVES_FOLDER):
-                    if f.lower().endswith(image_extensions) and '320x250' in f.lower():
-                        big_banner_path = os.path.join(CREATIVES_FOLDER, f)
-                        with open(big_banner_path, 'rb') as file:
-                            big_banner_bytes = file.read()
-                            big_banner_size_info = "320x250"  # Found 320x250 image
-                        break
+                big_banner_path = manifest.first_path('320x250', image_extensions)
+                if big_banner_path:
+                    big_banner_bytes = store.read_bytes(big_banner_path)
+                    big_banner_size_info = "320x250"  # Found 320x250 image
                 
                 # Generate unique asset names with size information
                 small_banner_asset_name = f"{unique_creative_name}_small_320x100.png"
@@ -535,13 +648,10 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
                 
                 # Look for 600x250 image for BigBanner
                 big_banner_size_info = "300x250"  # Default fallback size info
-                for f in os.listdir(CREATIVES_FOLDER):
-                    if f.lower().endswith(image_extensions) and '600x250' in f.lower():
-                        big_banner_path = os.path.join(CREATIVES_FOLDER, f)
-                        with open(big_banner_path, 'rb') as file:
-                            big_banner_bytes = file.read()
-                            big_banner_size_info = "600x250"  # Found 600x250 image
-                        break
+                big_banner_path = manifest.first_path('600x250', image_extensions)
+                if big_banner_path:
+                    big_banner_bytes = store.read_bytes(big_banner_path)
+                    big_banner_size_info = "600x250"  # Found 600x250 image
                 
                 # Generate unique asset names with size information
                 small_banner_asset_name = f"{unique_creative_name}_small_300x250.png"
@@ -578,13 +688,10 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
                 
                 # Look for 450x600 image for BigBanner
                 big_banner_size_info = "300x600"  # Default fallback size info
-                for f in os.listdir(CREATIVES_FOLDER):
-                    if f.lower().endswith(image_extensions) and '450x600' in f.lower():
-                        big_banner_path = os.path.join(CREATIVES_FOLDER, f)
-                        with open(big_banner_path, 'rb') as file:
-                            big_banner_bytes = file.read()
-                            big_banner_size_info = "450x600"  # Found 450x600 image
-                        break
+                big_banner_path = manifest.first_path('450x600', image_extensions)
+                if big_banner_path:
+                    big_banner_bytes = store.read_bytes(big_banner_path)
+                    big_banner_size_info = "450x600"  # Found 450x600 image
                 
                 # Generate unique asset names with size information
                 small_banner_asset_name = f"{unique_creative_name}_small_300x600.png"
@@ -750,107 +857,306 @@ def create_custom_template_creatives(client, order_id, line_item_id, destination
                 {'xsi_type': 'StringCreativeTemplateVariableValue', 'uniqueName': 'ScriptCode', 'value': tracking_tag}
             )
 
-        try:
-            created_creative = creative_service.createCreatives([template_creative])
-            if created_creative:
-                creative_id = created_creative[0]['id']
-                creative_ids.append(creative_id)
-
-                # Determine the correct targeting name to match line item creative targeting
-                if width == 320 and height == 100:
-                    targeting_name = "Mweb_PPD"  # Must match the targeting name used in line item creation
-                elif width == 300 and height == 250 and line_type == "richmedia":
-                    targeting_name = "Mrec_ex"  # Must match the targeting name used in line item creation for 300x250 richmedia
-                elif width == 300 and height == 600 and line_type == "richmedia":
-                    targeting_name = "Tower_ex"  # Must match the targeting name used in line item creation for 300x600 richmedia
-                else:
-                    targeting_name = f'{width}x{height}'
-
-                # Include both the original size and any override sizes
-                sizes_for_lica = [{'width': width, 'height': height}]
-                if size_overrides:
-                    sizes_for_lica.extend(size_overrides)
-                
-                lica = {
-                    'creativeId': creative_id,
-                    'lineItemId': line_item_id,
-                    'targetingName': targeting_name,
-                    'sizes': sizes_for_lica
-                }
+        # Determine the correct targeting name to match line item creative targeting
+        if width == 320 and height == 100:
+            targeting_name = "Mweb_PPD"  # Must match the targeting name used in line item creation
+        elif width == 300 and height == 250 and line_type == "richmedia":
+            targeting_name = "Mrec_ex"  # Must match the targeting name used in line item creation for 300x250 richmedia
+        elif width == 300 and height == 600 and line_type == "richmedia":
+            targeting_name = "Tower_ex"  # Must match the targeting name used in line item creation for 300x600 richmedia
+        else:
+            targeting_name = f'{width}x{height}'
 
-                create_lica_with_retry(lica_service, lica)
-                log_msg = f"✅ Created creative ID: {creative_id} for {base_size} with targeting name: {targeting_name}"
-                if impression_tracker:
-                    log_msg += " with impression tracker"
-                logging.info(log_msg)
-                print(log_msg)
-                
-                # Log creative creation with actual template_id and creative_id
-                from logging_utils import logger
-                asset_files = [banner_filename] if banner_filename else []
-                logger.log_creative_creation(
-                    template_id=str(current_template_id),
-                    creative_id=str(creative_id),
-                    size=base_size,
-                    asset_files=asset_files
-                )
-        except Exception as e:
-            logging.error(f"⚠️ Failed to create creatives for size {base_size}: {str(e)}")
+        # Include both the original size and any override sizes
+        sizes_for_lica = [{'width': width, 'height': height}]
+        if size_overrides:
+            sizes_for_lica.extend(size_overrides)
 
-    return creative_ids
+        specs.append(_creative_spec('banner', template_creative, line_item_id, base_size, current_template_id,
+                                    targeting_name, sizes_for_lica, [banner_filename] if banner_filename else [],
+                                    impression_tracker=impression_tracker))
 
-def get_html_variable_name(client, template_id):
-    creative_template_service = client.GetService('CreativeTemplateService', version='v202408')
-    # Use a filter statement to fetch the template by ID
-    filter_statement = {
-        'query': 'WHERE id = :id',
-        'values': [
-            {'key': 'id', 'value': {'xsi_type': 'NumberValue', 'value': template_id}}
-        ]
-    }
-    response = creative_template_service.getCreativeTemplatesByStatement(filter_statement)
-    templates = getattr(response, 'results', [])
-    if not templates:
-        print(f"⚠️ No template found with ID {template_id}")
-        return 'ScriptCode'  # Common fallback
-    
-    template = templates[0]
-    template_variables = getattr(template, 'variables', [])
-    
-    # Debug: Print all available variables
-    print(f"🔍 Available variables in template {template_id}:")
-    for var in template_variables:
-        var_name = getattr(var, 'uniqueName', 'Unknown')
-        var_type = getattr(var, 'type', 'Unknown')
-        print(f"  - {var_name} ({var_type})")
-    
-    # Look for HTML-related variables first
-    for var in template_variables:
-        var_name = getattr(var, 'uniqueName', '')
-        var_type = getattr(var, 'type', '')
-        if var_type == 'StringCreativeTemplateVariable' and 'html' in var_name.lower():
-            print(f"✅ Found HTML variable: {var_name}")
-            return var_name
+    return specs
+
+def _payload_bytes(template_creative):
+    """Rough request size of a creative: asset bytes plus string variable values."""
+    size = 0
+    for variable in template_creative.get('creativeTemplateVariableValues', []):
+        asset = variable.get('asset')
+        if asset and asset.get('assetByteArray'):
+            size += len(asset['assetByteArray'])
+        elif isinstance(variable.get('value'), str):
+            size += len(variable['value'])
+    return size
+
+
+def _next_chunk(specs, pending, network_code, chunk_size=None, max_bytes=CREATIVE_BATCH_MAX_BYTES, uploading=None, store=None):
+    """
+    Take the next createCreatives call from the pending spec positions, bounded by count and payload size.
+
+    Creatives that would upload a blob another creative of the call (or of
+    uploading, the blobs of calls running alongside) already uploads wait for
+    a later call, where they reference it by assetId.
+
+    Returns:
+        tuple: ([(position, prepared assets)], positions left for later calls)
+    """
+    chunk_size = max(1, chunk_size or CREATIVE_BATCH_SIZE)
+    chunk, deferred, chunk_bytes = [], [], 0
+    uploading = uploading if uploading is not None else set()
+    for i, position in enumerate(pending):
+        prepared = prepare_creative_assets(specs[position]['creative'], network_code, store)
+        payload = _payload_bytes(prepared[0])
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + payload > max_bytes):
+            return chunk, deferred + pending[i:]
+        if prepared[1] & uploading:
+            deferred.append(position)
+            continue
+        chunk.append((position, prepared))
+        uploading |= prepared[1]
+        chunk_bytes += payload
+    return chunk, deferred
+
+
+def _log_created_creative(spec, creative_id):
+    if spec['kind'] == 'script':
+        log_msg = f"✅ Created script-only creative ID: {creative_id} for {spec['size']} using AI template"
+    elif spec['kind'] == 'in_banner':
+        log_msg = f"✅ Created In-Banner video creative ID: {creative_id} with size {spec['size']}"
+    else:
+        log_msg = f"✅ Created creative ID: {creative_id} for {spec['size']} with targeting name: {spec['targeting_name']}"
+    if spec['impression_tracker'] and spec['kind'] != 'in_banner':
+        log_msg += " with impression tracker"
+    logging.info(log_msg)
+    print(log_msg)
+
+    # Log creative creation with actual template_id and creative_id
+    from logging_utils import logger
+    logger.log_creative_creation(
+        template_id=str(spec['template_id']),
+        creative_id=str(creative_id),
+        size=spec['size'],
+        asset_files=spec['asset_files']
+    )
+
+
+def submit_template_creatives(client, specs, chunk_size=None, max_workers=None, store=None):
+    """
+    Creates built creatives in chunked createCreatives calls and associates them with their line items.
     
-    # Look for ScriptCode variable (common for AI templates)
-    for var in template_variables:
-        var_name = getattr(var, 'uniqueName', '')
-        var_type = getattr(var, 'type', '')
-        if var_type == 'StringCreativeTemplateVariable' and var_name == 'ScriptCode':
-            print(f"✅ Found ScriptCode variable: {var_name}")
-            return var_name
+    When GAM rejects a chunk, the creatives it names in the error fail and the
+    rest are sent again (one at a time if it names none), so one bad creative
+    does not fail the others. A chunk that times out or loses its connection
+    is not resent, since GAM may have created it. The LICAs are then created with
+    create_licas_bulk.
+
+    Each creative is first checked against its template schema (see
+    template_registry); invalid ones are not sent.
+
+    Image bytes already uploaded to this network are referenced by assetId
+    (see asset_dedupe), so each distinct file is uploaded once.
+
+    Chunks are sent in parallel waves on the creative pipeline (see
+    creative_pipeline); the chunks of a wave upload disjoint sets of blobs.
     
-    # If no HTML or ScriptCode found, use the first StringCreativeTemplateVariable
-    for var in template_variables:
-        var_name = getattr(var, 'uniqueName', '')
-        var_type = getattr(var, 'type', '')
-        if var_type == 'StringCreativeTemplateVariable':
-            print(f"✅ Using first string variable: {var_name}")
-            return var_name
+    Args:
+        client (AdManagerClient): The Google Ad Manager client
+        specs (list): Specs from build_custom_template_creatives, possibly for several sizes
+        chunk_size (int, optional): Creatives per call (default: CREATIVE_BATCH_SIZE)
+        max_workers (int, optional): Parallel calls (default: CREATIVE_PIPELINE_WORKERS)
+        store (AssetStore, optional): Store the specs' assets were read from, for their cached digests
+        
+    Returns:
+        list: One dict per spec, in order, with size, targeting_name, template_id,
+              creative_id (None if not created) and error (None on success)
+    """
+    creative_service = gam_service(client, 'CreativeService')
+    lica_service = gam_service(client, 'LineItemCreativeAssociationService')
+    results = [{
+        'size': spec['size'],
+        'targeting_name': spec['targeting_name'],
+        'template_id': spec['template_id'],
+        'creative_id': None,
+        'error': None,
+    } for spec in specs]
+    if not specs:
+        return results
+
+    # Names are timestamped when built; creatives built in the same millisecond need distinct names
+    seen_names = {}
+    for spec in specs:
+        name = spec['creative']['name']
+        if name in seen_names:
+            seen_names[name] += 1
+            spec['creative']['name'] = f"{name}_{seen_names[name]}"
+        else:
+            seen_names[name] = 0
+
+    network_code = getattr(client, 'network_code', None)
+    stats = {'calls': 0, 'uploaded': set(), 'referenced': set()}
+    stats_lock = threading.Lock()
+
+    def create(entries):
+        gam_rate_limiter.acquire()
+        try:
+            # Memory-mapped blobs are copied only for the call that sends them
+            created = creative_service.createCreatives([materialize_assets(prepared[0]) for _, prepared in entries]) or []
+        finally:
+            with stats_lock:
+                stats['calls'] += 1
+        # Matched by name; GAM returns creatives in request order, which is the fallback
+        created_by_name = {creative['name']: creative for creative in created}
+        for i, (position, prepared) in enumerate(entries):
+            creative = created_by_name.get(specs[position]['creative']['name'])
+            if creative is None and len(created) == len(entries):
+                creative = created[i]
+            if creative is None:
+                results[position]['error'] = "createCreatives returned no creative"
+                continue
+            results[position]['creative_id'] = creative['id']
+            remember_created_assets(creative, prepared[3], network_code)
+            with stats_lock:
+                stats['uploaded'] |= prepared[1]
+                stats['referenced'] |= prepared[2]
+
+    pending = []
+    validate = True
+    for position, spec in enumerate(specs):
+        errors, warnings = [], []
+        if validate:
+            try:
+                errors, warnings = template_registry.validate_creative(client, spec['creative'])
+            except Exception as e:
+                print(f"⚠️ Could not load template schemas, sending without local validation: {e}")
+                validate = False
+        for warning in warnings:
+            print(f"⚠️ {warning}")
+        if errors:
+            results[position]['error'] = f"Invalid creative for template {spec['template_id']}: {'; '.join(errors)}"
+            logging.error(f"⚠️ Failed to create creatives for size {spec['size']}: {results[position]['error']}")
+            continue
+        pending.append(position)
+
+    def fail(position, error_msg):
+        results[position]['error'] = error_msg
+        logging.error(f"⚠️ Failed to create creatives for size {specs[position]['size']}: {error_msg}")
+
+    def create_chunk(chunk):
+        try:
+            create(chunk)
+            return
+        except Exception as e:
+            error = e
+        if not _is_api_rejection(error):
+            # Timeouts and dropped connections: GAM may have created the creatives, resending could duplicate them
+            for position, _ in chunk:
+                fail(position, f"{error} (not resent, the creatives may have been created)")
+            return
+
+        rejected = _rejected_positions(error, len(chunk), CREATIVE_FIELD_PATH_PATTERN)
+        if not rejected and len(chunk) > 1:
+            print(f"⚠️ Batch of {len(chunk)} creatives rejected ({error}), creating them one by one")
+            for entry in chunk:
+                create_chunk([entry])
+            return
+        rejected = rejected or {0}
+        remaining, upload_again = [], []
+        for i, (position, prepared) in enumerate(chunk):
+            if i not in rejected:
+                remaining.append((position, prepared))
+            elif prepared[2]:
+                # A referenced asset may no longer exist in GAM; send this creative again with its bytes
+                forget_assets(prepared[2], network_code)
+                upload_again.append(position)
+            else:
+                fail(position, str(error))
+        if remaining:
+            create_chunk(remaining)
+        for position in upload_again:
+            create_chunk([(position, prepare_creative_assets(specs[position]['creative'], network_code, store))])
+
+    max_workers = max_workers or CREATIVE_PIPELINE_WORKERS
+    print(f"📦 Creating {len(specs)} creative(s) in createCreatives calls of up to {chunk_size or CREATIVE_BATCH_SIZE}, "
+          f"{max_workers} at a time")
+    while pending:
+        # A wave of chunks that can run side by side: no blob is uploaded by two of them
+        wave, uploading = [], set()
+        while pending and len(wave) < max_workers:
+            chunk, pending = _next_chunk(specs, pending, network_code, chunk_size, uploading=uploading, store=store)
+            if not chunk:
+                break
+            wave.append(chunk)
+        run_ordered(create_chunk, wave, max_workers)
+    print(f"📦 {stats['calls']} createCreatives call(s): {len(stats['uploaded'])} asset(s) uploaded, "
+          f"{len(stats['referenced'])} reused by assetId")
+
+    # All associations of the created creatives go out together
+    created = [position for position, result in enumerate(results) if result['creative_id'] is not None]
+    licas = [{
+        'creativeId': results[position]['creative_id'],
+        'lineItemId': specs[position]['line_item_id'],
+        'targetingName': specs[position]['targeting_name'],
+        'sizes': specs[position]['lica_sizes']
+    } for position in created]
+    lica_outcomes = create_licas_bulk(lica_service, licas) if licas else []
+    for position, outcome in zip(created, lica_outcomes):
+        if outcome['error']:
+            results[position]['error'] = outcome['error']
+            logging.error(f"⚠️ Failed to create creatives for size {specs[position]['size']}: {outcome['error']}")
+            continue
+        _log_created_creative(specs[position], results[position]['creative_id'])
+
+    return results
+
+
+def create_custom_template_creatives(client, order_id, line_item_id, destination_url, expresso_id,
+                                     size_name, landing_page=None,
+                                     impression_tracker=None, script_code=None, template_id=None, In_Banner_video=None, line_type=None, tracking_tag=None,
+                                     store=None):
+    """
+    Creates custom template creatives and associates them with a line item.
     
-    # Last resort fallback
-    print(f"⚠️ No suitable variable found, using ScriptCode as fallback")
-    return 'ScriptCode'
+    Args:
+        client (AdManagerClient): The Google Ad Manager client
+        order_id (str): Order ID to associate the creative with
+        line_item_id (str): Line item ID to associate the creative with
+        destination_url (str): Default click-through URL
+        expresso_id (str): Expresso tracking ID
+        size_name (str): Size name in format 'WIDTHxHEIGHT' (e.g., '300x250')
+        landing_page (str, optional): Landing page URL (falls back to destination_url if not provided)
+        impression_tracker (str, optional): Third-party impression tracker URL
+        script_code (str, optional): JavaScript or HTML code from tag file for AI template
+        template_id (int, optional): Custom template ID to use, overrides auto-detection
+        store (AssetStore, optional): The submission's asset store (default: a store for this call only)
+        
+    Returns:
+        list: List of created creative IDs
+        
+    Raises:
+        ValueError: If required fields are missing or no creatives are found
+    """
+    # A store of its own unless the caller's submission shares one
+    own_store = store is None
+    store = AssetStore() if own_store else store
+    try:
+        specs = build_custom_template_creatives(
+            client, order_id, line_item_id, destination_url, expresso_id, size_name, landing_page,
+            impression_tracker, script_code, template_id, In_Banner_video, line_type, tracking_tag, store=store
+        )
+        results = submit_template_creatives(client, specs, store=store)
+    finally:
+        if own_store:
+            store.clear()
+    for spec, result in zip(specs, results):
+        if spec['strict'] and result['error']:
+            raise Exception(result['error'])
+    return [result['creative_id'] for result in results if result['creative_id'] is not None]
+
+def get_html_variable_name(client, template_id):
+    """Name of the variable that takes HTML content, from the cached template schema."""
+    var_name = template_registry.html_variable_name(client, template_id)
+    print(f"✅ Found HTML variable: {var_name}")
+    return var_name
 
 
 # 🔍 Example usage
@@ -0,0 +1,262 @@
+"""
+Revision-aware snapshots of Google Sheets worksheets.
+
+The placement sheet changes rarely but is read several times per line item
+(TOI, ET and language worksheets). Each worksheet is downloaded once and kept
+in memory and on disk under cache/sheet_snapshots, tagged with the
+spreadsheet's Drive modifiedTime. Later reads only ask Drive for that
+timestamp (at most once per SHEET_REVISION_CHECK_INTERVAL per spreadsheet)
+and download the worksheet again only when it has changed. Several worksheets
+of the same spreadsheet are downloaded together in one values:batchGet call.
+
+If the Drive metadata call is not available (API disabled or scope missing),
+snapshots younger than SHEET_SNAPSHOT_MAX_AGE are reused instead.
+
+Usage:
+    python sheet_snapshot.py status
+    python sheet_snapshot.py clear
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import gspread
+from google.oauth2.service_account import Credentials
+from gspread.utils import absolute_range_name, extract_id_from_url, fill_gaps
+
+from config import CACHE_DIR
+
+SHEET_SNAPSHOT_DIR = os.path.join(CACHE_DIR, "sheet_snapshots")
+
+SHEET_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.metadata.readonly",
+]
+
+# Seconds between two Drive modifiedTime checks for the same spreadsheet
+SHEET_REVISION_CHECK_INTERVAL = 60
+# Fallback freshness window when the revision cannot be read
+SHEET_SNAPSHOT_MAX_AGE = 15 * 60
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_sheets_client(credentials_path):
+    """Return an authorized gspread client, created once per credentials file."""
+    with _clients_lock:
+        client = _clients.get(credentials_path)
+        if client is None:
+            creds = Credentials.from_service_account_file(credentials_path, scopes=SHEET_SCOPES)
+            client = gspread.authorize(creds)
+            _clients[credentials_path] = client
+        return client
+
+
+def _snapshot_path(spreadsheet_id, sheet_name):
+    safe_name = re.sub(r'[^A-Za-z0-9_-]+', '_', sheet_name).strip('_')
+    return os.path.join(SHEET_SNAPSHOT_DIR, f"{spreadsheet_id}__{safe_name}.json")
+
+
+class SheetSnapshotCache:
+    """In-memory + on-disk worksheet snapshots keyed by (spreadsheet id, worksheet name)."""
+
+    def __init__(self):
+        self._snapshots = {}  # (spreadsheet_id, sheet_name) -> snapshot dict
+        self._revisions = {}  # spreadsheet_id -> (checked_at, modifiedTime or None)
+        self._lock = threading.RLock()
+        self._key_locks = {}  # one download at a time per worksheet (and revision check per spreadsheet)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _load_snapshot(self, spreadsheet_id, sheet_name):
+        key = (spreadsheet_id, sheet_name)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+        path = _snapshot_path(spreadsheet_id, sheet_name)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                self._snapshots[key] = snapshot
+            except Exception as e:
+                print(f"⚠️ Could not read sheet snapshot {path}: {e}")
+        return snapshot
+
+    def _save_snapshot(self, spreadsheet_id, sheet_name, snapshot):
+        self._snapshots[(spreadsheet_id, sheet_name)] = snapshot
+        path = _snapshot_path(spreadsheet_id, sheet_name)
+        try:
+            os.makedirs(SHEET_SNAPSHOT_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Could not write sheet snapshot {path}: {e}")
+
+    def get_revision(self, client, spreadsheet_id, force=False):
+        """
+        Return the spreadsheet's Drive modifiedTime, checked at most once per interval.
+
+        Returns:
+            str or None: modifiedTime, or None if Drive metadata is unavailable
+        """
+        called = time.time()
+        with self._lock:
+            checked = self._revisions.get(spreadsheet_id)
+            if not force and checked and called - checked[0] < SHEET_REVISION_CHECK_INTERVAL:
+                return checked[1]
+        # One Drive check per spreadsheet at a time; callers arriving meanwhile wait for
+        # its answer. The cache lock is not held, so other spreadsheets are not held up
+        with self._key_lock((spreadsheet_id, None)):
+            with self._lock:
+                checked = self._revisions.get(spreadsheet_id)
+                if checked and (checked[0] >= called if force else time.time() - checked[0] < SHEET_REVISION_CHECK_INTERVAL):
+                    return checked[1]
+            started = time.time()
+            try:
+                revision = client.get_file_drive_metadata(spreadsheet_id).get("modifiedTime")
+            except Exception as e:
+                print(f"⚠️ Could not read sheet revision for {spreadsheet_id}: {e}")
+                revision = None
+            with self._lock:
+                self._revisions[spreadsheet_id] = (started, revision)
+            return revision
+
+    def get_values(self, credentials_path, sheet_url, sheet_name, force_refresh=False):
+        """
+        Return all cell values of a worksheet, downloading only when the sheet changed.
+
+        Args:
+            credentials_path: Service account JSON file
+            sheet_url: Spreadsheet URL
+            sheet_name: Worksheet title
+            force_refresh: Download even if the snapshot looks current
+
+        Returns:
+            list: Rows of cell strings, header row first (shared, do not modify)
+        """
+        return self.get_many_values(credentials_path, sheet_url, [sheet_name], force_refresh=force_refresh)[sheet_name]
+
+    def _is_current(self, snapshot, revision):
+        if snapshot is None:
+            return False
+        if revision is not None:
+            return snapshot.get("revision") == revision
+        return time.time() - snapshot.get("fetched_at", 0) < SHEET_SNAPSHOT_MAX_AGE
+
+    def get_many_values(self, credentials_path, sheet_url, sheet_names, force_refresh=False):
+        """
+        Return the values of several worksheets of one spreadsheet.
+
+        Current snapshots are reused; all stale or missing worksheets are
+        downloaded together in a single values:batchGet request.
+
+        Returns:
+            dict: Worksheet title -> rows of cell strings (shared, do not modify)
+        """
+        spreadsheet_id = extract_id_from_url(sheet_url)
+        client = get_sheets_client(credentials_path)
+        sheet_names = list(dict.fromkeys(sheet_names))
+        if not sheet_names:
+            return {}
+
+        # Sorted so that concurrent callers take the worksheet locks in the same order
+        key_locks = [self._key_lock((spreadsheet_id, name)) for name in sorted(sheet_names)]
+        for key_lock in key_locks:
+            key_lock.acquire()
+        try:
+            revision = self.get_revision(client, spreadsheet_id, force=force_refresh)
+            values_by_name = {}
+            stale = []
+            for sheet_name in sheet_names:
+                with self._lock:
+                    snapshot = self._load_snapshot(spreadsheet_id, sheet_name)
+                if not force_refresh and self._is_current(snapshot, revision):
+                    print(f"📋 Using snapshot of '{sheet_name}' (revision {snapshot.get('revision')})")
+                    values_by_name[sheet_name] = snapshot["values"]
+                else:
+                    stale.append(sheet_name)
+
+            if stale:
+                start = time.time()
+                # gspread.Client has no values_batch_get; the batchGet call lives on its HTTP client
+                response = client.http_client.values_batch_get(spreadsheet_id, [absolute_range_name(name) for name in stale])
+                fetched_at = time.time()
+                for sheet_name, value_range in zip(stale, response.get("valueRanges", [])):
+                    # Same padding as Worksheet.get_all_values
+                    try:
+                        values = fill_gaps(value_range.get("values", [[]]))
+                    except KeyError:
+                        values = [[]]
+                    snapshot = {
+                        "spreadsheet_id": spreadsheet_id,
+                        "sheet_name": sheet_name,
+                        "revision": revision,
+                        "fetched_at": fetched_at,
+                        "values": values,
+                    }
+                    with self._lock:
+                        self._save_snapshot(spreadsheet_id, sheet_name, snapshot)
+                    values_by_name[sheet_name] = values
+                print(f"📥 Downloaded {len(stale)} worksheet(s) {stale} in one request in {time.time() - start:.2f}s (revision {revision})")
+
+            return {sheet_name: values_by_name[sheet_name] for sheet_name in sheet_names}
+        finally:
+            for key_lock in reversed(key_locks):
+                key_lock.release()
+
+    def invalidate(self, sheet_url=None):
+        """Forget snapshots for one spreadsheet (or all) so the next read downloads again."""
+        with self._lock:
+            spreadsheet_id = extract_id_from_url(sheet_url) if sheet_url else None
+            for key in list(self._snapshots):
+                if spreadsheet_id is None or key[0] == spreadsheet_id:
+                    del self._snapshots[key]
+            if spreadsheet_id is None:
+                self._revisions.clear()
+            else:
+                self._revisions.pop(spreadsheet_id, None)
+            if os.path.isdir(SHEET_SNAPSHOT_DIR):
+                for file_name in os.listdir(SHEET_SNAPSHOT_DIR):
+                    if spreadsheet_id is None or file_name.startswith(f"{spreadsheet_id}__"):
+                        os.remove(os.path.join(SHEET_SNAPSHOT_DIR, file_name))
+
+
+sheet_snapshots = SheetSnapshotCache()
+
+
+def load_sheet_values(credentials_path, sheet_url, sheet_name, force_refresh=False):
+    """Module-level shortcut for sheet_snapshots.get_values."""
+    return sheet_snapshots.get_values(credentials_path, sheet_url, sheet_name, force_refresh=force_refresh)
+
+
+def load_sheets_values(credentials_path, sheet_url, sheet_names, force_refresh=False):
+    """Module-level shortcut for sheet_snapshots.get_many_values."""
+    return sheet_snapshots.get_many_values(credentials_path, sheet_url, sheet_names, force_refresh=force_refresh)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "clear":
+        sheet_snapshots.invalidate()
+        print(f"🗑️ Cleared sheet snapshots in {SHEET_SNAPSHOT_DIR}")
+    else:
+        files = sorted(os.listdir(SHEET_SNAPSHOT_DIR)) if os.path.isdir(SHEET_SNAPSHOT_DIR) else []
+        if not files:
+            print(f"❌ No sheet snapshots in {SHEET_SNAPSHOT_DIR}")
+        for file_name in files:
+            if not file_name.endswith(".json"):
+                continue
+            with open(os.path.join(SHEET_SNAPSHOT_DIR, file_name), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            age = int(time.time() - snapshot.get("fetched_at", 0))
+            print(f"📋 {snapshot['sheet_name']}: {len(snapshot['values'])} rows, revision {snapshot['revision']}, fetched {age}s ago")
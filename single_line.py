@@ -2,8 +2,9 @@ import os
 import glob
 from googleads import ad_manager
 from datetime import datetime
-from ros_banner_template_creatives import create_custom_template_creatives
-from placements_for_creatives import fetch_placements_ids
+from ros_banner_template_creatives import (create_custom_template_creatives, build_custom_template_creatives,
+                                           submit_template_creatives)
+from placements_for_creatives import fetch_placements_for_sheets
 import sys
 import requests
 import hashlib
@@ -12,16 +13,27 @@ import json
 import pandas as pd
 import re
 import traceback
-from config import CREATIVES_FOLDER, CREDENTIALS_PATH
+from config import (CREATIVES_FOLDER, CREDENTIALS_PATH, PLACEMENT_SHEET_URL, PLACEMENT_SHEET_NAME_LANG,
+                    PLACEMENT_SHEET_NAME_TOI, PLACEMENT_SHEET_NAME_ET, PLACEMENT_SOURCE)
 import time
 import uuid
 from logging_utils import logger
+from geo_index import (get_geo_index, parse_geo_rows, pick_preferred_match, resolve_from_matches,
+                       normalize_geo_name, INDEXED_GEO_TYPES, cache_geo_lookup, cache_geo_lookups, cached_geo_lookup)
+from geo_aliases import expand_geo_names, geo_name_candidates, get_geo_matcher, suggest_geo_names
+from cache_utils import TTLDiskCache
+from tag_rewrite import normalize_tag_frame, rewrite_script_tag, rewrite_impression_click, apply_cachebuster
+from excel_reader import read_sheet
+from creative_manifest import get_creative_manifest
+from asset_store import AssetStore
+from creative_pipeline import run_ordered
+from gam_transport import gam_service
 
 # Constants
-SHEET_URL = "https://docs.google.com/spreadsheets/d/11_SZJnn5KALr6zi0JA27lKbmQvA1WSK4snp0UTY2AaY/edit?gid=2043018330"
-PLACEMENT_SHEET_NAME_LANG = "ALL LANGUAGES"
-PLACEMENT_SHEET_NAME_TOI = "TOI + ETIMES"
-PLACEMENT_SHEET_NAME_ET = "ET Placement/Preset"
+SHEET_URL = PLACEMENT_SHEET_URL
+# How placement worksheets are downloaded: "batched" (one Sheets request for all),
+# "concurrent" (one request per worksheet, in parallel) or "serial"
+PLACEMENT_FETCH_MODE = os.environ.get("PLACEMENT_FETCH_MODE", "batched")
 
 # Print sheet information for debugging
 print(f"\nSheet Configuration:")
@@ -33,6 +45,9 @@ print(f"ET Sheet: {PLACEMENT_SHEET_NAME_ET}")
 # Create creatives folder if it doesn't exist
 os.makedirs(CREATIVES_FOLDER, exist_ok=True)
 
+# Parsed tag files keyed by (path, mtime, size, content hash)
+tag_file_cache = TTLDiskCache(ttl=None, max_entries=8)
+
 available_presets = ["300x250", "320x50", "125x600", "300x600", "728x90", "980x200", "320x480","1260x570","728x500","1320x570","600x250","320x100"]
 
 # Standard Banner Presets
@@ -60,17 +75,70 @@ richmedia_presets_dict = {
 }
 
 class LocationNotFoundError(Exception):
-    def __init__(self, location_name):
-        super().__init__(f"No matching location found at any level for: {location_name}")
-        self.location_name = location_name
+    def __init__(self, location_name, resolved=None, suggestions=None):
+        # Accept a single name or every unresolved name from a batched lookup
+        if isinstance(location_name, (list, tuple)):
+            self.location_names = list(location_name)
+        else:
+            self.location_names = [location_name]
+        self.location_name = ", ".join(str(name) for name in self.location_names)
+        # Names that did resolve in the same batch (name -> geo ID)
+        self.resolved = resolved or {}
+        # Ranked alternatives per unresolved name (name -> [suggested names])
+        self.suggestions = suggestions or {}
+        super().__init__(f"No matching location found at any level for: {self.location_name}")
+
+    def describe(self):
+        """The unresolved names with their suggestions, for messages shown to the user."""
+        return describe_unresolved_locations({name: self.suggestions.get(name, []) for name in self.location_names})
+
+
+def describe_unresolved_locations(unresolved):
+    """Format {name: [suggested names]} as "'Bangalor' (did you mean: Bengaluru?), 'Xyz'"."""
+    return ", ".join(
+        f"'{name}'" + (f" (did you mean: {', '.join(suggestions)}?)" if suggestions else "")
+        for name, suggestions in unresolved.items()
+    )
 
-def get_geo_id(client, location_name):
+def get_geo_id(client, location_name, use_index=True):
     """
     Hierarchical Geo ID search: Country → State/Region → City → Sub-District
     Returns the most specific matching Geo ID available
+
+    The local Geo_Target index (see geo_index.py) is consulted first; live PQL
+    queries are only sent when the index is not synced or does not know the name.
+    Aliases such as Bangalore/Bengaluru are tried first, then the name as entered.
     """
+    *aliases, location_name = geo_name_candidates(location_name)
+    for alias in aliases:
+        try:
+            return _lookup_geo_id(client, alias, use_index)
+        except LocationNotFoundError:
+            print(f"🔍 Alias '{alias}' not found, trying '{location_name}'")
+    return _lookup_geo_id(client, location_name, use_index)
+
+
+def _lookup_geo_id(client, location_name, use_index=True):
+    """get_geo_id for one exact name (index, lookup cache, then live PQL)."""
+    if use_index:
+        geo_index = get_geo_index()
+        if geo_index.is_available:
+            geo_type, final_match = geo_index.lookup(location_name)
+            if final_match:
+                print(f"✅ Found as {geo_type} (index): {final_match['Name']}, {final_match['CountryCode']}, ID: {final_match['Id']}")
+                return final_match["Id"]
+            print(f"🔍 {location_name} not in Geo_Target index, querying Ad Manager")
+
+    found, cached_id = cached_geo_lookup(location_name)
+    if found:
+        if cached_id is not None:
+            print(f"✅ Found {location_name} in geo cache, ID: {cached_id}")
+            return cached_id
+        print(f"⏭️ {location_name} is a cached miss, not querying Ad Manager again")
+        raise LocationNotFoundError(location_name, suggestions={location_name: [s for s, _ in suggest_geo_names(location_name)]})
+
     #print(f"🔍 Searching for Geo ID of: {location_name}")
-    pql_service = client.GetService("PublisherQueryLanguageService", version="v202408")
+    pql_service = gam_service(client, "PublisherQueryLanguageService")
 
     # Try as Country first
     country_query = f"""
@@ -118,49 +186,175 @@ def get_geo_id(client, location_name):
         ("SUB_DISTRICT", sub_district_query)
     ]
 
+    query_failed = False
     for geo_type, query in queries:
         try:
             statement = {'query': query}
             response = pql_service.select(statement)
             
-            if 'rows' in response and response['rows']:
-                rows = response['rows']
-                matches = []
-                
-                for row in rows:
-                    values = row["values"]
-                    geo_data = {
-                        "Id": values[0]["value"],
-                        "Name": values[1]["value"],
-                        "Targetable": values[2]["value"],
-                        "Type": values[3]["value"],
-                        "CountryCode": values[4]["value"]
-                    }
-                    matches.append(geo_data)
-                
+            matches = parse_geo_rows(response)
+            if matches:
                 # Prioritize India (IN) and US locations
-                india_matches = [m for m in matches if m["CountryCode"] == "IN"]
-                us_matches = [m for m in matches if m["CountryCode"] == "US"]
-                
-                final_match = (
-                    india_matches[0] if india_matches 
-                    else us_matches[0] if us_matches 
-                    else matches[0]
-                )
+                final_match = pick_preferred_match(matches)
                 
                 print(f"✅ Found as {geo_type}: {final_match['Name']}, {final_match['CountryCode']}, ID: {final_match['Id']}")
+                cache_geo_lookup(location_name, final_match["Id"])
                 return final_match["Id"]
                 
         except Exception as e:
             print(f"⚠️ Error searching as {geo_type}: {e}")
+            query_failed = True
+            continue
+
+    # Only a clean "no rows at every level" answer is cached as a miss
+    if not query_failed:
+        cache_geo_lookup(location_name, None)
+
+    suggestions = [suggestion for suggestion, _ in suggest_geo_names(location_name)]
+    print(f"❌ No matching location found at any level for: {location_name}" + (f" (did you mean: {', '.join(suggestions)}?)" if suggestions else ""))
+    raise LocationNotFoundError(location_name, suggestions={location_name: suggestions})
+
+
+GEO_BATCH_SIZE = 50
+
+
+def _query_geo_targets(pql_service, names):
+    """
+    Fetch Geo_Target rows for many names with `Name IN (...)` queries across all target types.
+
+    Returns:
+        tuple: (dict of normalized name -> list of matching rows,
+                set of names whose query failed and therefore have no answer)
+    """
+    type_list = ", ".join(f"'{geo_type}'" for geo_type in INDEXED_GEO_TYPES)
+    matches_by_name = {}
+    failed_names = set()
+
+    for chunk_start in range(0, len(names), GEO_BATCH_SIZE):
+        chunk = names[chunk_start:chunk_start + GEO_BATCH_SIZE]
+        placeholders = ", ".join(f":name{i}" for i in range(len(chunk)))
+        statement = (ad_manager.StatementBuilder()
+                     .Select('Id, Name, Targetable, Type, CountryCode')
+                     .From('Geo_Target')
+                     .Where(f"Name IN ({placeholders}) AND Targetable = true AND Type IN ({type_list})")
+                     .OrderBy('Id', ascending=True))
+        for i, name in enumerate(chunk):
+            statement.WithBindVariable(f"name{i}", name)
+
+        try:
+            while True:
+                response = pql_service.select(statement.ToStatement())
+                page = parse_geo_rows(response)
+                for match in page:
+                    matches_by_name.setdefault(normalize_geo_name(match["Name"]), []).append(match)
+                if len(page) < statement.limit:
+                    break
+                statement.offset += statement.limit
+        except Exception as e:
+            print(f"⚠️ Error in batched geo lookup for {chunk}: {e}")
+            failed_names.update(chunk)
+
+    print(f"🔍 Batched geo lookup for {len(names)} location(s) returned {sum(len(m) for m in matches_by_name.values())} row(s)")
+    return matches_by_name, failed_names
+
+
+def get_geo_ids(client, location_names, use_index=True):
+    """
+    Batched version of get_geo_id for a whole geo list.
+
+    Each name is looked up by its alias target (Bangalore → Bengaluru) and then
+    as entered, so an alias never hides a name GAM knows. Names known to the local
+    Geo_Target index are resolved in-process; the rest are fetched together with
+    `Name IN (...)` PQL queries across every target type, and the
+    COUNTRY → REGION → CITY → SUB_DISTRICT precedence and IN/US preference are
+    then applied in memory. Remaining misses are auto-corrected when the fuzzy
+    matcher has one confident candidate, otherwise they get ranked suggestions.
+
+    Args:
+        client: AdManagerClient
+        location_names: List of location names (expand clusters with geo_aliases.expand_geo_names first)
+        use_index: Consult the local Geo_Target index first
+
+    Returns:
+        dict: Location name -> Geo ID for every input name
+
+    Raises:
+        LocationNotFoundError: Listing every unresolvable name; the names that did
+            resolve are available as `resolved` and ranked alternatives as `suggestions`
+    """
+    unique_names = list(dict.fromkeys(str(name).strip() for name in location_names if str(name).strip()))
+    resolved = {}
+    geo_index = get_geo_index() if use_index else None
+
+    def resolve_locally(name, lookup_names):
+        """Answer from the Geo_Target index or the shared lookup cache, trying lookup_names in order."""
+        if geo_index is not None and geo_index.is_available:
+            for lookup_name in lookup_names:
+                geo_type, final_match = geo_index.lookup(lookup_name)
+                if final_match:
+                    print(f"✅ Found {name} as {geo_type} (index): {final_match['Name']}, {final_match['CountryCode']}, ID: {final_match['Id']}")
+                    resolved[name] = final_match["Id"]
+                    return True
+        cached = [cached_geo_lookup(lookup_name) for lookup_name in lookup_names]
+        for found, cached_id in cached:
+            if found and cached_id is not None:
+                print(f"✅ Found {name} in geo cache, ID: {cached_id}")
+                resolved[name] = cached_id
+                return True
+        if all(found for found, _ in cached):
+            print(f"⏭️ {name} is a cached miss, not querying Ad Manager again")
+            return True
+        return False
+
+    def resolve_batch(lookups):
+        remote = [(name, lookup_names) for name, lookup_names in lookups if not resolve_locally(name, lookup_names)]
+        if not remote:
+            return
+        pql_service = gam_service(client, "PublisherQueryLanguageService")
+        query_names = list(dict.fromkeys(n for _, lookup_names in remote for n in lookup_names))
+        matches_by_name, failed_names = _query_geo_targets(pql_service, query_names)
+        answers = {}
+        for name, lookup_names in remote:
+            for lookup_name in lookup_names:
+                geo_type, final_match = resolve_from_matches(matches_by_name.get(normalize_geo_name(lookup_name), []))
+                if final_match:
+                    print(f"✅ Found {name} as {geo_type}: {final_match['Name']}, {final_match['CountryCode']}, ID: {final_match['Id']}")
+                    resolved[name] = final_match["Id"]
+                    answers[lookup_name] = final_match["Id"]
+                    break
+                if lookup_name not in failed_names:
+                    # Errored chunks are not a "no such location" answer, so only clean misses are cached
+                    answers[lookup_name] = None
+        cache_geo_lookups(answers)
+
+    # Pass 1: alias target, then the name as entered
+    resolve_batch([(name, geo_name_candidates(name)) for name in unique_names])
+
+    # Pass 2: confident fuzzy corrections for whatever is still missing. The
+    # correction is looked up as matched; its alias target is only a fallback.
+    corrections = []
+    for name in unique_names:
+        if name in resolved:
             continue
+        corrected = get_geo_matcher().best_match(name)
+        if corrected:
+            print(f"📍 Auto-corrected '{name}' to '{corrected}'")
+            corrections.append((name, list(dict.fromkeys([corrected] + geo_name_candidates(corrected)))))
+    resolve_batch(corrections)
+
+    missing = [name for name in unique_names if name not in resolved]
+    if missing:
+        suggestions = {name: [suggestion for suggestion, _ in suggest_geo_names(name)] for name in missing}
+        for name, names in suggestions.items():
+            print(f"❌ No matching location found at any level for: {name}" + (f" (did you mean: {', '.join(names)}?)" if names else ""))
+        raise LocationNotFoundError(missing, resolved=resolved, suggestions=suggestions)
 
-    print(f"❌ No matching location found at any level for: {location_name}")
-    raise LocationNotFoundError(location_name)
+    return resolved
 
 
 def fetch_images_and_presets(folder_path, available_presets, presets_dict):
-    image_files = glob.glob(os.path.join(folder_path, "*.*"))
+    # Shares the folder listing with creative creation
+    image_files = get_creative_manifest(folder_path).paths()
     detected_presets = {}
     image_size_map = {}  # Map to track images for each size
     
@@ -193,324 +387,207 @@ def detect_line_type(line_name):
     else:
         return "standard"
 
+def find_tag_file():
+    """
+    Look for a tag file ('tag.xlsx', 'tags.xlsx', 'tag.xls', 'tags.xls', ...) in the
+    current directory, then in the 'creatives' directory.
+
+    Returns:
+        str: Path of the first tag file found, or None
+    """
+    # Get the current directory where the script is running
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    creatives_dir = os.path.join(current_dir, "creatives")
+    
+    # Define possible tag file names
+    tag_file_patterns = ['tag.xlsx', 'tags.xlsx', 'tag.xls', 'tags.xls', 'TOI Tags (2).xlsx', 'TOI Tags (2).xls']
+    
+    for directory in [current_dir, creatives_dir]:
+        if not os.path.exists(directory):
+            continue
+            
+        print(f"Checking directory for tag files: {directory}")
+        for file in os.listdir(directory):
+            file_lower = file.lower()
+            if any(pattern.lower() in file_lower for pattern in tag_file_patterns):
+                print(f"Found potential tag file: {os.path.join(directory, file)}")
+                return os.path.join(directory, file)
+    return None
+
+
+def parse_tag_file(tag_file_path):
+    """
+    Parse a tag file into the tag dictionary used for creative creation.
+
+    Args:
+        tag_file_path: Path to the Excel tag file
+
+    Returns:
+        dict: Dimension -> tag info (javascript, doubleclick or impression_click),
+              or None if the file has no usable tags or cannot be read
+    """
+    tag_file_name = os.path.basename(tag_file_path)
+    print(f"Attempting to read tag file at: {tag_file_path}")
+
+    try:
+        # Reads the 'tags' sheet (case insensitive) or else the first sheet, opening the workbook once
+        if tag_file_path.lower().endswith('.xlsx'):
+            df = read_sheet(tag_file_path, prefer_sheet='tags')
+        else:  # For xls files
+            try:
+                df = read_sheet(tag_file_path, prefer_sheet='tags')
+            except:
+                try:
+                    df = read_sheet(tag_file_path, prefer_sheet='tags', engine='openpyxl')
+                except:
+                    raise Exception(f"Failed to read {tag_file_path} with any Excel engine")
+
+        print("\nDataFrame Info:")
+        print(df.info())
+
+        # Create a dictionary to store dimensions and their corresponding tags
+        tag_dict = {}
+
+        # Find column names for dimensions, JavaScript tags, Impression Tags and Click Tags
+        dimension_col = None
+        tag_col = None
+        impression_tag_col = None
+        click_tag_col = None
+
+        print(f"Available columns: {list(df.columns)}")
+
+        # Look for exact column names first
+        for col in df.columns:
+            col_str = str(col).lower()
+            if col_str == 'Dimensions' or col_str == 'placementname':
+                dimension_col = col
+                print(f"Using exact match '{col}' as dimension column")
+            elif col_str == 'javascript tag' or col_str == 'js_https' or col_str == 'js_https':
+                tag_col = col
+                print(f"Using exact match '{col}' as tag column")
+            elif col_str == 'impression tag (image)' or col_str == 'impression tag':
+                impression_tag_col = col
+                print(f"Using exact match '{col}' as impression tag column")
+            elif col_str == 'click tag':
+                click_tag_col = col
+                print(f"Using exact match '{col}' as click tag column")
+
+
+        # If needed, look for partial matches
+        if not dimension_col:
+            for col in df.columns:
+                col_str = str(col).lower()
+                # Prioritize 'dimension' over 'placement' to get actual dimensions like '300x250'
+                if 'dimension' in col_str or 'size' in col_str:
+                    dimension_col = col
+                    print(f"Using partial match '{col}' as dimension column")
+                    break
+
+            # If still no dimension column found, try placement as fallback
+            if not dimension_col:
+                for col in df.columns:
+                    col_str = str(col).lower()
+                    if 'placement' in col_str:
+                        dimension_col = col
+                        print(f"Using fallback '{col}' as dimension column")
+                        break
+
+        if not tag_col:
+            for col in df.columns:
+                col_str = str(col).lower()
+                if ('javascript' in col_str and 'tag' in col_str) or 'script' in col_str or 'js_' in col_str:
+                    tag_col = col
+                    print(f"Using partial match '{col}' as tag column")
+                    break
+
+        if not impression_tag_col:
+            for col in df.columns:
+                col_str = str(col).lower()
+                if 'impression' in col_str and 'tag' in col_str:
+                    impression_tag_col = col
+                    print(f"Using partial match '{col}' as impression tag column")
+                    break
+
+        if not click_tag_col:
+            for col in df.columns:
+                col_str = str(col).lower()
+                if 'click' in col_str and 'tag' in col_str:
+                    click_tag_col = col
+                    print(f"Using partial match '{col}' as click tag column")
+                    break
+
+        # Final attempt to find tag column
+        if dimension_col and not tag_col and not (impression_tag_col and click_tag_col):
+            for col in df.columns:
+                col_str = str(col).lower()
+                if 'tag' in col_str:
+                    tag_col = col
+                    print(f"Using fallback '{col}' as tag column")
+                    break
+
+        has_columns = dimension_col and (tag_col or (impression_tag_col and click_tag_col))
+
+        if has_columns:
+            # Column-wise extraction, classification and tag rewrites (see tag_rewrite)
+            tag_dict = normalize_tag_frame(df, dimension_col, tag_col, impression_tag_col, click_tag_col)
+
+            if tag_dict:
+                print(f"Successfully read {len(tag_dict)} tags from {tag_file_name}")
+                return tag_dict
+            else:
+                print(f"No valid tag entries found in {tag_file_name}")
+        else:
+            print(f"Couldn't find required columns in {tag_file_name}. Found columns: {list(df.columns)}")
+            print("Looking for columns named 'Dimensions' or 'PlacementName' and either 'JavaScript Tag' or 'js_https'")
+
+    except Exception as e:
+        print(f"Error reading file {tag_file_name}: {str(e)}")
+        traceback.print_exc()
+
+    return None
+
+
 def read_tag_file():
     """
     Reads a tag file (Excel format) that contains creative dimensions and their corresponding JavaScript tags.
     
     This function looks for files with names like 'tag.xlsx', 'tags.xlsx', 'tag.xls', or 'tags.xls'
-    in both the current directory and the 'creatives' directory. If a file is found but can't be read,
-    it falls back to creating a simulated tag dictionary.
+    in both the current directory and the 'creatives' directory.
     
     The function now supports:
     1. JavaScript tags (traditional script tags)
     2. Impression/click tag combinations
     3. DoubleClick tags (DCM tags with <ins> elements)
     
+    Parsed results are cached by path, modification time and content hash, so
+    the same file is only read and normalized once. The returned dictionary is
+    shared between callers and must not be modified.
+    
     Returns:
         dict: A dictionary mapping dimension strings to their corresponding JavaScript tags,
               or None if no valid tag file is found or an error occurs.
     """
     try:
-        # Get the current directory where the script is running
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        creatives_dir = os.path.join(current_dir, "creatives")
-        
-        # Define possible tag file names
-        tag_file_patterns = ['tag.xlsx', 'tags.xlsx', 'tag.xls', 'tags.xls', 'TOI Tags (2).xlsx', 'TOI Tags (2).xls']
-        
-        # First, try to find a real tag file
-        real_tag_file = None
-        real_tag_dir = None
-        
-        for directory in [current_dir, creatives_dir]:
-            if not os.path.exists(directory):
-                continue
-                
-            print(f"Checking directory for tag files: {directory}")
-            for file in os.listdir(directory):
-                file_lower = file.lower()
-                if any(pattern.lower() in file_lower for pattern in tag_file_patterns):
-                    real_tag_file = file
-                    real_tag_dir = directory
-                    print(f"Found potential tag file: {os.path.join(real_tag_dir, real_tag_file)}")
-                    break
-            
-            if real_tag_file:
-                break
-                
-        # If we found a real tag file, try to read it
-        if real_tag_file:
-            tag_file_path = os.path.join(real_tag_dir, real_tag_file)
-            print(f"Attempting to read tag file at: {tag_file_path}")
-            
-            try:
-                # For xlsx files, try pandas
-                import pandas as pd
-                
-                def read_excel_with_sheet_selection(file_path, engine=None):
-                    """Helper function to read Excel file with preference for 'tags' sheet"""
-                    try:
-                        # Try to read sheet names first
-                        if engine:
-                            excel_file = pd.ExcelFile(file_path, engine=engine)
-                        else:
-                            excel_file = pd.ExcelFile(file_path)
-                        
-                        sheet_names = excel_file.sheet_names
-                        print(f"Available sheets: {sheet_names}")
-                        
-                        # Check for 'tags' sheet (case insensitive)
-                        target_sheet = None
-                        for sheet_name in sheet_names:
-                            if sheet_name.lower() == 'tags':
-                                target_sheet = sheet_name
-                                print(f"Found 'tags' sheet: {target_sheet}")
-                                break
-                        
-                        # If no 'tags' sheet found, use the first sheet
-                        if target_sheet is None:
-                            target_sheet = sheet_names[0]
-                            print(f"No 'tags' sheet found, using first sheet: {target_sheet}")
-                        
-                        # Read the selected sheet
-                        if engine:
-                            df = pd.read_excel(file_path, sheet_name=target_sheet, engine=engine)
-                        else:
-                            df = pd.read_excel(file_path, sheet_name=target_sheet)
-                        
-                        return df
-                    except Exception as e:
-                        print(f"Error reading Excel file with sheet selection: {e}")
-                        # Fallback to default behavior
-                        if engine:
-                            return pd.read_excel(file_path, engine=engine)
-                        else:
-                            return pd.read_excel(file_path)
-                
-                if tag_file_path.lower().endswith('.xlsx'):
-                    df = read_excel_with_sheet_selection(tag_file_path)
-                else:  # For xls files
-                    try:
-                        df = read_excel_with_sheet_selection(tag_file_path, engine='xlrd')
-                    except:
-                        try:
-                            df = read_excel_with_sheet_selection(tag_file_path, engine='openpyxl')
-                        except:
-                            raise Exception(f"Failed to read {tag_file_path} with any Excel engine")
-                
-                print("\nDataFrame Info:")
-                print(df.info())
-                
-                # Create a dictionary to store dimensions and their corresponding tags
-                tag_dict = {}
-                
-                # Find column names for dimensions, JavaScript tags, Impression Tags and Click Tags
-                dimension_col = None
-                tag_col = None
-                impression_tag_col = None
-                click_tag_col = None
-                
-                print(f"Available columns: {list(df.columns)}")
-                
-                # Look for exact column names first
-                for col in df.columns:
-                    col_str = str(col).lower()
-                    if col_str == 'Dimensions' or col_str == 'placementname':
-                        dimension_col = col
-                        print(f"Using exact match '{col}' as dimension column")
-                    elif col_str == 'javascript tag' or col_str == 'js_https' or col_str == 'js_https':
-                        tag_col = col
-                        print(f"Using exact match '{col}' as tag column")
-                    elif col_str == 'impression tag (image)' or col_str == 'impression tag':
-                        impression_tag_col = col
-                        print(f"Using exact match '{col}' as impression tag column")
-                    elif col_str == 'click tag':
-                        click_tag_col = col
-                        print(f"Using exact match '{col}' as click tag column")
-                        
-                
-                # If needed, look for partial matches
-                if not dimension_col:
-                    for col in df.columns:
-                        col_str = str(col).lower()
-                        # Prioritize 'dimension' over 'placement' to get actual dimensions like '300x250'
-                        if 'dimension' in col_str or 'size' in col_str:
-                            dimension_col = col
-                            print(f"Using partial match '{col}' as dimension column")
-                            break
-                    
-                    # If still no dimension column found, try placement as fallback
-                    if not dimension_col:
-                        for col in df.columns:
-                            col_str = str(col).lower()
-                            if 'placement' in col_str:
-                                dimension_col = col
-                                print(f"Using fallback '{col}' as dimension column")
-                                break
-                
-                if not tag_col:
-                    for col in df.columns:
-                        col_str = str(col).lower()
-                        if ('javascript' in col_str and 'tag' in col_str) or 'script' in col_str or 'js_' in col_str:
-                            tag_col = col
-                            print(f"Using partial match '{col}' as tag column")
-                            break
-                
-                if not impression_tag_col:
-                    for col in df.columns:
-                        col_str = str(col).lower()
-                        if 'impression' in col_str and 'tag' in col_str:
-                            impression_tag_col = col
-                            print(f"Using partial match '{col}' as impression tag column")
-                            break
-                
-                if not click_tag_col:
-                    for col in df.columns:
-                        col_str = str(col).lower()
-                        if 'click' in col_str and 'tag' in col_str:
-                            click_tag_col = col
-                            print(f"Using partial match '{col}' as click tag column")
-                            break
-                
-                # Final attempt to find tag column
-                if dimension_col and not tag_col and not (impression_tag_col and click_tag_col):
-                    for col in df.columns:
-                        col_str = str(col).lower()
-                        if 'tag' in col_str:
-                            tag_col = col
-                            print(f"Using fallback '{col}' as tag column")
-                            break
-                
-                has_columns = dimension_col and (tag_col or (impression_tag_col and click_tag_col))
-                
-                if has_columns:
-                    # Process the dataframe
-                    for index, row in df.iterrows():
-                        if pd.notnull(row[dimension_col]):
-                            dimension = str(row[dimension_col]).strip()
-                            
-                            # Check for Impression Tag and Click Tag first (new priority)
-                            if impression_tag_col and click_tag_col and pd.notnull(row[impression_tag_col]) and pd.notnull(row[click_tag_col]):
-                                impression_tag = str(row[impression_tag_col]).strip()
-                                click_tag = str(row[click_tag_col]).strip()
-                                
-                                # Skip empty entries
-                                if not dimension or not impression_tag or not click_tag:
-                                    continue
-                                
-                                # Clean up dimension string to ensure format like "300x250"
-                                if 'x' in dimension:
-                                    dimension_match = re.search(r'(\d+x\d+)', dimension)
-                                    if dimension_match:
-                                        dimension = dimension_match.group(1)
-                                
-                                # Store both tags in a dictionary
-                                tag_dict[dimension] = {
-                                    'type': 'impression_click',
-                                    'impression_tag': impression_tag,
-                                    'click_tag': click_tag
-                                }
-                                print(f"Added impression/click tags for dimension: {dimension}")
-                            
-                            # Fallback to JavaScript tag if impression/click tags not found
-                            elif tag_col and pd.notnull(row[tag_col]):
-                                js_tag = str(row[tag_col]).strip()
-                                
-                                # Skip empty entries
-                                if not dimension or not js_tag:
-                                    continue
-                                    
-                                # Clean up dimension string to ensure format like "300x250"
-                                if 'x' in dimension:
-                                    dimension_match = re.search(r'(\d+x\d+)', dimension)
-                                    if dimension_match:
-                                        dimension = dimension_match.group(1)
-                                
-                                # Handle <noscript> tags with <a> href, common in Flashtalking tags
-                                if '<noscript>' in js_tag.lower() and '<a href' in js_tag.lower():
-                                    print(f"Detected noscript/a href tag for dimension: {dimension}")
-                                    href_pattern = r'(<a\s+[^>]*?href=")([^"]*)"'
-                                    
-                                    # Prepend click macro if not already present
-                                    if '%%CLICK_URL_UNESC%%' not in js_tag:
-                                        replacement = r'\1%%CLICK_URL_UNESC%%\2"'
-                                        modified_tag = re.sub(href_pattern, replacement, js_tag, flags=re.IGNORECASE)
-                                        
-                                        if modified_tag != js_tag:
-                                            js_tag = modified_tag
-                                            print(f"Added %%CLICK_URL_UNESC%% to href in noscript tag for dimension: {dimension}")
-                                        else:
-                                            print(f"Warning: Could not add %%CLICK_URL_UNESC%% to href for dimension: {dimension}")
-                                    else:
-                                        print(f"Click macro already present for dimension: {dimension}")
-
-                                # Check if this is a DoubleClick tag (contains dcmads or data-dcm attributes)
-                                is_doubleclick = False
-                                if ('dcmads' in js_tag.lower() or 'data-dcm' in js_tag.lower()) and ('<ins' in js_tag.lower() or '<div' in js_tag.lower()):
-                                    is_doubleclick = True
-                                    print(f"Detected DoubleClick tag for dimension: {dimension}")
-                                    
-                                    # Ensure data-dcm-click-tracker is present in the DoubleClick tag
-                                    if 'data-dcm-click-tracker' not in js_tag:
-                                        try:
-                                            # Add data-dcm-click-tracker attribute before the class attribute
-                                            tag_pattern = r'(<ins|<div)([^>]*?)(\s+class=)'
-                                            replacement = r"\1\2 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\3"
-                                            modified_tag = re.sub(tag_pattern, replacement, js_tag, flags=re.IGNORECASE)
-                                            
-                                            # If that didn't work, try adding it after the opening tag
-                                            if modified_tag == js_tag:
-                                                tag_pattern = r'(<ins|<div)(\s)'
-                                                replacement = r"\1 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\2"
-                                                modified_tag = re.sub(tag_pattern, replacement, js_tag, flags=re.IGNORECASE)
-                                            
-                                            js_tag = modified_tag
-                                            print(f"Added data-dcm-click-tracker attribute to DoubleClick tag for dimension: {dimension}")
-                                        except Exception as e:
-                                            print(f"Warning: Could not add data-dcm-click-tracker to tag: {str(e)}")
-                                
-                                # Only add if tag is substantial
-                                if 'x' in dimension and len(js_tag.strip()) > 10:
-                                    # Check if this dimension already exists in the dictionary
-                                    if dimension in tag_dict:
-                                        # It's a duplicate, so append a counter
-                                        counter = 1
-                                        while f"{dimension}_{counter}" in tag_dict:
-                                            counter += 1
-                                        dimension_key = f"{dimension}_{counter}"
-                                        print(f"Found duplicate dimension {dimension}, using key {dimension_key}")
-                                    else:
-                                        dimension_key = dimension
-                                    
-                                    if is_doubleclick:
-                                        tag_dict[dimension_key] = {
-                                            'type': 'doubleclick',
-                                            'js_tag': js_tag
-                                        }
-                                        print(f"Added DoubleClick tag for dimension: {dimension}")
-                                    else:
-                                        tag_dict[dimension_key] = {
-                                            'type': 'javascript',
-                                            'js_tag': js_tag
-                                        }
-                                        print(f"Added JavaScript tag for dimension: {dimension}")
-                    
-                    if tag_dict:
-                        print(f"Successfully read {len(tag_dict)} tags from {real_tag_file}")
-                        return tag_dict
-                    else:
-                        print(f"No valid tag entries found in {real_tag_file}")
-                else:
-                    print(f"Couldn't find required columns in {real_tag_file}. Found columns: {list(df.columns)}")
-                    print("Looking for columns named 'Dimensions' or 'PlacementName' and either 'JavaScript Tag' or 'js_https'")
-            
-            except Exception as e:
-                print(f"Error reading file {real_tag_file}: {str(e)}")
-                traceback.print_exc()
-        
-        # If we didn't find or couldn't read a real tag file, fall back to simulated dictionary
-        print("No valid tag file found. Not creating simulated tags.")
-        return None
+        tag_file_path = find_tag_file()
+        if not tag_file_path:
+            print("No valid tag file found. Not creating simulated tags.")
+            return None
+
+        stat = os.stat(tag_file_path)
+        with open(tag_file_path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        cache_key = (tag_file_path, stat.st_mtime_ns, stat.st_size, content_hash)
+
+        found, tag_dict = tag_file_cache.lookup(cache_key)
+        if found:
+            print(f"♻️ Reusing parsed tag file {os.path.basename(tag_file_path)} ({len(tag_dict) if tag_dict else 0} tags)")
+            return tag_dict
+
+        tag_dict = parse_tag_file(tag_file_path)
+        tag_file_cache.set(cache_key, tag_dict)
+        if not tag_dict:
+            print("No valid tag file found. Not creating simulated tags.")
+        return tag_dict
         
     except Exception as e:
         print(f"Error in read_tag_file: {str(e)}")
@@ -518,11 +595,11 @@ def read_tag_file():
         traceback.print_exc()
         return None
 
+
 def check_line_item_name_exists(client, order_id, line_name_base):
     """Check if a line item with similar name already exists in the order"""
     try:
-        line_item_service = client.GetService('LineItemService', version='v202408')
-        pql_service = client.GetService('PublisherQueryLanguageService', version='v202408')
+        pql_service = gam_service(client, 'PublisherQueryLanguageService')
         
         # Query for line items in the order with similar names
         query = f"SELECT Id, Name FROM Line_Item WHERE OrderId = {order_id} AND Name LIKE '{line_name_base}%'"
@@ -561,7 +638,7 @@ def single_line(client, order_id, line_item_data, line_name):
     # Log line creation start
     logger.log_line_creation_start(str(order_id), line_item_data, line_name, session_id)
     
-    line_item_service = client.GetService('LineItemService', version='v202408')
+    line_item_service = gam_service(client, 'LineItemService')
     
     # Track created creatives by size to prevent duplicates
     created_creative_sizes = set()
@@ -706,21 +783,31 @@ def single_line(client, order_id, line_item_data, line_name):
     elif isinstance(geo_targeting_input, list):
         geo_targeting_input = [str(city).strip() for city in geo_targeting_input if str(city).strip()]
     
+    # Expand cluster names ("Top 8 metros", "NCR"); get_geo_ids applies aliases
+    geo_targeting_input = expand_geo_names(geo_targeting_input)
     print(f"Processing geo targeting: {geo_targeting_input}")
     geo_targeting_ids = []
     
-    invalid_locations = []
+    # Location as entered -> suggested names, returned to the caller and logged with the line
+    unresolved_locations = {}
+    try:
+        resolved_geo_ids = get_geo_ids(client, geo_targeting_input)
+    except LocationNotFoundError as e:
+        print(f"Warning: {e}")
+        if not e.resolved:
+            # Without a single resolved location the line would target everywhere
+            raise
+        unresolved_locations = {name: e.suggestions.get(name, []) for name in e.location_names}
+        resolved_geo_ids = e.resolved
+
     for city in geo_targeting_input:
-        try:
-            geo_id = get_geo_id(client, city)
-            if geo_id:
-                geo_targeting_ids.append(geo_id)
-                print(f"Found geo ID {geo_id} for {city}")
-        except LocationNotFoundError as e:
-            print(f"Warning: {e}")
-            invalid_locations.append(city)
+        geo_id = resolved_geo_ids.get(city)
+        if geo_id:
+            geo_targeting_ids.append(geo_id)
+            print(f"Found geo ID {geo_id} for {city}")
     
     if not geo_targeting_ids:
+        # Only reached without any geo input
         print("Warning: No valid geo targeting IDs found. Line item will target all locations.")
         # Proceed with empty geo_targeting_ids (targets all locations)
 
@@ -736,14 +823,14 @@ def single_line(client, order_id, line_item_data, line_name):
     # Replace [timestamp] with %%CACHEBUSTER%% in impression_tracker
     if impression_tracker:
         original_impression_tracker = impression_tracker
-        impression_tracker = impression_tracker.replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
+        impression_tracker = apply_cachebuster(impression_tracker)
         if original_impression_tracker != impression_tracker:
             print(f"Replaced timestamp in impression_tracker: {original_impression_tracker} -> {impression_tracker}")
     
     # Replace [timestamp] with %%CACHEBUSTER%% in script_tracker
     if script_tracker:
         original_script_tracker = script_tracker
-        script_tracker = script_tracker.replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
+        script_tracker = apply_cachebuster(script_tracker)
         if original_script_tracker != script_tracker:
             print(f"Replaced timestamp in script_tracker: {original_script_tracker} -> {script_tracker}")
 
@@ -951,109 +1038,29 @@ def single_line(client, order_id, line_item_data, line_name):
     timing_checkpoints['placement_lookup_start'] = time.time()
 
     # Always fetch placements regardless of tag file
+    sheet_sites = []
     if contains_toi:
-        toi_sites = [s for s in site_filter if s in ['TOI', 'ETIMES']]
-        print("\nFetching TOI placements:")
-        
-        placement_data_toi = fetch_placements_ids(
-            CREDENTIALS_PATH,
-            SHEET_URL,
-            PLACEMENT_SHEET_NAME_TOI,
-            toi_sites,
-            platforms_for_fetch,
-            filtered_size_groups,
-            richmedia_platform_map,
-            line_type
-        )
-        # Merge TOI placement data
-        print(f"🔍 TOI placement_data_toi type: {type(placement_data_toi)}")
-        print(f"🔍 TOI placement_data_toi content: {placement_data_toi}")
-        
-        for size, data in placement_data_toi.items():
-            print(f"🔍 TOI merging - Size: {size}, Data type: {type(data)}, Data: {data}")
-            if size not in placement_data:
-                placement_data[size] = data.copy()
-                print(f"🔍 TOI - Added new size {size} to placement_data")
-            else:
-                # Ensure we're working with dictionaries
-                if not isinstance(placement_data[size], dict):
-                    print(f"⚠️ TOI - placement_data[{size}] is not a dict: {type(placement_data[size])}")
-                    placement_data[size] = {}
-                if not isinstance(data, dict):
-                    print(f"⚠️ TOI - incoming data is not a dict: {type(data)}")
-                    continue
-                    
-                # Combine placement IDs from both sources
-                existing_ids = set(placement_data[size].get('placement_ids', []))
-                new_ids = set(data.get('placement_ids', []))
-                placement_data[size]['placement_ids'] = list(existing_ids | new_ids)
-                
-                # Preserve original_sizes information
-                existing_original_sizes = set(placement_data[size].get('original_sizes', []))
-                new_original_sizes = set(data.get('original_sizes', []))
-                placement_data[size]['original_sizes'] = list(existing_original_sizes | new_original_sizes)
-                
-                print(f"🔄 Merged TOI placements for {size}: {len(new_ids)} new IDs")
-
+        sheet_sites.append(("TOI", PLACEMENT_SHEET_NAME_TOI, [s for s in site_filter if s in ['TOI', 'ETIMES']]))
     if contains_et:
-        et_sites = [s for s in site_filter if s == 'ET']
-        print("\nFetching ET placements:")
-        placement_data_et = fetch_placements_ids(
-            CREDENTIALS_PATH,
-            SHEET_URL,
-            PLACEMENT_SHEET_NAME_ET,
-            et_sites,
-            platforms_for_fetch,
-            filtered_size_groups,
-            richmedia_platform_map,
-            line_type
-        )
-        # Merge ET placement data
-        for size, data in placement_data_et.items():
-            if size not in placement_data:
-                placement_data[size] = data.copy()
-            else:
-                # Combine placement IDs from both sources
-                existing_ids = set(placement_data[size].get('placement_ids', []))
-                new_ids = set(data.get('placement_ids', []))
-                placement_data[size]['placement_ids'] = list(existing_ids | new_ids)
-                
-                # Preserve original_sizes information
-                existing_original_sizes = set(placement_data[size].get('original_sizes', []))
-                new_original_sizes = set(data.get('original_sizes', []))
-                placement_data[size]['original_sizes'] = list(existing_original_sizes | new_original_sizes)
-                
-                print(f"🔄 Merged ET placements for {size}: {len(new_ids)} new IDs")
-
+        sheet_sites.append(("ET", PLACEMENT_SHEET_NAME_ET, [s for s in site_filter if s == 'ET']))
     if contains_lang:
-        lang_sites = [s for s in site_filter if s not in ['TOI', 'ETIMES', 'ET']]
-        print("\nFetching Language placements:")
-        placement_data_lang = fetch_placements_ids(
-            CREDENTIALS_PATH,
-            SHEET_URL,
-            PLACEMENT_SHEET_NAME_LANG,
-            lang_sites,
-            platforms_for_fetch,
-            filtered_size_groups,
-            richmedia_platform_map,
-            line_type
-        )
-        # Merge Language placement data
-        for size, data in placement_data_lang.items():
-            if size not in placement_data:
-                placement_data[size] = data.copy()
-            else:
-                # Combine placement IDs from both sources
-                existing_ids = set(placement_data[size].get('placement_ids', []))
-                new_ids = set(data.get('placement_ids', []))
-                placement_data[size]['placement_ids'] = list(existing_ids | new_ids)
-                
-                # Preserve original_sizes information
-                existing_original_sizes = set(placement_data[size].get('original_sizes', []))
-                new_original_sizes = set(data.get('original_sizes', []))
-                placement_data[size]['original_sizes'] = list(existing_original_sizes | new_original_sizes)
-                
-                print(f"🔄 Merged Language placements for {size}: {len(new_ids)} new IDs")
+        sheet_sites.append(("Language", PLACEMENT_SHEET_NAME_LANG, [s for s in site_filter if s not in ['TOI', 'ETIMES', 'ET']]))
+
+    # Worksheets are downloaded per PLACEMENT_FETCH_MODE, then filtered and merged in memory
+    placement_fetch_start = time.time()
+    placement_data = fetch_placements_for_sheets(
+        CREDENTIALS_PATH,
+        SHEET_URL,
+        sheet_sites,
+        platforms_for_fetch,
+        filtered_size_groups,
+        richmedia_platform_map,
+        line_type,
+        fetch_mode=PLACEMENT_FETCH_MODE,
+        source=PLACEMENT_SOURCE
+    )
+    placement_fetch_time = time.time() - placement_fetch_start
+    print(f"⏱️ Placement fetch ({PLACEMENT_FETCH_MODE}, {len(sheet_sites)} worksheet(s)): {placement_fetch_time:.2f}s")
 
     # Safeguard: Ensure original_sizes are preserved from size_groups
     for placement_size, group_data in placement_data.items():
@@ -1346,10 +1353,17 @@ def single_line(client, order_id, line_item_data, line_name):
         logger.log_line_creation_error(e, unique_line_name, str(order_id), session_id)
         raise
 
-    # Read tags from Excel only if file exists
-    tag_dict = read_tag_file()
-    
+    # tag_dict was parsed once before line creation and is reused here
     creative_ids = []
+
+    # Creatives of all sizes are built in parallel on the creative pipeline and then
+    # created together in chunked createCreatives calls (see submit_template_creatives)
+    queued_builds = []  # (tracked size, build_custom_template_creatives arguments)
+    # Asset bytes of this submission only; Dash runs several submissions at once
+    assets = AssetStore()
+
+    def queue_creatives(size, *build_args):
+        queued_builds.append((size, build_args))
     
     # First, gather all the tags for each base size
     size_tags = {}
@@ -1396,13 +1410,11 @@ def single_line(client, order_id, line_item_data, line_name):
                     elif In_Banner_video and original_size == "300x250":
                         use_template_id = 12344286
                         print(f"Using In-Banner Video template ID: {use_template_id} for size {original_size}")
-                        new_creatives = create_custom_template_creatives(
+                        queue_creatives(original_size,
                             client, order_id, line_item_id,
                             destination_url, expresso_id, original_size, use_landing_page,
                             use_impression_tag, use_script_tag, use_template_id, In_Banner_video, line_type
                         )
-                        creative_ids.extend(new_creatives)
-                        track_creative_creation(original_size, new_creatives)
                         continue
                     
                     # Process tags if available for the original size
@@ -1435,98 +1447,39 @@ def single_line(client, order_id, line_item_data, line_name):
                                 print(f"Using Impression/Click tags from tag.xlsx for size {original_size}")
                                 
                                 # Process impression tag to extract just the URL from IMG SRC attribute
-                                impression_tag_value = tag_info['impression_tag']
-                                
-                                # Extract URL from IMG SRC tag if it exists
-                                if 'IMG SRC=' in impression_tag_value.upper() or 'src=' in impression_tag_value.lower():
-                                    url_match = re.search(r'src=["\'](https?://[^"\']+)["\']', impression_tag_value, re.IGNORECASE)
-                                    if url_match:
-                                        impression_tag_value = url_match.group(1)
-                                        # Replace [timestamp] or [CACHEBUSTER] with %%CACHEBUSTER%%
-                                        impression_tag_value = impression_tag_value.replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
-                                        print(f"Extracted URL from impression tag: {impression_tag_value}")
-                                
-                                use_impression_tag = impression_tag_value
-                                use_landing_page = tag_info['click_tag'].replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
+                                # Impression URL from the IMG SRC tag, cachebuster macro on both URLs
+                                use_impression_tag, use_landing_page = rewrite_impression_click(tag_info['impression_tag'], tag_info['click_tag'])
+                                print(f"Using impression tag: {use_impression_tag}")
                                 use_template_id = 12330939  # Use the specified template ID
                                 print(f"Using template ID: {use_template_id} for impression/click tags")
                             elif tag_info['type'] == 'doubleclick':
                                 # For DoubleClick tag
                                 print(f"Using DoubleClick tag from tag.xlsx for size {original_size}")
-                                use_script_tag = tag_info['js_tag']
-                                
-                                # Handle <noscript> tags with <a> href, common in Flashtalking tags
-                                if '<noscript>' in use_script_tag.lower() and '<a href' in use_script_tag.lower():
-                                    print(f"Detected noscript/a href tag for size {original_size}")
-                                    href_pattern = r'(<a\s+[^>]*?href=")([^"]*)"'
-                                    
-                                    # Prepend click macro if not already present
-                                    if '%%CLICK_URL_UNESC%%' not in use_script_tag:
-                                        replacement = r'\1%%CLICK_URL_UNESC%%\2"'
-                                        modified_tag = re.sub(href_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                        
-                                        if modified_tag != use_script_tag:
-                                            use_script_tag = modified_tag
-                                            print(f"Added %%CLICK_URL_UNESC%% to href in noscript tag for size {original_size}")
-                                        else:
-                                            print(f"Warning: Could not add %%CLICK_URL_UNESC%% to href for size {original_size}")
-                                    else:
-                                        print(f"Click macro already present for size {original_size}")
-                                
-                                # Ensure the DoubleClick tag has a data-dcm-click-tracker attribute
-                                if 'data-dcm-click-tracker' not in use_script_tag:
-                                    try:
-                                        # First try to add it before class attribute
-                                        tag_pattern = r'(<ins|<div)([^>]*?)(\s+class=)'
-                                        replacement = r"\1\2 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\3"
-                                        modified_tag = re.sub(tag_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                        
-                                        # If that didn't work, try adding it after the opening tag
-                                        if modified_tag == use_script_tag:
-                                            tag_pattern = r'(<ins|<div)(\s)'
-                                            replacement = r"\1 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\2"
-                                            modified_tag = re.sub(tag_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                        
-                                        use_script_tag = modified_tag
-                                        print(f"Added data-dcm-click-tracker to DoubleClick tag for size {original_size}")
-                                    except Exception as e:
-                                        print(f"Warning: Could not add data-dcm-click-tracker attribute: {str(e)}")
+                                # Click macro rewrites are memoized by tag content and are no-ops for tags
+                                # already normalized by read_tag_file
+                                use_script_tag = rewrite_script_tag(tag_info['js_tag'], doubleclick=True)
+                                if use_script_tag != tag_info['js_tag']:
+                                    print(f"Rewrote click macros in tag {tag_key}")
                                 
                                 use_template_id = 12435443
                             else:
                                 # For JavaScript tag, use AI template
                                 print(f"Using JavaScript tag from tag.xlsx for size {original_size}")
-                                use_script_tag = tag_info['js_tag']
-                                
-                                # Handle <noscript> tags with <a> href, common in Flashtalking tags
-                                if '<noscript>' in use_script_tag.lower() and '<a href' in use_script_tag.lower():
-                                    print(f"Detected noscript/a href tag for size {original_size}")
-                                    href_pattern = r'(<a\s+[^>]*?href=")([^"]*)"'
-                                    
-                                    # Prepend click macro if not already present
-                                    if '%%CLICK_URL_UNESC%%' not in use_script_tag:
-                                        replacement = r'\1%%CLICK_URL_UNESC%%\2"'
-                                        modified_tag = re.sub(href_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                        
-                                        if modified_tag != use_script_tag:
-                                            use_script_tag = modified_tag
-                                            print(f"Added %%CLICK_URL_UNESC%% to href in noscript tag for size {original_size}")
-                                        else:
-                                            print(f"Warning: Could not add %%CLICK_URL_UNESC%% to href for size {original_size}")
-                                    else:
-                                        print(f"Click macro already present for size {original_size}")
+                                # Click macro rewrites are memoized by tag content and are no-ops for tags
+                                # already normalized by read_tag_file
+                                use_script_tag = rewrite_script_tag(tag_info['js_tag'], doubleclick=False)
+                                if use_script_tag != tag_info['js_tag']:
+                                    print(f"Rewrote click macros in tag {tag_key}")
                                 
                                 use_template_id = 12435443  # AI template for JavaScript tags
                                 print(f"Using AI template ID: {use_template_id} for JavaScript tag")
                             
                             # Create the creative and associate it with the line item
-                            new_creatives = create_custom_template_creatives(
+                            queue_creatives(original_size,
                                 client, order_id, line_item_id,
                                 destination_url, expresso_id, original_size, use_landing_page,
                                 use_impression_tag, use_script_tag, use_template_id, In_Banner_video, line_type
                             )
-                            creative_ids.extend(new_creatives)
-                            track_creative_creation(original_size, new_creatives)
                     else:
                         # No tags for this size, create a normal creative
                         creative_path = None
@@ -1535,13 +1488,11 @@ def single_line(client, order_id, line_item_data, line_name):
                         if creative_path and creative_path.lower().endswith('.html'):
                             use_template_id = 12435443
                             print(f"Using template ID 12435443 for HTML creative: {creative_path}")
-                        new_creatives = create_custom_template_creatives(
+                        queue_creatives(original_size,
                             client, order_id, line_item_id,
                             destination_url, expresso_id, original_size, use_landing_page,
                             use_impression_tag, use_script_tag, use_template_id, In_Banner_video, line_type
                         )
-                        creative_ids.extend(new_creatives)
-                        track_creative_creation(original_size, new_creatives)
                 except Exception as e:
                     print(f"⚠️ Failed to create creatives for original size {original_size}: {e}")
 
@@ -1600,94 +1551,62 @@ def single_line(client, order_id, line_item_data, line_name):
                         print(f"Using 300x600 richmedia template ID: {use_template_id} for additional size {tag_size}")
                     elif tag_info['type'] == 'impression_click':
                         # For impression/click tag combo
-                        impression_tag_value = tag_info['impression_tag']
-                        if 'IMG SRC=' in impression_tag_value.upper() or 'src=' in impression_tag_value.lower():
-                            url_match = re.search(r'src=["\'](https?://[^"\']+)["\']', impression_tag_value, re.IGNORECASE)
-                            if url_match:
-                                impression_tag_value = url_match.group(1)
-                                impression_tag_value = impression_tag_value.replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
-                        
-                        use_impression_tag = impression_tag_value
-                        use_landing_page = tag_info['click_tag'].replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
+                        # Impression URL from the IMG SRC tag, cachebuster macro on both URLs
+                        use_impression_tag, use_landing_page = rewrite_impression_click(tag_info['impression_tag'], tag_info['click_tag'])
+                        print(f"Using impression tag: {use_impression_tag}")
                         use_template_id = 12330939
                     elif tag_info['type'] == 'doubleclick':
                         # For DoubleClick tag
                         print(f"Using DoubleClick tag for additional size {tag_size}")
-                        use_script_tag = tag_info['js_tag']
-                        
-                        # Handle <noscript> tags with <a> href, common in Flashtalking tags
-                        if '<noscript>' in use_script_tag.lower() and '<a href' in use_script_tag.lower():
-                            print(f"Detected noscript/a href tag for additional size {tag_size}")
-                            href_pattern = r'(<a\s+[^>]*?href=")([^"]*)"'
-                            
-                            # Prepend click macro if not already present
-                            if '%%CLICK_URL_UNESC%%' not in use_script_tag:
-                                replacement = r'\1%%CLICK_URL_UNESC%%\2"'
-                                modified_tag = re.sub(href_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                
-                                if modified_tag != use_script_tag:
-                                    use_script_tag = modified_tag
-                                    print(f"Added %%CLICK_URL_UNESC%% to href in noscript tag for additional size {tag_size}")
-                                else:
-                                    print(f"Warning: Could not add %%CLICK_URL_UNESC%% to href for additional size {tag_size}")
-                            else:
-                                print(f"Click macro already present for additional size {tag_size}")
-                        
-                        # Ensure the DoubleClick tag has a data-dcm-click-tracker attribute
-                        if 'data-dcm-click-tracker' not in use_script_tag:
-                            try:
-                                # First try to add it before class attribute
-                                tag_pattern = r'(<ins|<div)([^>]*?)(\s+class=)'
-                                replacement = r"\1\2 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\3"
-                                modified_tag = re.sub(tag_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                
-                                # If that didn't work, try adding it after the opening tag
-                                if modified_tag == use_script_tag:
-                                    tag_pattern = r'(<ins|<div)(\s)'
-                                    replacement = r"\1 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\2"
-                                    modified_tag = re.sub(tag_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                
-                                use_script_tag = modified_tag
-                                print(f"Added data-dcm-click-tracker to DoubleClick tag for size {tag_size}")
-                            except Exception as e:
-                                print(f"Warning: Could not add data-dcm-click-tracker attribute: {str(e)}")
+                        # Click macro rewrites are memoized by tag content and are no-ops for tags
+                        # already normalized by read_tag_file
+                        use_script_tag = rewrite_script_tag(tag_info['js_tag'], doubleclick=True)
+                        if use_script_tag != tag_info['js_tag']:
+                            print(f"Rewrote click macros in tag {tag_key}")
                         
                         use_template_id = 12435443
                     else:
                         # For JavaScript tag
-                        use_script_tag = tag_info['js_tag']
-                        
-                        # Handle <noscript> tags with <a> href, common in Flashtalking tags
-                        if '<noscript>' in use_script_tag.lower() and '<a href' in use_script_tag.lower():
-                            print(f"Detected noscript/a href tag for additional size {tag_size}")
-                            href_pattern = r'(<a\s+[^>]*?href=")([^"]*)"'
-                            
-                            # Prepend click macro if not already present
-                            if '%%CLICK_URL_UNESC%%' not in use_script_tag:
-                                replacement = r'\1%%CLICK_URL_UNESC%%\2"'
-                                modified_tag = re.sub(href_pattern, replacement, use_script_tag, flags=re.IGNORECASE)
-                                
-                                if modified_tag != use_script_tag:
-                                    use_script_tag = modified_tag
-                                    print(f"Added %%CLICK_URL_UNESC%% to href in noscript tag for additional size {tag_size}")
-                                else:
-                                    print(f"Warning: Could not add %%CLICK_URL_UNESC%% to href for additional size {tag_size}")
-                            else:
-                                print(f"Click macro already present for additional size {tag_size}")
+                        # Click macro rewrites are memoized by tag content and are no-ops for tags
+                        # already normalized by read_tag_file
+                        use_script_tag = rewrite_script_tag(tag_info['js_tag'], doubleclick=False)
+                        if use_script_tag != tag_info['js_tag']:
+                            print(f"Rewrote click macros in tag {tag_key}")
                         
                         use_template_id = 12435443
                     
-                    new_creatives = create_custom_template_creatives(
+                    queue_creatives(tag_size,
                         client, order_id, line_item_id,
                         destination_url, expresso_id, tag_size, use_landing_page,
                         use_impression_tag, use_script_tag, use_template_id, In_Banner_video, line_type
                     )
-                    creative_ids.extend(new_creatives)
-                    track_creative_creation(tag_size, new_creatives)
-                    print(f"✅ Created additional creative for tag {tag_key} and size {tag_size}")
+                    print(f"✅ Queued additional creative for tag {tag_key} and size {tag_size}")
                 except Exception as e:
                     print(f"⚠️ Failed to create additional creative for tag {tag_key} and size {tag_size}: {e}")
 
+    # Build the queued creatives in parallel; results come back in queue order
+    queued_creatives = []  # (tracked size, creative spec)
+    if queued_builds:
+        built = run_ordered(lambda build: build_custom_template_creatives(*build[1], store=assets), queued_builds)
+        for (size, _), (specs, error) in zip(queued_builds, built):
+            if error is not None:
+                print(f"⚠️ Failed to create creatives for size {size}: {error}")
+                continue
+            queued_creatives.extend((size, spec) for spec in specs)
+
+    # Create the queued creatives before checking which sizes still need one
+    if queued_creatives:
+        results = submit_template_creatives(client, [spec for _, spec in queued_creatives], store=assets)
+        created_by_size = {}
+        for (size, _), result in zip(queued_creatives, results):
+            if result['creative_id'] is not None:
+                creative_ids.append(result['creative_id'])
+                created_by_size.setdefault(size, []).append(result['creative_id'])
+            if result['error']:
+                print(f"⚠️ Failed to create creatives for size {size} ({result['targeting_name']}): {result['error']}")
+        for size, new_creatives in created_by_size.items():
+            track_creative_creation(size, new_creatives)
+
     # Create 320x50 creatives when they have their own targeting but aren't in the main placement processing
     # This happens when 320x100 exists and we've added 320x50 as an additional override size
     print(f"🔍 Creative targetings debug:")
@@ -1731,7 +1650,7 @@ def single_line(client, order_id, line_item_data, line_name):
             new_320x50_creatives = create_custom_template_creatives(
                 client, order_id, line_item_id,
                 destination_url, expresso_id, "320x50", use_landing_page,
-                use_impression_tag, use_script_tag, use_template_id, In_Banner_video, line_type
+                use_impression_tag, use_script_tag, use_template_id, In_Banner_video, line_type, store=assets
             )
             creative_ids.extend(new_320x50_creatives)
             track_creative_creation('320x50', new_320x50_creatives)
@@ -1750,13 +1669,19 @@ def single_line(client, order_id, line_item_data, line_name):
             new_creatives = create_custom_template_creatives(
                 client, order_id, line_item_id,
                 destination_url, expresso_id, "300x250", landing_page,
-                impression_tracker, script_tracker, use_template_id, In_Banner_video, line_type
+                impression_tracker, script_tracker, use_template_id, In_Banner_video, line_type, store=assets
             )
             creative_ids.extend(new_creatives)
             track_creative_creation("300x250", new_creatives)
         except Exception as e:
             print(f"⚠️ Failed to create special In-Banner Video creative: {e}")
                 
+    # Creative payloads are built; release the asset bytes read for them
+    asset_stats = assets.stats()
+    print(f"🗃️ Assets: {asset_stats['files_read']} file(s) read, {asset_stats['reads_saved']} repeated read(s) saved, "
+          f"{asset_stats['memory_bytes'] / 1024 / 1024:.1f} MB in memory, {asset_stats['mapped_files']} memory-mapped")
+    assets.clear()
+
     # Clear landing_page and impression_tracker after order creation
     line_item_data['landing_page'] = ''
     line_item_data['impression_tracker'] = ''
@@ -1790,12 +1715,17 @@ def single_line(client, order_id, line_item_data, line_name):
         unique_line_name, 
         session_id
     )
+    if unresolved_locations:
+        logger.log_unresolved_locations(unresolved_locations, unique_line_name, session_id)
     
     # Log performance metrics with detailed timing
     logger.log_performance_metrics({
         'total_time': total_time,
         'data_processing_time': data_processing_time,
         'placement_lookup_time': placement_lookup_time,
+        'placement_fetch_time': placement_fetch_time,
+        'placement_fetch_mode': PLACEMENT_FETCH_MODE,
+        'placement_source': PLACEMENT_SOURCE,
         'line_creation_time': line_creation_time,
         'creative_creation_time': creative_creation_time,
         'line_item_id': line_item_id,
@@ -1809,8 +1739,10 @@ def single_line(client, order_id, line_item_data, line_name):
     print(f"  - Creatives created: {len(creative_ids) if creative_ids else 0}")
     print(f"  - Total time: {total_time:.2f}s")
     print(f"  - Success rate: 100.0%")
+    if unresolved_locations:
+        print(f"  - Locations not targeted: {describe_unresolved_locations(unresolved_locations)}")
 
-    return line_item_id, creative_ids
+    return line_item_id, creative_ids, unresolved_locations
 
 if __name__ == '__main__':
     client = ad_manager.AdManagerClient.LoadFromStorage("googleads1.yaml") 
@@ -1823,7 +1755,7 @@ if __name__ == '__main__':
                       'geoTargeting': ['Mumbai'], 'Line_label': 'Education', 
                       'Line_name': f'27108910DOMEVENTURTILROSINALLCPMENGNEWSSTDBANNTILSTANDARDBANNERPKG209336_{timestamp}', 
                       'Template_id': '12330939'}
-    placement_data= single_line(client, order_id, line_item_data, line_name)
+    line_item_id, creative_ids, unresolved_locations = single_line(client, order_id, line_item_data, line_name)
     
     
     # detected_presets, image_files = fetch_images_and_presets(CREATIVES_FOLDER, available_presets, presets_dict)
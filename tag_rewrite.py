@@ -0,0 +1,259 @@
+"""
+Tag sheet normalization.
+
+Turns the rows of a trafficking tag sheet into the tag dictionary used for
+creative creation. Everything is done column-wise on the DataFrame:
+
+1. Dimensions are extracted with one vectorized regex ("300x250 ROS" -> "300x250")
+2. Rows are classified in bulk as impression_click, doubleclick or javascript
+3. The noscript click macro and the DoubleClick click tracker are injected
+   with precompiled patterns, only on the rows that need them
+
+The result is identical to the former row-by-row read_tag_file loop,
+including duplicate dimension keys (300x250, 300x250_1, ...).
+
+The same rewrites are exposed per tag for creative creation
+(rewrite_script_tag, rewrite_impression_click, apply_cachebuster). They are
+idempotent and memoized by tag content. normalize_tag_frame stores every
+script tag it produces in the rewrite_script_tag memo, so creative creation
+gets a normalized tag back from the memo without scanning it again.
+"""
+
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+from cache_utils import TTLDiskCache
+
+CLICK_MACRO = '%%CLICK_URL_UNESC%%'
+
+DIMENSION_PATTERN = re.compile(r'(\d+x\d+)')
+# href of <a> tags inside <noscript> blocks (Flashtalking and similar)
+NOSCRIPT_HREF_PATTERN = re.compile(r'(<a\s+[^>]*?href=")([^"]*)"', re.IGNORECASE)
+NOSCRIPT_HREF_REPLACEMENT = r'\1%%CLICK_URL_UNESC%%\2"'
+# DoubleClick <ins>/<div>: insert the click tracker before class=, else right after the tag name
+DCM_CLASS_PATTERN = re.compile(r'(<ins|<div)([^>]*?)(\s+class=)', re.IGNORECASE)
+DCM_CLASS_REPLACEMENT = r"\1\2 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\3"
+DCM_OPEN_PATTERN = re.compile(r'(<ins|<div)(\s)', re.IGNORECASE)
+DCM_OPEN_REPLACEMENT = r"\1 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\2"
+# URL inside an <img src="..."> impression tag
+IMPRESSION_SRC_PATTERN = re.compile(r'src=["\'](https?://[^"\']+)["\']', re.IGNORECASE)
+
+# Distinct tags whose rewrite result is remembered
+TAG_REWRITE_CACHE_SIZE = 4096
+
+# (tag, doubleclick) -> rewritten tag; filled by rewrite_script_tag and normalize_tag_frame
+script_rewrites = TTLDiskCache(ttl=None, max_entries=TAG_REWRITE_CACHE_SIZE)
+
+
+def apply_cachebuster(value):
+    """Replace [timestamp] / [CACHEBUSTER] with the GAM %%CACHEBUSTER%% macro."""
+    return value.replace('[timestamp]', '%%CACHEBUSTER%%').replace('[CACHEBUSTER]', '%%CACHEBUSTER%%')
+
+
+def add_noscript_click_macro(tag):
+    """Prepend %%CLICK_URL_UNESC%% to <a href> inside <noscript> blocks (no-op if the macro is present)."""
+    lowered = tag.lower()
+    if '<noscript>' in lowered and '<a href' in lowered and CLICK_MACRO not in tag:
+        return NOSCRIPT_HREF_PATTERN.sub(NOSCRIPT_HREF_REPLACEMENT, tag)
+    return tag
+
+
+def add_dcm_click_tracker(tag):
+    """Add data-dcm-click-tracker to a DoubleClick <ins>/<div> (no-op if already present)."""
+    if 'data-dcm-click-tracker' in tag:
+        return tag
+    modified_tag = DCM_CLASS_PATTERN.sub(DCM_CLASS_REPLACEMENT, tag)
+    if modified_tag == tag:
+        modified_tag = DCM_OPEN_PATTERN.sub(DCM_OPEN_REPLACEMENT, tag)
+    return modified_tag
+
+
+def rewrite_script_tag(tag, doubleclick=False):
+    """
+    Apply the click macro rewrites to a JavaScript or DoubleClick tag.
+
+    Args:
+        tag: Tag markup
+        doubleclick: Also ensure the DoubleClick click tracker attribute
+
+    Returns:
+        str: Rewritten tag (the same string when nothing had to change)
+    """
+    key = (tag, bool(doubleclick))
+    found, rewritten = script_rewrites.lookup(key)
+    if found:
+        return rewritten
+    rewritten = add_noscript_click_macro(tag)
+    if doubleclick:
+        rewritten = add_dcm_click_tracker(rewritten)
+    script_rewrites.set(key, rewritten)
+    return rewritten
+
+
+@lru_cache(maxsize=TAG_REWRITE_CACHE_SIZE)
+def rewrite_impression_click(impression_tag, click_tag):
+    """
+    Prepare an impression/click tag pair for the banner template.
+
+    The impression URL is taken from an <img src="..."> tag when there is one,
+    and the cachebuster macro is applied to it and to the click URL.
+
+    Returns:
+        tuple: (impression tag value, landing page URL)
+    """
+    if 'IMG SRC=' in impression_tag.upper() or 'src=' in impression_tag.lower():
+        url_match = IMPRESSION_SRC_PATTERN.search(impression_tag)
+        if url_match:
+            impression_tag = apply_cachebuster(url_match.group(1))
+    return impression_tag, apply_cachebuster(click_tag)
+
+
+def _column(values, columns, col):
+    """One column of df.values as an object Series (None when the column is not used)."""
+    if col is None:
+        return None
+    return pd.Series(values[:, columns.get_loc(col)], dtype=object)
+
+
+def _stripped(series, mask):
+    """str(value).strip() where mask is set, '' elsewhere."""
+    result = pd.Series('', index=series.index, dtype=object)
+    if mask.any():
+        result[mask] = series[mask].map(str).str.strip()
+    return result
+
+
+def _clean_dimensions(dimensions):
+    """Reduce dimensions containing 'x' to their first NNNxNNN part, leave the rest as is."""
+    has_x = dimensions.str.contains('x', regex=False)
+    if not has_x.any():
+        return dimensions
+    extracted = dimensions[has_x].str.extract(DIMENSION_PATTERN, expand=False)
+    dimensions = dimensions.copy()
+    matched = extracted.notna()
+    dimensions[extracted[matched].index] = extracted[matched]
+    return dimensions
+
+
+def normalize_tag_frame(df, dimension_col, tag_col=None, impression_tag_col=None, click_tag_col=None):
+    """
+    Build the tag dictionary from a tag sheet DataFrame.
+
+    Args:
+        df: Tag sheet as read by pandas
+        dimension_col: Column holding the creative size
+        tag_col: Column holding JavaScript/DoubleClick tags, if any
+        impression_tag_col: Column holding impression tags, if any
+        click_tag_col: Column holding click tags, if any
+
+    Returns:
+        dict: Dimension -> {'type': 'impression_click', 'impression_tag', 'click_tag'}
+              or {'type': 'javascript'|'doubleclick', 'js_tag'}, in sheet order
+    """
+    if df.empty:
+        return {}
+
+    # df.values gives the same per-row values (and dtype upcasting) as df.iterrows()
+    values = df.values
+    dimension_raw = _column(values, df.columns, dimension_col)
+    has_dimension = pd.Series(pd.notnull(dimension_raw.to_numpy()), index=dimension_raw.index)
+
+    # 1. Impression/click rows take priority over the JavaScript tag
+    if impression_tag_col is not None and click_tag_col is not None:
+        impression_raw = _column(values, df.columns, impression_tag_col)
+        click_raw = _column(values, df.columns, click_tag_col)
+        is_impression_click = has_dimension & pd.notnull(impression_raw.to_numpy()) & pd.notnull(click_raw.to_numpy())
+        impression_tags = _stripped(impression_raw, is_impression_click)
+        click_tags = _stripped(click_raw, is_impression_click)
+    else:
+        is_impression_click = pd.Series(False, index=dimension_raw.index)
+        impression_tags = click_tags = None
+
+    if tag_col is not None:
+        tag_raw = _column(values, df.columns, tag_col)
+        is_script = has_dimension & ~is_impression_click & pd.notnull(tag_raw.to_numpy())
+        js_tags = _stripped(tag_raw, is_script)
+    else:
+        is_script = pd.Series(False, index=dimension_raw.index)
+        js_tags = None
+
+    dimensions = _clean_dimensions(_stripped(dimension_raw, is_impression_click | is_script))
+
+    is_doubleclick = pd.Series(False, index=dimension_raw.index)
+    if is_script.any():
+        # 2. noscript/<a href> tags get the click macro prepended to the href
+        lowered = js_tags.str.lower()
+        needs_macro = (is_script
+                       & lowered.str.contains('<noscript>', regex=False)
+                       & lowered.str.contains('<a href', regex=False)
+                       & ~js_tags.str.contains(CLICK_MACRO, regex=False))
+        if needs_macro.any():
+            js_tags[needs_macro] = js_tags[needs_macro].str.replace(NOSCRIPT_HREF_PATTERN, NOSCRIPT_HREF_REPLACEMENT, regex=True)
+            lowered = js_tags.str.lower()
+
+        # 3. DoubleClick tags get a data-dcm-click-tracker attribute
+        is_doubleclick = (is_script
+                          & (lowered.str.contains('dcmads', regex=False) | lowered.str.contains('data-dcm', regex=False))
+                          & (lowered.str.contains('<ins', regex=False) | lowered.str.contains('<div', regex=False)))
+        needs_tracker = is_doubleclick & ~js_tags.str.contains('data-dcm-click-tracker', regex=False)
+        if needs_tracker.any():
+            original = js_tags[needs_tracker]
+            rewritten = original.str.replace(DCM_CLASS_PATTERN, DCM_CLASS_REPLACEMENT, regex=True)
+            unchanged = rewritten == original
+            if unchanged.any():
+                rewritten[unchanged] = original[unchanged].str.replace(DCM_OPEN_PATTERN, DCM_OPEN_REPLACEMENT, regex=True)
+            js_tags[needs_tracker] = rewritten
+
+    # Assemble in sheet order; later impression/click rows overwrite, script rows get _N suffixes
+    dimensions = dimensions.tolist()
+    impression_click_rows = is_impression_click.tolist()
+    script_rows = is_script.tolist()
+    doubleclick_rows = is_doubleclick.tolist()
+    impression_tags = impression_tags.tolist() if impression_tags is not None else None
+    click_tags = click_tags.tolist() if click_tags is not None else None
+    js_tags = js_tags.tolist() if js_tags is not None else None
+    tag_dict = {}
+    normalized_scripts = []
+    next_suffix = {}  # dimension -> first _N suffix that may still be free (keys are never removed)
+    for position, dimension in enumerate(dimensions):
+        if impression_click_rows[position]:
+            impression_tag = impression_tags[position]
+            click_tag = click_tags[position]
+            if not dimension or not impression_tag or not click_tag:
+                continue
+            tag_dict[dimension] = {
+                'type': 'impression_click',
+                'impression_tag': impression_tag,
+                'click_tag': click_tag
+            }
+        elif script_rows[position]:
+            js_tag = js_tags[position]
+            if not dimension or not js_tag:
+                continue
+            # Only add if tag is substantial
+            if 'x' not in dimension or len(js_tag.strip()) <= 10:
+                continue
+            dimension_key = dimension
+            if dimension in tag_dict:
+                counter = next_suffix.get(dimension, 1)
+                while f"{dimension}_{counter}" in tag_dict:
+                    counter += 1
+                dimension_key = f"{dimension}_{counter}"
+                next_suffix[dimension] = counter + 1
+            tag_dict[dimension_key] = {
+                'type': 'doubleclick' if doubleclick_rows[position] else 'javascript',
+                'js_tag': js_tag
+            }
+            # The rewrites are idempotent, so a normalized tag is its own rewrite
+            normalized_scripts.append(((js_tag, bool(doubleclick_rows[position])), js_tag))
+
+    if normalized_scripts:
+        script_rewrites.set_many(normalized_scripts)
+
+    counts = {}
+    for tag_info in tag_dict.values():
+        counts[tag_info['type']] = counts.get(tag_info['type'], 0) + 1
+    print(f"Normalized {len(df)} tag rows into {len(tag_dict)} tags: {counts}")
+    return tag_dict
@@ -0,0 +1,214 @@
+"""
+Registry of the custom creative template schemas used by the system.
+
+get_html_variable_name used to fetch template 12435443 from
+CreativeTemplateService for every AI/HTML creative and scan its variables.
+The registry fetches every template in TEMPLATE_IDS with one
+getCreativeTemplatesByStatement call, keeps the variable definitions (name,
+type, required, default, choices) in cache/template_schemas.json and answers
+lookups from memory. validate_creative checks a TemplateCreative payload
+against the schema before it is sent.
+
+Usage:
+    python template_registry.py [refresh]
+"""
+
+import os
+import sys
+import threading
+
+from cache_utils import TTLDiskCache
+from config import CACHE_DIR
+from gam_transport import gam_service
+
+TEMPLATE_IDS = (12330939, 12435443, 12399020, 12459443, 12460223, 12344286, 12363950, 12443458, 12473441)
+TEMPLATE_CACHE_PATH = os.path.join(CACHE_DIR, "template_schemas.json")
+TEMPLATE_CACHE_TTL = int(os.environ.get("TEMPLATE_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Variable type -> variable value type accepted for it
+VALUE_TYPES = {
+    'AssetCreativeTemplateVariable': 'AssetCreativeTemplateVariableValue',
+    'ListStringCreativeTemplateVariable': 'StringCreativeTemplateVariableValue',
+    'LongCreativeTemplateVariable': 'LongCreativeTemplateVariableValue',
+    'StringCreativeTemplateVariable': 'StringCreativeTemplateVariableValue',
+    'UrlCreativeTemplateVariable': 'UrlCreativeTemplateVariableValue',
+}
+
+
+def _variable_type(variable):
+    """Type name of a template variable (SOAP objects are instances of their XSD type)."""
+    if isinstance(variable, dict):
+        return variable.get('xsi_type') or variable.get('type', '')
+    return getattr(variable, 'type', None) or type(variable).__name__
+
+
+def _schema_variable(variable):
+    choices = getattr(variable, 'choices', None) or []
+    return {
+        'uniqueName': getattr(variable, 'uniqueName', ''),
+        'label': getattr(variable, 'label', None),
+        'type': _variable_type(variable),
+        'isRequired': bool(getattr(variable, 'isRequired', False)),
+        'defaultValue': getattr(variable, 'defaultValue', None),
+        'choices': [getattr(choice, 'value', None) for choice in choices],
+        'allowOtherChoice': bool(getattr(variable, 'allowOtherChoice', True)),
+    }
+
+
+def _schema(template):
+    return {
+        'id': getattr(template, 'id', None),
+        'name': getattr(template, 'name', None),
+        'variables': [_schema_variable(variable) for variable in getattr(template, 'variables', None) or []],
+    }
+
+
+class TemplateRegistry:
+    """Creative template schemas per network, persisted to disk."""
+
+    def __init__(self, path=TEMPLATE_CACHE_PATH, ttl=TEMPLATE_CACHE_TTL, template_ids=TEMPLATE_IDS):
+        self.template_ids = tuple(template_ids)
+        self._cache = TTLDiskCache(path, ttl=ttl, max_entries=200)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(client, template_id):
+        return f"{getattr(client, 'network_code', None)}:{template_id}"
+
+    def load(self, client, template_ids=None, refresh=False):
+        """
+        Fetch the schemas that are not cached (all of them with refresh) in one call.
+
+        Args:
+            client (AdManagerClient): The Google Ad Manager client
+            template_ids: Templates to load (default: TEMPLATE_IDS)
+            refresh (bool): Fetch even if cached
+
+        Returns:
+            int: Number of templates fetched from GAM
+        """
+        template_ids = list(dict.fromkeys(int(template_id) for template_id in (template_ids or self.template_ids)))
+        with self._lock:
+            missing = [template_id for template_id in template_ids
+                       if refresh or self._key(client, template_id) not in self._cache]
+            if not missing:
+                return 0
+            creative_template_service = gam_service(client, 'CreativeTemplateService')
+            statement = {'query': f"WHERE id IN ({', '.join(str(template_id) for template_id in missing)})"}
+            response = creative_template_service.getCreativeTemplatesByStatement(statement)
+            templates = getattr(response, 'results', None) or []
+            schemas = [_schema(template) for template in templates]
+            self._cache.set_many([(self._key(client, schema['id']), schema) for schema in schemas])
+            print(f"📐 Loaded {len(schemas)} creative template schema(s) from GAM")
+            return len(schemas)
+
+    def get(self, client, template_id):
+        """
+        Schema of a template: id, name and variables (uniqueName, label, type, isRequired, defaultValue, choices).
+
+        Returns:
+            dict: The schema, or None if GAM has no such template
+        """
+        key = self._key(client, template_id)
+        schema = self._cache.get(key)
+        if schema is None:
+            # First lookup of this network loads every template the system uses
+            ids = self.template_ids if int(template_id) in self.template_ids else ()
+            self.load(client, tuple(ids) + (int(template_id),))
+            schema = self._cache.get(key)
+        return schema
+
+    def variable(self, client, template_id, unique_name):
+        """Definition of one variable of a template, or None."""
+        schema = self.get(client, template_id)
+        for variable in (schema or {}).get('variables', []):
+            if variable['uniqueName'] == unique_name:
+                return variable
+        return None
+
+    def html_variable_name(self, client, template_id):
+        """
+        Variable that takes HTML/script content: a string variable with 'html' in its name,
+        else ScriptCode, else the first string variable.
+        """
+        schema = self.get(client, template_id)
+        if not schema:
+            print(f"⚠️ No template found with ID {template_id}")
+            return 'ScriptCode'  # Common fallback
+        string_variables = [variable['uniqueName'] for variable in schema['variables']
+                            if variable['type'] == 'StringCreativeTemplateVariable']
+        for name in string_variables:
+            if 'html' in name.lower():
+                return name
+        if 'ScriptCode' in string_variables:
+            return 'ScriptCode'
+        if string_variables:
+            return string_variables[0]
+        print(f"⚠️ No suitable variable found in template {template_id}, using ScriptCode as fallback")
+        return 'ScriptCode'
+
+    def validate_creative(self, client, template_creative):
+        """
+        Check a TemplateCreative payload against its template schema.
+
+        Returns:
+            tuple: (errors that GAM would reject, warnings)
+        """
+        template_id = template_creative.get('creativeTemplateId')
+        schema = self.get(client, template_id)
+        if not schema:
+            return [f"Creative template {template_id} not found"], []
+        errors, warnings = [], []
+        variables = {variable['uniqueName']: variable for variable in schema['variables']}
+        values = template_creative.get('creativeTemplateVariableValues') or []
+        given = set()
+        for value in values:
+            name = value.get('uniqueName')
+            given.add(name)
+            variable = variables.get(name)
+            if variable is None:
+                warnings.append(f"Template {template_id} has no variable '{name}'")
+                continue
+            expected = VALUE_TYPES.get(variable['type'])
+            if expected and value.get('xsi_type') != expected:
+                errors.append(f"'{name}' needs a {expected}, got {value.get('xsi_type')}")
+                continue
+            if expected == 'AssetCreativeTemplateVariableValue':
+                asset = value.get('asset') or {}
+                if asset.get('assetByteArray') is None and asset.get('assetId') is None:
+                    if variable['isRequired']:
+                        errors.append(f"'{name}' is required but has no asset")
+            elif expected == 'LongCreativeTemplateVariableValue':
+                if value.get('value') is not None and not str(value.get('value')).lstrip('-').isdigit():
+                    errors.append(f"'{name}' needs an integer, got {value.get('value')!r}")
+            elif variable['isRequired'] and value.get('value') in (None, ''):
+                errors.append(f"'{name}' is required but empty")
+            elif (variable['type'] == 'ListStringCreativeTemplateVariable' and not variable['allowOtherChoice']
+                  and variable['choices'] and value.get('value') not in variable['choices']):
+                errors.append(f"'{name}' must be one of {variable['choices']}, got {value.get('value')!r}")
+        for name, variable in variables.items():
+            if variable['isRequired'] and name not in given and variable['defaultValue'] in (None, ''):
+                errors.append(f"Required variable '{name}' is missing")
+        return errors, warnings
+
+    def clear(self):
+        self._cache.clear()
+
+
+template_registry = TemplateRegistry()
+
+
+if __name__ == '__main__':
+    from googleads import ad_manager
+
+    client = ad_manager.AdManagerClient.LoadFromStorage("googleads1.yaml")
+    template_registry.load(client, refresh=len(sys.argv) > 1 and sys.argv[1] == "refresh")
+    for template_id in TEMPLATE_IDS:
+        schema = template_registry.get(client, template_id)
+        if not schema:
+            print(f"❌ {template_id}: not found")
+            continue
+        print(f"📐 {template_id} {schema['name']}")
+        for variable in schema['variables']:
+            required = " (required)" if variable['isRequired'] else ""
+            print(f"  - {variable['uniqueName']} ({variable['type']}){required}")
@@ -0,0 +1,69 @@
+"""
+TTLDiskCache shared through one file: a delete in one process must not drop
+what another process stored, nor be undone by the copy on disk.
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_utils import TTLDiskCache  # noqa: E402
+
+
+def _caches(tmp_path):
+    path = str(tmp_path / "cache.json")
+    return TTLDiskCache(path=path, ttl=None), TTLDiskCache(path=path, ttl=None)
+
+
+def test_delete_keeps_entries_set_by_another_process(tmp_path):
+    first, second = _caches(tmp_path)
+    first.set("a", 1)
+    second.lookup("a")
+    first.set("b", 2)
+
+    second.delete("a")
+
+    reader = TTLDiskCache(path=first.path, ttl=None)
+    assert reader.lookup("a") == (False, None)
+    assert reader.lookup("b") == (True, 2)
+
+
+def test_deleted_key_is_not_brought_back_by_a_later_set(tmp_path):
+    first, second = _caches(tmp_path)
+    first.set("a", 1)
+    second.lookup("a")
+
+    second.delete("a")
+    second.set("c", 3)
+
+    reader = TTLDiskCache(path=first.path, ttl=None)
+    assert reader.lookup("a") == (False, None)
+    assert reader.lookup("c") == (True, 3)
+
+
+def test_set_during_delete_is_kept(tmp_path):
+    first, second = _caches(tmp_path)
+    other = TTLDiskCache(path=first.path, ttl=None)
+    # One lock for all instances stands in for the lock file
+    first._file_lock = second._file_lock = other._file_lock = threading.Lock()
+    first.set("a", 1)
+    second.lookup("a")
+
+    reload_if_changed = second._reload_if_changed
+    writer = threading.Thread(target=other.set, args=("b", 2))
+
+    def reload_then_race():
+        reload_if_changed()
+        if not writer.is_alive() and writer.ident is None:
+            writer.start()
+            writer.join(timeout=0.2)
+
+    second._reload_if_changed = reload_then_race
+    second.delete("a")
+    writer.join()
+
+    reader = TTLDiskCache(path=first.path, ttl=None)
+    assert reader.lookup("a") == (False, None)
+    assert reader.lookup("b") == (True, 2)
@@ -0,0 +1,55 @@
+"""
+find_label_values against the seven sheet scans load_dsd used to run, one per
+label: every label must resolve to the same cell.
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dsd_read import DSD_LABELS, find_label_values  # noqa: E402
+
+
+def _baseline_label_value(df, label):
+    """One of the former load_dsd scans (find_rate_value, total_impressions, ...)."""
+    for index, row in df.iterrows():
+        for col_index, (col_name, value) in enumerate(row.items()):
+            if isinstance(value, str) and label in value.lower():
+                return df.iloc[index + 1, col_index] if index + 1 < len(df) else None
+    return None
+
+
+def _same(expected, actual):
+    if expected is None or actual is None:
+        return expected is actual
+    if pd.isna(expected) and pd.isna(actual):
+        return True
+    return expected == actual
+
+
+@pytest.mark.parametrize("rows", [
+    # Labels above their values, spread over columns
+    [["Rate", "Impressions", "Start Date", "End Date"], [150, 1000000, "2026-01-01", "2026-01-31"],
+     ["Site", "Geo", "FCAP", None], ["TOI", "Mumbai", 3, None]],
+    # First occurrence wins, row by row and left to right
+    [["Notes", "Total Impressions"], ["x", 500], ["RATE card", "impressions booked"], [99, 700]],
+    # One cell holding several labels ("website geo" is both site and geo)
+    [["Website Geo", "ratestart date"], ["India", "2026-02-01"], ["end date", "fcap"], ["2026-02-28", 2]],
+    # Labels on the last row have no value; missing labels stay None
+    [["Site", None], ["NBT", "Rate"]],
+    # Non-string cells are never labels, empty value cells come back as NaN
+    [[1.5, 7, "Geo"], ["Geo ", None, None], [None, "FCAP", "x"]],
+    [],
+])
+def test_label_values_match_per_label_scans(rows):
+    df = pd.DataFrame(rows)
+
+    actual = find_label_values(df)
+
+    assert set(actual) == set(DSD_LABELS)
+    for label in DSD_LABELS:
+        assert _same(_baseline_label_value(df, label), actual[label]), label
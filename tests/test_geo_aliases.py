@@ -0,0 +1,71 @@
+"""
+Geo name resolution: cluster names are expanded before lookup and are never
+the target of a fuzzy auto-correction.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo_aliases  # noqa: E402
+import geo_index  # noqa: E402
+import single_line  # noqa: E402
+
+GEO_ROWS = {
+    "bengaluru": [{"Id": 1, "Name": "Bengaluru", "Targetable": True, "Type": "CITY", "CountryCode": "IN"}],
+    "mumbai": [{"Id": 2, "Name": "Mumbai", "Targetable": True, "Type": "CITY", "CountryCode": "IN"}],
+}
+
+
+@pytest.fixture
+def geo_lookup(monkeypatch, tmp_path):
+    """get_geo_ids against GEO_ROWS instead of Ad Manager; returns the names sent to PQL."""
+    index = geo_index.GeoTargetIndex(path=str(tmp_path / "geo_index.json"))
+    queried = []
+
+    def query_geo_targets(pql_service, names):
+        queried.extend(names)
+        return {geo_index.normalize_geo_name(name): GEO_ROWS[geo_index.normalize_geo_name(name)]
+                for name in names if geo_index.normalize_geo_name(name) in GEO_ROWS}, set()
+
+    monkeypatch.setattr(geo_aliases, "get_geo_index", lambda: index)
+    monkeypatch.setattr(geo_aliases, "_geo_matcher", None)
+    monkeypatch.setattr(single_line, "get_geo_index", lambda: index)
+    monkeypatch.setattr(single_line, "gam_service", lambda client, name: None)
+    monkeypatch.setattr(single_line, "_query_geo_targets", query_geo_targets)
+    monkeypatch.setattr(single_line, "cached_geo_lookup", lambda name: (False, None))
+    monkeypatch.setattr(single_line, "cache_geo_lookups", lambda answers: None)
+    return queried
+
+
+@pytest.mark.parametrize("name, cluster", [
+    ("Top 8 metro", "Top 8 Metros"),
+    ("top 6 metro", "Top 6 Metros"),
+    ("Metro", "Metros"),
+])
+def test_cluster_typo_is_suggested_not_auto_corrected(geo_lookup, name, cluster):
+    assert geo_aliases.get_geo_matcher().best_match(name) is None
+
+    with pytest.raises(single_line.LocationNotFoundError) as raised:
+        single_line.get_geo_ids(None, geo_aliases.expand_geo_names([name, "Mumbai"]))
+
+    assert raised.value.location_names == [name]
+    assert raised.value.resolved == {"Mumbai": 2}
+    assert cluster in raised.value.suggestions[name]
+    assert cluster not in geo_lookup
+
+
+def test_location_typo_is_auto_corrected(geo_lookup):
+    assert single_line.get_geo_ids(None, ["Bengaluruu"]) == {"Bengaluruu": 1}
+
+
+def test_cluster_name_is_expanded():
+    assert geo_aliases.expand_geo_names(["Top 4 metros", "Mumbai"]) == ["Mumbai", "Delhi", "Kolkata", "Chennai"]
+
+
+def test_unresolved_locations_are_described_with_suggestions():
+    error = single_line.LocationNotFoundError(["Bangalor", "Xyz"], suggestions={"Bangalor": ["Bengaluru", "Bangalore"]})
+    assert error.describe() == "'Bangalor' (did you mean: Bengaluru, Bangalore?), 'Xyz'"
@@ -0,0 +1,140 @@
+"""
+fetch_placements_ids (PlacementIndex) against the row scan it replaced: same
+placement IDs in the same order for fixed-platform, richmedia and standard sizes.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from placements_for_creatives import fetch_placements_ids  # noqa: E402
+
+SHEET_URL = "https://docs.google.com/spreadsheets/d/placements/edit"
+
+SHEET = [
+    ["Site", "Platform", "Section", "Ad Type", "Placement ID"],
+    ["TOI", "WEB", "ROS", "INTERSTITIAL", "101"],
+    ["TOI", "MWEB, AMP", "ROS", "INTERSTITIAL", "102"],
+    ["ETIMES", "WEB,MWEB", "HP", "MREC_ALL", "103"],
+    ["toi", "amp", "ros", "mrec", "104"],
+    ["NBT", "WEB", "ROS", "MREC", "105"],
+    ["NBT", "MWEB", "HP", "BANNER", "106"],
+    ["NBT", "AMP", "HP_ROS", "BANNER", "107"],
+    ["VK", "WEB", "ROS", "SKIN_OOP", "108"],
+    ["VK", "WEBSITE", "ROS", "MREC", "109"],
+    ["NBT", "WEB", "ROS", "MREC", ""],
+    ["NBT", "WEB", "ROS", "MREC", "105"],
+    ["NBT", "MWEB"],
+    ["MT", " Web ", "ROS", "INTERSTITIAL", "110"],
+]
+
+SIZE_GROUPS = {
+    "1260x570": {"adtypes": ["INTERSTITIAL"], "sections": ["ROS"]},
+    "320x480": {"adtypes": ["INTERSTITIAL"], "sections": ["ROS"]},
+    "300x250": {"adtype_filter": ["MREC_ALL", "mrec"], "section_filter": ["ROS", "HP"]},
+    "320x50": {"adtype_filter": ["BANNER"], "section_filter": ["HP"]},
+    "out-of-page": {"adtype_filter": ["SKIN_OOP"], "section_filter": ["ROS"]},
+}
+
+
+def _baseline_placements(all_values, site_filter, platforms_filter, adtype_filters, richmedia_platform_map=None):
+    """The former fetch_placements_ids row scan, without its progress prints."""
+    headers = all_values[0]
+    clean_headers = []
+    header_count = {}
+    for header in headers:
+        clean_header = header.strip()
+        if not clean_header:
+            clean_header = f"empty_col_{len(clean_headers)}"
+        elif clean_header in header_count:
+            header_count[clean_header] += 1
+            clean_header = f"{clean_header}_{header_count[clean_header]}"
+        else:
+            header_count[clean_header] = 0
+        clean_headers.append(clean_header)
+    data = []
+    for row_values in all_values[1:]:
+        data.append({header: row_values[i] if i < len(row_values) else '' for i, header in enumerate(clean_headers)})
+
+    site_filter = [s.upper() for s in site_filter]
+    platforms_filter = [p.upper() for p in platforms_filter]
+    if "TOI" in site_filter and "ETIMES" not in site_filter:
+        site_filter.append("ETIMES")
+
+    column_mapping = {}
+    for col in headers:
+        col_upper = col.upper()
+        if 'SITE' in col_upper:
+            column_mapping['site'] = col
+        elif 'PLATFORM' in col_upper:
+            column_mapping['platform'] = col
+        elif 'AD TYPE' in col_upper or 'ADTYPE' in col_upper:
+            column_mapping['adtype'] = col
+        elif 'SECTION' in col_upper:
+            column_mapping['section'] = col
+        elif 'PLACEMENT' in col_upper:
+            column_mapping['placement'] = col
+
+    placement_data = {}
+    for adtype, filters in adtype_filters.items():
+        adtype_values = [ad.upper() for ad in filters.get("adtype_filter", []) or filters.get("adtypes", [])]
+        section_values = [section.upper() for section in filters.get("section_filter", []) or filters.get("sections", [])]
+        placement_ids = []
+        for row in data:
+            row_site = str(row.get(column_mapping['site'], '')).upper()
+            row_platform = str(row.get(column_mapping['platform'], '')).upper()
+            row_section = str(row.get(column_mapping['section'], '')).upper()
+            row_adtype = str(row.get(column_mapping['adtype'], '')).upper()
+            row_placement = str(row.get(column_mapping['placement'], '')).strip()
+            if not row_placement:
+                continue
+            site_match = any(site in row_site for site in site_filter)
+            row_platforms = [p.strip() for p in row_platform.split(',')]
+            if adtype == "1260x570":
+                platform_match = "WEB" in row_platforms
+            elif adtype == "320x480":
+                platform_match = any(p in ["AMP", "MWEB"] for p in row_platforms)
+            elif richmedia_platform_map and adtype in richmedia_platform_map:
+                platform_match = any(p.strip().upper() in [plat.upper() for plat in row_platforms]
+                                     for p in richmedia_platform_map[adtype])
+            else:
+                platform_match = any(p.strip().upper() in [plat.upper() for plat in row_platforms] for p in platforms_filter)
+            section_match = any(section in row_section for section in section_values)
+            adtype_match = any(ad in row_adtype for ad in adtype_values)
+            if site_match and platform_match and section_match and adtype_match:
+                placement_ids.append(row_placement)
+        placement_data[adtype] = {
+            "adtype_filter": adtype_values,
+            "section_filter": section_values,
+            "placement_ids": placement_ids,
+        }
+        if adtype == "1260x570":
+            placement_data[adtype]["additional_sizes"] = ['728x500', '1320x570']
+        elif adtype == "980x200":
+            placement_data[adtype]["additional_sizes"] = ['728x90']
+        elif adtype == "320x100":
+            placement_data[adtype]["additional_sizes"] = ['320x50']
+    return placement_data
+
+
+@pytest.mark.parametrize("site_filter, platforms_filter, richmedia_platform_map", [
+    # 1260x570 and 320x480 ignore the platform selection; TOI brings in ETIMES
+    (["TOI"], ["AMP"], None),
+    (["toi", "MT"], ["WEB"], None),
+    # Richmedia sizes use their own platforms instead of the user's
+    (["NBT", "VK"], ["WEB"], {"320x50": ["mweb", " AMP "], "1260x570": ["AMP"]}),
+    (["NBT"], ["MWEB", "AMP"], {"300x250": ["WEB"]}),
+    # Platform tokens match exactly, sites and sections by substring
+    (["VK", "NBT"], ["web", "mweb"], None),
+    (["ETIMES"], [], None),
+])
+def test_placements_match_row_scan(site_filter, platforms_filter, richmedia_platform_map):
+    expected = _baseline_placements(SHEET, site_filter, platforms_filter, SIZE_GROUPS, richmedia_platform_map)
+    actual = fetch_placements_ids("credentials.json", SHEET_URL, "Placements", site_filter, platforms_filter,
+                                  SIZE_GROUPS, richmedia_platform_map, all_values=SHEET)
+
+    assert actual == expected
+    assert list(actual) == list(expected)
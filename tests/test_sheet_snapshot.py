@@ -0,0 +1,116 @@
+"""
+sheet_snapshot against the installed gspread: the batchGet and Drive metadata
+calls must exist on the objects gspread.authorize returns.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import gspread
+import pytest
+from gspread.http_client import HTTPClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sheet_snapshot  # noqa: E402
+
+SPREADSHEET_ID = "1AbCdEfGhIjKlMnOpQrStUvWxYz0123456789"
+SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit"
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeHTTPClient(HTTPClient):
+    """gspread's HTTPClient with the network request replaced."""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, endpoint, params=None, **kwargs):
+        self.requests.append((method, endpoint, params))
+        if "values:batchGet" in endpoint:
+            return FakeResponse({"valueRanges": [
+                {"range": f"'{name}'!A1:C2", "values": [["Size", "Placement"], ["300x250", "123", "extra"]]}
+                for name in params["ranges"]
+            ]})
+        return FakeResponse({"modifiedTime": "2025-01-01T00:00:00.000Z"})
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    gspread_client = gspread.Client(auth=None, http_client=lambda auth, session: FakeHTTPClient())
+    monkeypatch.setattr(sheet_snapshot, "SHEET_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(sheet_snapshot, "get_sheets_client", lambda credentials_path: gspread_client)
+    return gspread_client
+
+
+def test_get_many_values_uses_one_batch_get(client):
+    cache = sheet_snapshot.SheetSnapshotCache()
+    values = cache.get_many_values("creds.json", SHEET_URL, ["TOI", "ET"])
+
+    assert values["TOI"] == [["Size", "Placement", ""], ["300x250", "123", "extra"]]
+    assert values["ET"] == values["TOI"]
+    batch_gets = [r for r in client.http_client.requests if "values:batchGet" in r[1]]
+    assert len(batch_gets) == 1
+    assert batch_gets[0][2]["ranges"] == ["'TOI'", "'ET'"]
+
+
+def test_current_snapshot_is_not_downloaded_again(client):
+    cache = sheet_snapshot.SheetSnapshotCache()
+    cache.get_values("creds.json", SHEET_URL, "TOI")
+    cache.get_values("creds.json", SHEET_URL, "TOI")
+
+    batch_gets = [r for r in client.http_client.requests if "values:batchGet" in r[1]]
+    assert len(batch_gets) == 1
+
+
+def test_revision_check_does_not_hold_the_cache_lock(client):
+    cache = sheet_snapshot.SheetSnapshotCache()
+    lock_free = []
+
+    def take_lock():
+        acquired = cache._lock.acquire(timeout=1)
+        if acquired:
+            cache._lock.release()
+        lock_free.append(acquired)
+
+    def get_file_drive_metadata(spreadsheet_id):
+        # Another worker must be able to use the cache while Drive answers
+        worker = threading.Thread(target=take_lock)
+        worker.start()
+        worker.join()
+        return {"modifiedTime": "2025-01-01T00:00:00.000Z"}
+
+    client.get_file_drive_metadata = get_file_drive_metadata
+    assert cache.get_revision(client, SPREADSHEET_ID) == "2025-01-01T00:00:00.000Z"
+    assert lock_free == [True]
+
+
+def test_concurrent_callers_share_one_revision_check(client):
+    cache = sheet_snapshot.SheetSnapshotCache()
+    drive_calls = []
+
+    def get_file_drive_metadata(spreadsheet_id):
+        drive_calls.append(spreadsheet_id)
+        time.sleep(0.2)
+        return {"modifiedTime": "2025-01-01T00:00:00.000Z"}
+
+    client.get_file_drive_metadata = get_file_drive_metadata
+    revisions = []
+    workers = [threading.Thread(target=lambda: revisions.append(cache.get_revision(client, SPREADSHEET_ID)))
+               for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert revisions == ["2025-01-01T00:00:00.000Z"] * 3
+    assert drive_calls == [SPREADSHEET_ID]
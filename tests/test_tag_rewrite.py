@@ -0,0 +1,115 @@
+"""
+normalize_tag_frame against the row-by-row loop parse_tag_file ran before it:
+same keys, same order and same rewritten tags.
+"""
+
+import os
+import re
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tag_rewrite import normalize_tag_frame  # noqa: E402
+
+NOSCRIPT_TAG = '<script src="https://ft/a.js"></script><noscript><a href="https://ft/click"><img src="i"></a></noscript>'
+NOSCRIPT_MACRO_TAG = '<noscript><a href="%%CLICK_URL_UNESC%%https://ft/click">i</a></noscript>'
+DCM_CLASS_TAG = '<ins class="dcmads" data-dcm-placement="N1.123"></ins><script src="dcm.js"></script>'
+DCM_NO_CLASS_TAG = '<div data-dcm-placement="N1.123" >creative goes here</div>'
+DCM_TRACKED_TAG = "<ins data-dcm-click-tracker='%%CLICK_URL_UNESC%%' class=\"dcmads\"></ins>"
+SCRIPT_TAG = '<script src="https://adserver/tag.js?ord=[timestamp]"></script>'
+
+
+def _baseline_tag_dict(df, dimension_col, tag_col=None, impression_tag_col=None, click_tag_col=None):
+    """The former parse_tag_file loop, without its progress prints."""
+    tag_dict = {}
+    for index, row in df.iterrows():
+        if not pd.notnull(row[dimension_col]):
+            continue
+        dimension = str(row[dimension_col]).strip()
+        if impression_tag_col and click_tag_col and pd.notnull(row[impression_tag_col]) and pd.notnull(row[click_tag_col]):
+            impression_tag = str(row[impression_tag_col]).strip()
+            click_tag = str(row[click_tag_col]).strip()
+            if not dimension or not impression_tag or not click_tag:
+                continue
+            if 'x' in dimension:
+                dimension_match = re.search(r'(\d+x\d+)', dimension)
+                if dimension_match:
+                    dimension = dimension_match.group(1)
+            tag_dict[dimension] = {'type': 'impression_click', 'impression_tag': impression_tag, 'click_tag': click_tag}
+        elif tag_col and pd.notnull(row[tag_col]):
+            js_tag = str(row[tag_col]).strip()
+            if not dimension or not js_tag:
+                continue
+            if 'x' in dimension:
+                dimension_match = re.search(r'(\d+x\d+)', dimension)
+                if dimension_match:
+                    dimension = dimension_match.group(1)
+            if '<noscript>' in js_tag.lower() and '<a href' in js_tag.lower():
+                if '%%CLICK_URL_UNESC%%' not in js_tag:
+                    js_tag = re.sub(r'(<a\s+[^>]*?href=")([^"]*)"', r'\1%%CLICK_URL_UNESC%%\2"', js_tag, flags=re.IGNORECASE)
+            is_doubleclick = False
+            if ('dcmads' in js_tag.lower() or 'data-dcm' in js_tag.lower()) and ('<ins' in js_tag.lower() or '<div' in js_tag.lower()):
+                is_doubleclick = True
+                if 'data-dcm-click-tracker' not in js_tag:
+                    modified_tag = re.sub(r'(<ins|<div)([^>]*?)(\s+class=)',
+                                          r"\1\2 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\3", js_tag, flags=re.IGNORECASE)
+                    if modified_tag == js_tag:
+                        modified_tag = re.sub(r'(<ins|<div)(\s)',
+                                              r"\1 data-dcm-click-tracker='%%CLICK_URL_UNESC%%'\2", js_tag, flags=re.IGNORECASE)
+                    js_tag = modified_tag
+            if 'x' in dimension and len(js_tag.strip()) > 10:
+                if dimension in tag_dict:
+                    counter = 1
+                    while f"{dimension}_{counter}" in tag_dict:
+                        counter += 1
+                    dimension_key = f"{dimension}_{counter}"
+                else:
+                    dimension_key = dimension
+                tag_dict[dimension_key] = {'type': 'doubleclick' if is_doubleclick else 'javascript', 'js_tag': js_tag}
+    return tag_dict
+
+
+@pytest.mark.parametrize("rows", [
+    # Duplicate dimensions get _1, _2, ... in sheet order
+    [("300x250", SCRIPT_TAG), ("300x250 ROS", SCRIPT_TAG + " "), (" 300x250_HP ", DCM_CLASS_TAG), ("728x90", SCRIPT_TAG)],
+    # A dimension that already looks like a suffixed key
+    [("300x250", SCRIPT_TAG), ("300x250_1", SCRIPT_TAG), ("300x250", DCM_CLASS_TAG)],
+    # Noscript click macro, added once
+    [("300x250", NOSCRIPT_TAG), ("320x50", NOSCRIPT_MACRO_TAG)],
+    # DoubleClick click tracker: before class, after the tag name, or already there
+    [("300x250", DCM_CLASS_TAG), ("728x90", DCM_NO_CLASS_TAG), ("320x50", DCM_TRACKED_TAG)],
+    # Rows that are skipped: no x, short tag, blanks, missing values
+    [("Banner", SCRIPT_TAG), ("300x250", "<b>hi</b>"), ("", SCRIPT_TAG), (None, SCRIPT_TAG), ("300x250", None), ("x", SCRIPT_TAG)],
+    # Non-string cells
+    [(300, SCRIPT_TAG), ("300x250", 12345678901234)],
+])
+def test_script_tags_match_row_loop(rows):
+    df = pd.DataFrame(rows, columns=["Dimensions", "JS Tag"])
+
+    expected = _baseline_tag_dict(df, "Dimensions", "JS Tag")
+    actual = normalize_tag_frame(df, "Dimensions", "JS Tag")
+
+    assert actual == expected
+    assert list(actual) == list(expected)
+
+
+@pytest.mark.parametrize("rows", [
+    # Impression/click wins over the script tag; a repeated dimension overwrites
+    [("300x250", SCRIPT_TAG, '<img src="https://imp/[timestamp]">', "https://click"),
+     ("300x250 ROS", SCRIPT_TAG, '<img src="https://imp/2">', "https://click/2")],
+    # Falls back to the script tag when either tracker is missing or blank
+    [("300x250", SCRIPT_TAG, None, "https://click"), ("728x90", DCM_CLASS_TAG, " ", "https://click"),
+     ("320x50", NOSCRIPT_TAG, '<img src="i">', None)],
+])
+def test_impression_click_rows_match_row_loop(rows):
+    df = pd.DataFrame(rows, columns=["Dimensions", "JS Tag", "Impression Tag", "Click Tag"])
+
+    for columns in (("JS Tag", "Impression Tag", "Click Tag"), (None, "Impression Tag", "Click Tag")):
+        expected = _baseline_tag_dict(df, "Dimensions", *columns)
+        actual = normalize_tag_frame(df, "Dimensions", *columns)
+
+        assert actual == expected
+        assert list(actual) == list(expected)